@@ -0,0 +1,178 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+''' Micro-benchmarks of the conversions between ROS-Messages and Entities (no ROS-Master and no
+    Context-Broker needed):
+
+        cd firos
+        python -m benchmarks.conversion [--only REGEX] [--report REGEX] [--save-baseline] [--tolerance 0.2]
+
+    Each conversion is measured with Messages of several sizes (see SIZES), from a Twist to a 1 MB
+    OccupancyGrid. For each the duration of a call (us_per_call) and its allocations (alloc_peak_kib,
+    alloc_blocks, which includes the result) are reported. --report prints the lines of code, which
+    allocated the most memory.
+
+    The results are compared with the stored baseline (benchmarks/baseline_conversion.json, see --save-baseline),
+    the exit code is 1 if a metric regressed by more than the tolerance.
+'''
+
+import os
+import re
+import sys
+import json
+import argparse
+from collections import OrderedDict
+
+from include.constants import Constants as C
+from include.logger import initLog
+from include.ros import topicHandler
+from include.ros.topicHandler import DecodePlan, instantiateROSMessage, rosMsg2Dict
+from include.ros.ngsiSerializer import NgsiSerializer
+
+from benchmarks import harness
+from benchmarks.messages import laserScan, loadClass, occupancyGrid, tfMessage, twist
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_conversion.json")
+
+# SIZES[name] -> (message-type, builder)
+SIZES = OrderedDict([
+    ("twist", ("geometry_msgs/Twist", twist)),
+    ("tf_message", ("tf2_msgs/TFMessage", tfMessage)),
+    ("laser_scan", ("sensor_msgs/LaserScan", laserScan)),
+    ("occupancy_grid", ("nav_msgs/OccupancyGrid", occupancyGrid)),
+])
+
+COLUMNS = ("us_per_call", "alloc_peak_kib", "alloc_blocks")
+
+
+def publishInput(msg):
+    ''' Returns (obj, dataStruct) of the message, as RosTopicHandler.publish receives them
+        (see instantiateROSMessage)
+    '''
+    if hasattr(msg, "_type"):
+        obj = dict()
+        dataStruct = dict(type=msg._type, value=dict())
+        for slot in msg.__slots__:
+            obj[slot], dataStruct["value"][slot] = publishInput(getattr(msg, slot))
+        return obj, dataStruct
+    if type(msg) is list and msg and hasattr(msg[0], "_type"):
+        items = [publishInput(item) for item in msg]
+        return [item[0] for item in items], [item[1] for item in items]
+    if hasattr(msg, "__slots__"):
+        # e.g. Time and Duration
+        return dict((slot, getattr(msg, slot)) for slot in msg.__slots__), dict()
+    return msg, dict()
+
+
+def conversions(name):
+    ''' Returns the conversions of the message (of SIZES[name]) as OrderedDict: {conversion: routine}
+    '''
+    msgType, build = SIZES[name]
+    msgClass = loadClass(msgType)
+    msg = build(0)
+    entityId = "/bench/{}".format(name).replace("/", ".")
+    dataTypeDict = rosMsg2Dict(msgClass())
+    NgsiSerializer.compile(msgClass, dataTypeDict)
+
+    # The Entity, as the Context-Broker notifies it
+    entity = json.loads(NgsiSerializer.obj2Fiware(msg, entityId, msgType, dataTypeDict, encode=True))
+    obj, dataStruct = publishInput(msg)
+    plan = DecodePlan.get(msgClass)
+
+    return OrderedDict([
+        # The dictionary of the data types, once per message type
+        ("rosMsg2Dict", lambda: rosMsg2Dict(msgClass())),
+        # The plan of the NgsiSerializer, once per message type
+        ("compile", lambda: NgsiSerializer.compile(msgClass, dataTypeDict)),
+        # ROS -> Context-Broker, each published message
+        ("obj2Fiware", lambda: NgsiSerializer.obj2Fiware(msg, entityId, msgType, dataTypeDict, encode=True)),
+        # ROS -> Context-Broker without a plan: a dict of the __slots__ via the ObjectFiwareConverter
+        ("slotsDict", lambda: NgsiSerializer._reflective(msg, entityId, msgType, dataTypeDict, encode=True)),
+        # Context-Broker -> ROS, each notified Entity (replaces the type struct of each notification)
+        ("decodePlan", lambda: plan.decode(entity)),
+        # Context-Broker -> ROS, via RosTopicHandler.publish (other standards)
+        ("instantiateROSMessage", lambda: instantiateROSMessage(obj, dataStruct)),
+    ])
+
+
+def measure(routine, repeat):
+    ''' Returns the duration of a call and its allocations. Slow routines (e.g. on the 1 MB grid)
+        are traced only once
+    '''
+    duration = harness.timePerCall(routine, repeat)
+    result = {"us_per_call": round(duration * 1e6, 2)}
+    result.update(harness.measureAllocations(routine, 1 if duration > 0.1 else 5))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the conversions between ROS-Messages and Entities")
+    parser.add_argument("--only", default=None, help="Only run the benchmarks matching this regex, e.g. 'obj2Fiware/'")
+    parser.add_argument("--report", default=None, help="Print the top allocations of the benchmarks matching this regex")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of rounds of each benchmark (the median is reported)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression against the baseline (0.2: 20%%)")
+    parser.add_argument("--baseline", default=BASELINE, help="The stored results (default: benchmarks/baseline_conversion.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as new baseline")
+    parser.add_argument("--json", default=None, help="Also write the results into this file")
+    args = parser.parse_args()
+
+    C.LOGLEVEL = "ERROR"
+    initLog()
+
+    results = dict()
+    for name in SIZES:
+        for conversion, routine in conversions(name).items():
+            benchmark = "{}/{}".format(conversion, name)
+            if args.only is not None and not re.search(args.only, benchmark):
+                continue
+            print("Running {}".format(benchmark))
+            sys.stdout.flush()
+            results[benchmark] = measure(routine, args.repeat)
+            if args.report is not None and re.search(args.report, benchmark):
+                print("\n".join(harness.allocationReport(routine)))
+
+    print("")
+    print(harness.table(results, COLUMNS))
+    if args.json is not None:
+        harness.saveBaseline(results, args.json)
+    if args.save_baseline:
+        harness.saveBaseline(results, args.baseline)
+        print("\nSaved as baseline: {}".format(args.baseline))
+        return 0
+
+    baseline = harness.loadBaseline(args.baseline)
+    if not baseline:
+        print("\nNo baseline found, store one with --save-baseline")
+        return 0
+    regressions = harness.compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions (tolerance: {:.0f}%):".format(args.tolerance * 100))
+        for regression in regressions:
+            print("  " + regression)
+        return 1
+    print("\nNo regressions against the baseline (tolerance: {:.0f}%)".format(args.tolerance * 100))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
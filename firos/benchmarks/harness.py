@@ -0,0 +1,205 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import gc
+import os
+import json
+import time
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+
+# The CPU-time of this process in seconds
+cpuTime = getattr(time, "process_time", None) or time.clock
+
+# The stored results, which the results are compared with
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# The compared metrics: COMPARED[metric] -> True, if a higher value is better
+COMPARED = {
+    "msgs_per_s": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "cpu_us_per_msg": False,
+    "us_per_call": False,
+    "alloc_peak_kib": False,
+    "alloc_blocks": False
+}
+
+
+def percentile(values, p):
+    ''' Returns the p-th percentile (nearest rank) of the values
+    '''
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(int(round(p / 100.0 * len(values))) - 1, 0)]
+
+
+def summarize(latencies, elapsed, cpu):
+    ''' Returns the metrics of a benchmark run
+
+        latencies: The latency of each message in seconds
+        elapsed: The (wall-clock) duration of the run in seconds
+        cpu: The CPU-time of the run in seconds
+    '''
+    count = len(latencies)
+    return {
+        "count": count,
+        "msgs_per_s": round(count / elapsed, 1) if elapsed > 0 else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "cpu_us_per_msg": round(cpu / count * 1e6, 1)
+    }
+
+
+def timePerCall(routine, repeat=5, minTime=0.05):
+    ''' Returns the median duration of a call of routine in seconds. routine is called in repeat
+        rounds, each round calls it as often as needed to take at least minTime seconds
+    '''
+    number = 1
+    while True:
+        elapsed = _timeCalls(routine, number)
+        if elapsed >= minTime:
+            break
+        number *= 10 if elapsed < minTime / 10 else 2
+    durations = [elapsed / number]
+    for _ in range(repeat - 1):
+        durations.append(_timeCalls(routine, number) / number)
+    return percentile(durations, 50)
+
+
+def _timeCalls(routine, number):
+    start = timeit.default_timer()
+    for _ in range(number):
+        routine()
+    return timeit.default_timer() - start
+
+
+def measureAllocations(routine, count=10):
+    ''' Calls routine count times while tracing the allocations (via tracemalloc). Returns the
+        median of the peak of the allocated memory during a call in KiB and of the number of
+        blocks, which were allocated by the call and are still alive afterwards (including the
+        returned value):
+
+            {"alloc_peak_kib": ..., "alloc_blocks": ...}
+
+        This is empty on Python 2 (without tracemalloc)
+    '''
+    if tracemalloc is None:
+        return {}
+    peaks = []
+    blocks = []
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for _ in range(count):
+            # Also resets the peak
+            tracemalloc.clear_traces()
+            result = routine()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            blocks.append(sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename")))
+            del result
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_peak_kib": round(percentile(peaks, 50) / 1024.0, 1),
+        "alloc_blocks": percentile(blocks, 50)
+    }
+
+
+def allocationReport(routine, limit=10):
+    ''' Calls routine once while tracing the allocations. Returns the lines of code, which
+        allocated the most memory (still alive after the call), as human-readable lines
+    '''
+    if tracemalloc is None:
+        return ["tracemalloc is not available (Python 2)"]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = routine()
+        snapshot = tracemalloc.take_snapshot()
+        del result
+    finally:
+        tracemalloc.stop()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    lines = []
+    for stat in snapshot.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        lines.append("{:>10.1f} KiB {:>8} blocks  {}:{}".format(
+            stat.size / 1024.0, stat.count, os.path.relpath(frame.filename), frame.lineno))
+    return lines
+
+
+def loadBaseline(path=BASELINE):
+    ''' Returns the stored results ({} if there are none)
+    '''
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def saveBaseline(results, path=BASELINE):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline, tolerance=0.2):
+    ''' Compares the results with the baseline. Returns the regressions as list of strings,
+        a metric regressed, if it is worse than its baseline by more than tolerance (0.2: 20%)
+
+        results, baseline: {benchmark: {metric: value}}
+    '''
+    regressions = []
+    for name in sorted(results):
+        for metric, higherIsBetter in sorted(COMPARED.items()):
+            value = results[name].get(metric)
+            reference = baseline.get(name, {}).get(metric)
+            if value is None or not reference:
+                continue
+            if higherIsBetter:
+                regressed = value < reference * (1 - tolerance)
+            else:
+                regressed = value > reference * (1 + tolerance)
+            if regressed:
+                regressions.append("{} {}: {} (baseline: {}, {:+.0f}%)".format(
+                    name, metric, value, reference, (float(value) / reference - 1) * 100))
+    return regressions
+
+
+def table(results, columns=("count", "msgs_per_s", "p50_ms", "p99_ms", "cpu_us_per_msg", "alloc_peak_kib", "alloc_blocks")):
+    ''' Returns the results as human-readable table (with the given metrics as columns)
+    '''
+    width = max([len(name) for name in results] + [28])
+    lines = ["benchmark".ljust(width) + "".join(" {:>15}".format(column) for column in columns)]
+    for name in sorted(results):
+        lines.append(name.ljust(width) + "".join(
+            " {:>15}".format("-" if results[name].get(column) is None else results[name][column]) for column in columns))
+    return "\n".join(lines)
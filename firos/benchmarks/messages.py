@@ -0,0 +1,107 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import math
+from collections import OrderedDict
+
+from include.libLoader import LibLoader
+from include.ros import topicHandler
+
+
+def loadClass(msgType):
+    ''' Returns the class of the ROS-Message msgType. As in FIROS, it is imported or generated from
+        the definitions in FIROS/msgs (which contain all the Messages used here)
+    '''
+    if msgType not in topicHandler.ROS_MESSAGE_CLASSES:
+        topicHandler.ROS_MESSAGE_CLASSES[msgType] = LibLoader.loadFromSystem(msgType, "/bench")
+    return topicHandler.ROS_MESSAGE_CLASSES[msgType]
+
+
+def _stamp(header, seq):
+    header.seq = seq
+    header.stamp.secs = 1500000000 + seq // 1000
+    header.stamp.nsecs = (seq % 1000) * 1000000
+    header.frame_id = "map"
+
+
+def twist(seq):
+    ''' A Twist (48 bytes in ROS)
+    '''
+    msg = loadClass("geometry_msgs/Twist")()
+    msg.linear.x = 0.5 + seq * 0.001
+    msg.angular.z = -0.25
+    return msg
+
+
+def laserScan(seq, ranges=720):
+    ''' A LaserScan with 720 ranges and intensities (about 6 KB in ROS)
+    '''
+    msg = loadClass("sensor_msgs/LaserScan")()
+    _stamp(msg.header, seq)
+    msg.angle_min = -math.pi / 2
+    msg.angle_max = math.pi / 2
+    msg.angle_increment = math.pi / ranges
+    msg.scan_time = 0.1
+    msg.range_min = 0.05
+    msg.range_max = 30.0
+    msg.ranges = [1.0 + ((i + seq) % 100) * 0.25 for i in range(ranges)]
+    msg.intensities = [float(i % 7) for i in range(ranges)]
+    return msg
+
+
+def tfMessage(seq, transforms=10):
+    ''' A TFMessage with 10 transforms
+    '''
+    TransformStamped = loadClass("geometry_msgs/TransformStamped")
+    msg = loadClass("tf2_msgs/TFMessage")()
+    msg.transforms = []
+    for i in range(transforms):
+        transform = TransformStamped()
+        _stamp(transform.header, seq)
+        transform.child_frame_id = "link{}".format(i)
+        transform.transform.translation.x = i * 0.1
+        transform.transform.translation.y = seq * 0.001
+        transform.transform.rotation.w = 1.0
+        msg.transforms.append(transform)
+    return msg
+
+
+def occupancyGrid(seq, width=1000, height=1000):
+    ''' An OccupancyGrid with 1000x1000 cells (1 MB in ROS)
+    '''
+    msg = loadClass("nav_msgs/OccupancyGrid")()
+    _stamp(msg.header, seq)
+    msg.info.resolution = 0.05
+    msg.info.width = width
+    msg.info.height = height
+    msg.info.origin.orientation.w = 1.0
+    row = [(-1 if i % 10 == 0 else (i * 7) % 101) for i in range(width)]
+    msg.data = row * height
+    return msg
+
+
+# MESSAGES[name] -> (topic, message-type, builder, number of messages of a run)
+MESSAGES = OrderedDict([
+    ("laser_scan", ("/bench/scan", "sensor_msgs/LaserScan", laserScan, 2000)),
+    ("tf_message", ("/bench/tf", "tf2_msgs/TFMessage", tfMessage, 2000)),
+    ("occupancy_grid", ("/bench/map", "nav_msgs/OccupancyGrid", occupancyGrid, 10)),
+])
@@ -0,0 +1,175 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import re
+import sys
+import json
+import time
+import argparse
+import itertools
+import threading
+try:
+    # Python 3
+    import http.client as httplib
+    from socketserver import ThreadingMixIn
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    # Python 2
+    import httplib
+    from SocketServer import ThreadingMixIn
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+
+class MockOrion(ThreadingMixIn, HTTPServer):
+    ''' A stand-in for the NGSIv2-API of the Orion Context-Broker, as used by FIROS. It accepts
+        every request on /v2/entities, /v2/op/update and /v2/subscriptions (after an optional latency),
+        but does not store anything. Additionally, it can act as the Context-Broker which notifies FIROS:
+
+            POST /bench/notify  {"url": URL, "body": NOTIFICATION, "count": N}
+
+        posts the notification N times to URL (over one connection) and responds with the time
+        each notification was sent: {"sent": [...]}. GET /bench/stats returns the number of requests
+        of each route.
+
+        It is started in its own process (see spawn), so that it does not take the CPU of FIROS:
+
+            python -m benchmarks.mockOrion [--port PORT] [--latency SECONDS]
+    '''
+    daemon_threads = True
+
+    # (method, regex of the path, status)
+    ROUTES = [
+        ("POST", "^/v2/entities/?$", 201),
+        ("POST", "^/v2/entities/[^/]+/attrs/?$", 204),
+        ("POST", "^/v2/op/update/?$", 204),
+        ("DELETE", "^/v2/entities/[^/]+/?$", 204),
+        ("POST", "^/v2/subscriptions/?$", 201),
+        ("PATCH", "^/v2/subscriptions/[^/]+/?$", 204),
+        ("DELETE", "^/v2/subscriptions/[^/]+/?$", 204),
+    ]
+
+    def __init__(self, port=0, latency=0):
+        HTTPServer.__init__(self, ("127.0.0.1", port), MockOrionHandler)
+        self.latency = latency
+        self.stats = dict()
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.routes = [(method, re.compile(regex), status) for method, regex, status in self.ROUTES]
+
+
+class MockOrionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        return
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        path = self.path.split("?")[0]
+
+        if self.command == "POST" and path == "/bench/notify":
+            self._respond(200, json.dumps(self._notify(json.loads(body.decode("utf-8")))))
+            return
+        if self.command == "GET" and path == "/bench/stats":
+            with self.server.lock:
+                self._respond(200, json.dumps(self.server.stats))
+            return
+
+        for method, regex, status in self.server.routes:
+            if method == self.command and regex.match(path):
+                break
+        else:
+            self._respond(404, json.dumps({"error": "NotFound"}))
+            return
+
+        with self.server.lock:
+            key = "{} {}".format(method, regex.pattern)
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        headers = []
+        if self.command == "POST" and path.rstrip("/") == "/v2/subscriptions":
+            headers.append(("Location", "/v2/subscriptions/{}".format(next(self.server.ids))))
+        self._respond(status, "", headers)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+    def _notify(self, data):
+        ''' Posts the notification data["count"] times to data["url"] and returns when each one was sent
+        '''
+        url = re.match("^http://([^:/]+):(\\d+)(/.*)?$", data["url"])
+        connection = httplib.HTTPConnection(url.group(1), int(url.group(2)))
+        body = data["body"].encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        sent = []
+        try:
+            for _ in range(int(data["count"])):
+                sent.append(time.time())
+                connection.request("POST", url.group(3) or "/", body, headers)
+                connection.getresponse().read()
+        finally:
+            connection.close()
+        return dict(sent=sent)
+
+    def _respond(self, status, content, headers=()):
+        body = content.encode("utf-8")
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def spawn(latency=0):
+    ''' Starts the MockOrion in another process. Returns (process, port)
+    '''
+    import os
+    import subprocess
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.mockOrion", "--latency", str(latency)],
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               stdout=subprocess.PIPE)
+    # The first line is the port
+    port = int(process.stdout.readline().decode("utf-8").strip())
+    return process, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A stand-in for the Orion Context-Broker")
+    parser.add_argument("--port", type=int, default=0, help="The port (default: a free one)")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds until a request is answered")
+    args = parser.parse_args()
+
+    server = MockOrion(args.port, args.latency)
+    print(server.server_address[1])
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
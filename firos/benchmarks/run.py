@@ -0,0 +1,230 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+''' Runs the benchmarks of FIROS against the MockOrion (no ROS-Master and no Context-Broker needed):
+
+        cd firos
+        python -m benchmarks.run [--scale FACTOR] [--only REGEX] [--save-baseline] [--tolerance 0.2]
+
+    Each Message of benchmarks.messages is bridged in both directions:
+
+        publish/<name>: ROS -> Context-Broker, the rospy-callback (_publishToCBRoutine) is called
+            directly, a message is done when the Context-Broker acknowledged its update
+        notify/<name>: Context-Broker -> ROS, the MockOrion posts the notifications to the CBServer
+            (CBHandler.do_POST), a message is done when it is published into ROS
+
+    The results are compared with the stored baseline (benchmarks/baseline.json, see --save-baseline),
+    the exit code is 1 if a metric regressed by more than the tolerance.
+'''
+
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+try:
+    # Python 3
+    import http.client as httplib
+except ImportError:
+    # Python 2
+    import httplib
+
+from include.constants import Constants as C
+from include.logger import initLog
+from include.ros import topicHandler
+from include.ros.topicHandler import RosTopicHandler
+from include.ros.ngsiSerializer import NgsiSerializer
+from include.pubsub.contextbroker import cbSubscriber
+
+from benchmarks import harness, mockOrion
+from benchmarks.messages import MESSAGES, loadClass
+
+
+class Sink(object):
+    ''' Takes the place of the rospy.Publisher of a topic and records when each message is published
+    '''
+    def __init__(self, count):
+        self.count = count
+        self.published = []
+        self.done = threading.Event()
+
+    def publish(self, msg):
+        self.published.append(time.time())
+        if len(self.published) >= self.count:
+            self.done.set()
+
+
+def configure(port):
+    ''' Configures FIROS, as if the MockOrion (on port) was the Context-Broker
+    '''
+    C.LOGLEVEL = "ERROR"
+    C.EP_SERVER_ADRESS = "127.0.0.1"
+    C.PUB_FREQUENCY = 0
+    C.PUB_WORKERS = 0
+    C.DATA = {"contextbroker": {"address": "127.0.0.1", "port": port, "notification": {"workers": 4}}}
+    initLog()
+    topicHandler.initPubAndSub()
+
+
+def register(topic, msgType):
+    ''' Registers the topic in the topicHandler, as loadMsgHandlers would
+    '''
+    msgClass = loadClass(msgType)
+    topicHandler.ROS_TOPIC_TYPE[topic] = msgType
+    topicHandler.ROS_TOPIC_AS_DICT[topic] = topicHandler.rosMsg2Dict(msgClass())
+    NgsiSerializer.compile(msgClass, topicHandler.ROS_TOPIC_AS_DICT[topic])
+
+
+def allocationRuns(count):
+    ''' The allocations are traced on a tenth of the messages (at most 10), tracemalloc is slow
+    '''
+    return max(min(count // 10, 10), 1)
+
+
+def benchPublish(topic, build, count):
+    ''' ROS -> Context-Broker: Returns the metrics of publishing count messages
+    '''
+    args = {"topic": topic}
+    msgs = [build(i) for i in range(min(count, 10))]
+
+    def publish(msg):
+        topicHandler.LAST_PUBLISH_TIME.pop(topic, None)
+        topicHandler._publishToCBRoutine(msg, args)
+
+    # The first message creates the Entity
+    publish(msgs[0])
+
+    latencies = []
+    cpu = harness.cpuTime()
+    begin = time.time()
+    for i in range(count):
+        start = time.time()
+        publish(msgs[i % len(msgs)])
+        latencies.append(time.time() - start)
+    result = harness.summarize(latencies, time.time() - begin, harness.cpuTime() - cpu)
+    result.update(harness.measureAllocations(lambda: publish(msgs[0]), allocationRuns(count)))
+    return result
+
+
+def benchNotify(server, orionPort, topic, msgType, build, count):
+    ''' Context-Broker -> ROS: Returns the metrics of count notifications
+    '''
+    # The Entity, as the Context-Broker notifies it (its type is "<package>%2F<message>")
+    msg = build(0)
+    entity = NgsiSerializer.obj2Fiware(msg, topic.replace("/", "."), msgType,
+                                       topicHandler.ROS_TOPIC_AS_DICT[topic], encode=True)
+    body = '{"subscriptionId": "bench", "data": [' + entity + ']}'
+
+    # The decoding without HTTP (as in CBHandler.do_POST and CBServer._publish)
+    topicHandler.ROS_PUBLISHER[topic] = Sink(0)
+    def receive():
+        for data in cbSubscriber.jsonLoads(body)["data"]:
+            RosTopicHandler.publishEntity(topic, data)
+    allocations = harness.measureAllocations(receive, allocationRuns(count))
+
+    sink = topicHandler.ROS_PUBLISHER[topic] = Sink(count)
+    connection = httplib.HTTPConnection("127.0.0.1", orionPort, timeout=600)
+    cpu = harness.cpuTime()
+    begin = time.time()
+    connection.request("POST", "/bench/notify", json.dumps({
+        "url": "http://127.0.0.1:{}/".format(server.port), "count": count, "body": body}),
+        {"Content-Type": "application/json"})
+    sent = json.loads(connection.getresponse().read().decode("utf-8"))["sent"]
+    connection.close()
+    # All notifications are queued, when the MockOrion is done
+    sink.done.wait(60)
+    end = time.time()
+    if len(sink.published) < count:
+        raise RuntimeError("Only {} of {} notifications were published into ROS".format(len(sink.published), count))
+    result = harness.summarize([published - sent[i] for i, published in enumerate(sink.published)],
+                               end - begin, harness.cpuTime() - cpu)
+    result.update(allocations)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of FIROS against a mock of the Orion Context-Broker")
+    parser.add_argument("--scale", type=float, default=1.0, help="Factor for the number of messages of each benchmark")
+    parser.add_argument("--only", default=None, help="Only run the benchmarks matching this regex")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds until the mock Orion answers a request")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression against the baseline (0.2: 20%%)")
+    parser.add_argument("--baseline", default=harness.BASELINE, help="The stored results (default: benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as new baseline")
+    parser.add_argument("--json", default=None, help="Also write the results into this file")
+    args = parser.parse_args()
+
+    process, orionPort = mockOrion.spawn(args.latency)
+    server = None
+    results = dict()
+    try:
+        configure(orionPort)
+        event = threading.Event()
+        server = cbSubscriber.CBServer(event, C.DATA["contextbroker"])
+        thread = threading.Thread(target=server.start)
+        thread.daemon = True
+        thread.start()
+        event.wait()
+
+        for name, (topic, msgType, build, count) in MESSAGES.items():
+            count = max(int(count * args.scale), 1)
+            register(topic, msgType)
+            for direction in ("publish", "notify"):
+                benchmark = "{}/{}".format(direction, name)
+                if args.only is not None and not re.search(args.only, benchmark):
+                    continue
+                print("Running {} ({} messages)".format(benchmark, count))
+                sys.stdout.flush()
+                if direction == "publish":
+                    results[benchmark] = benchPublish(topic, build, count)
+                else:
+                    results[benchmark] = benchNotify(server, orionPort, topic, msgType, build, count)
+    finally:
+        if server is not None:
+            server.close()
+        process.terminate()
+
+    print("")
+    print(harness.table(results))
+    if args.json is not None:
+        harness.saveBaseline(results, args.json)
+    if args.save_baseline:
+        harness.saveBaseline(results, args.baseline)
+        print("\nSaved as baseline: {}".format(args.baseline))
+        return 0
+
+    baseline = harness.loadBaseline(args.baseline)
+    if not baseline:
+        print("\nNo baseline found, store one with --save-baseline")
+        return 0
+    regressions = harness.compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions (tolerance: {:.0f}%):".format(args.tolerance * 100))
+        for regression in regressions:
+            print("  " + regression)
+        return 1
+    print("\nNo regressions against the baseline (tolerance: {:.0f}%)".format(args.tolerance * 100))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks import harness
+
+
+class Test_Harness(unittest.TestCase):
+
+    def test_Percentile(self):
+        values = [5, 1, 4, 2, 3, 6, 8, 7, 10, 9]
+        self.assertEqual(harness.percentile(values, 50), 5)
+        self.assertEqual(harness.percentile(values, 99), 10)
+        self.assertEqual(harness.percentile(values, 0), 1)
+        self.assertEqual(harness.percentile([], 50), None)
+
+    def test_Summarize(self):
+        result = harness.summarize([0.001] * 99 + [0.1], 0.5, 0.05)
+        self.assertEqual(result, {"count": 100, "msgs_per_s": 200.0, "p50_ms": 1.0,
+                                  "p99_ms": 1.0, "cpu_us_per_msg": 500.0})
+
+    def test_Time_Per_Call(self):
+        # A clock, which advances 1 ms per call, so that the number of calls does not depend on the load
+        clock = [0.0]
+        def routine():
+            clock[0] += 0.001
+        self.addCleanup(setattr, harness.timeit, "default_timer", harness.timeit.default_timer)
+        harness.timeit.default_timer = lambda: clock[0]
+
+        duration = harness.timePerCall(routine, repeat=3, minTime=0.01)
+        self.assertAlmostEqual(duration, 0.001)
+        # Doubled up to 16 calls (taking 16 ms) per round: 1 + 2 + 4 + 8 + 16 to find the number, then 2 more rounds
+        self.assertAlmostEqual(clock[0], (1 + 2 + 4 + 8 + 16 + 2 * 16) * 0.001)
+
+    def test_Measure_Allocations(self):
+        kept = []
+        result = harness.measureAllocations(lambda: kept.append([object() for _ in range(1000)]), 3)
+        if harness.tracemalloc is None:
+            self.assertEqual(result, {})
+        else:
+            self.assertGreaterEqual(result["alloc_blocks"], 1000)
+            self.assertGreater(result["alloc_peak_kib"], 0)
+
+    def test_Allocation_Report(self):
+        lines = harness.allocationReport(lambda: [object() for _ in range(1000)], limit=3)
+        if harness.tracemalloc is None:
+            self.assertEqual(len(lines), 1)
+        else:
+            self.assertTrue(0 < len(lines) <= 3)
+            self.assertTrue("test_Harness.py" in lines[0])
+
+    def test_Compare(self):
+        baseline = {"publish/scan": {"msgs_per_s": 1000, "p99_ms": 10, "count": 100},
+                    "notify/scan": {"msgs_per_s": 1000}}
+        results = {"publish/scan": {"msgs_per_s": 700, "p99_ms": 11, "count": 50},
+                   "notify/scan": {"msgs_per_s": 900},
+                   "publish/map": {"msgs_per_s": 1}}
+
+        regressions = harness.compare(results, baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("publish/scan msgs_per_s: 700"))
+        self.assertTrue(regressions[0].endswith("-30%)"))
+
+        self.assertEqual(len(harness.compare(results, baseline, tolerance=0.05)), 3)
+        self.assertEqual(harness.compare(results, {}), [])
+
+    def test_Baseline(self):
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, "baseline.json")
+            self.assertEqual(harness.loadBaseline(path), {})
+            harness.saveBaseline({"publish/scan": {"msgs_per_s": 1000}}, path)
+            self.assertEqual(harness.loadBaseline(path), {"publish/scan": {"msgs_per_s": 1000}})
+        finally:
+            shutil.rmtree(folder)
+
+    def test_Table(self):
+        lines = harness.table({"publish/scan": {"count": 10, "msgs_per_s": 100.0}}).split("\n")
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("benchmark"))
+        self.assertTrue(lines[1].startswith("publish/scan"))
+        self.assertTrue(lines[1].endswith("-"))
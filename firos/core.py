@@ -31,11 +31,13 @@ import json
 import os
 import sys
 import copy
-import rospy
 import signal
 import argparse
 
 sys.path.append("/include")
+from include import startup
+with startup.Phase("imports"):
+    import rospy
 from include.constants import Constants as C
 
 
@@ -62,6 +64,8 @@ if __name__ == '__main__':
     parser.add_argument('--ros-port', action='store', dest='ros_port', help='Set the ROS-Port for Firos')
     parser.add_argument('--ros-node-name', action='store', dest='ros_node_name', help='Set the ROS-Node-Name')
     parser.add_argument('--loglevel', action='store', dest='loglevel', help='Set the LogLevel (INFO, WARNING, ERROR,  CRITICAL)')
+    parser.add_argument('--profile-startup', action='store', dest='profile_startup', nargs='?', const='-',
+                        help='Time each phase of the startup and each topic and write the report as JSON into the file (default: stdout)')
 
                     
     # Get Input
@@ -77,15 +81,17 @@ if __name__ == '__main__':
         conf_path = os.path.abspath(results.conf_Fold)
 
     # Initialize global variables (Constants.py)
-    C.init(conf_path)
+    with startup.Phase("configuration"):
+        C.init(conf_path)
 
 
     # Importing firos specific scripts
-    from include import confManager
-    from include.logger import Log, initLog
-    from include.server.firosServer import FirosServer
+    with startup.Phase("imports"):
+        from include import confManager
+        from include.logger import Log, initLog
+        from include.server.firosServer import FirosServer
     
-    from include.ros.topicHandler import RosTopicHandler, loadMsgHandlers, createConnectionListeners, initPubAndSub
+        from include.ros.topicHandler import RosTopicHandler, loadMsgHandlers, createConnectionListeners, initPubAndSub
 
     # Overwrite global variables with command line arguments (iff set)
     if results.port is not None:
@@ -105,8 +111,11 @@ if __name__ == '__main__':
     
     # Starting Up!
     initLog()
+    if results.profile_startup is not None:
+        startup.initProfile(results.profile_startup)
     Log("INFO", "Initializing ROS node: " + C.ROS_NODE_NAME)
-    rospy.init_node(C.ROS_NODE_NAME)
+    with startup.Phase("ros node"):
+        rospy.init_node(C.ROS_NODE_NAME)
     Log("INFO", "Initialized")
 
 
@@ -129,9 +138,15 @@ if __name__ == '__main__':
         Log("INFO", "---------------------------------\n")
 
         # Topic Handler Routine:
-        initPubAndSub()
-        loadMsgHandlers(confManager.getRobots(True))
+        with startup.Phase("plugins"):
+            initPubAndSub()
+        with startup.Phase("topics"):
+            robots = confManager.getRobots(True)
+        loadMsgHandlers(robots)
         createConnectionListeners()
+        startup.report()
+        if results.profile_startup is not None:
+            startup.writeProfile(results.profile_startup)
 
         Log("INFO", "\nPress Ctrl+C to Exit\n")
         server.start()
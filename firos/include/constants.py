@@ -35,12 +35,26 @@ class Constants:
     EP_SERVER_ADRESS = None
     EP_SERVER_PORT = None
     MAP_SERVER_PORT = 10100
+    SERVER_WORKERS = 4              # Threads handling the requests of the FIROS-Server, 0: one after another
+    SERVER_KEEP_ALIVE = 5           # In Seconds, 0: HTTP/1.0 without Keep-Alive
     ROSBRIDGE_PORT = 9090 
     PUB_FREQUENCY = 0               # In Milliseconds
 
     ROS_NODE_NAME = "firos"
     ROS_SUB_QUEUE_SIZE = 10 
 
+    PUB_WORKERS = 0                 # 0: Publish directly in the rospy-callback
+    PUB_QUEUE_SIZE = 100            # Queued messages per topic
+    PUB_OVERFLOW_POLICY = "drop_oldest"
+    PUB_COALESCE = []               # Regexes of topics, where only the newest message is published
+    PASSTHROUGH = []                # Regexes of topics, whose serialized messages are forwarded to the RawSinks
+
+    TRACING_SIZE = 0                # Traces kept of each direction, 0: tracing disabled
+    TRACING_BUDGET = 100            # In Milliseconds, traces taking longer are counted
+
+    # Folder of the persistent cache of the LibLoader (None: disabled)
+    MSG_CACHE = os.path.join(os.environ.get("ROS_HOME", os.path.expanduser("~/.ros")), "firos")
+
     @classmethod
     def setConfiguration(cls, path):
         try:
@@ -64,6 +78,12 @@ class Constants:
             if "server" in configData and "port" in configData["server"]:
                cls. MAP_SERVER_PORT = configData["server"]["port"]
 
+            if "server" in configData and "workers" in configData["server"]:
+                cls.SERVER_WORKERS = int(configData["server"]["workers"])
+
+            if "server" in configData and "keep_alive" in configData["server"]:
+                cls.SERVER_KEEP_ALIVE = float(configData["server"]["keep_alive"])
+
             if "node_name" in configData:
                 cls.ROS_NODE_NAME = configData["node_name"]
             
@@ -85,4 +105,29 @@ class Constants:
                 cls.ROSBRIDGE_PORT = int(configData["rosbridge_port"])
 
             if "pub_frequency" in configData:
-                cls.PUB_FREQUENCY = int(configData["pub_frequency"])
\ No newline at end of file
+                cls.PUB_FREQUENCY = int(configData["pub_frequency"])
+
+            if "publish_pipeline" in configData:
+                pipelineData = configData["publish_pipeline"]
+                if "workers" in pipelineData:
+                    cls.PUB_WORKERS = int(pipelineData["workers"])
+                if "queue_size" in pipelineData:
+                    cls.PUB_QUEUE_SIZE = int(pipelineData["queue_size"])
+                if "overflow_policy" in pipelineData:
+                    cls.PUB_OVERFLOW_POLICY = pipelineData["overflow_policy"]
+                if "coalesce" in pipelineData:
+                    cls.PUB_COALESCE = list(pipelineData["coalesce"])
+
+            if "passthrough" in configData:
+                cls.PASSTHROUGH = list(configData["passthrough"])
+
+            if "tracing" in configData:
+                tracingData = configData["tracing"]
+                if "buffer_size" in tracingData:
+                    cls.TRACING_SIZE = int(tracingData["buffer_size"])
+                if "budget" in tracingData:
+                    cls.TRACING_BUDGET = float(tracingData["budget"])
+
+            if "msg_cache" in configData:
+                # A folder, or false to disable the cache
+                cls.MSG_CACHE = configData["msg_cache"] or None
\ No newline at end of file
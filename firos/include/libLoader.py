@@ -17,6 +17,7 @@
 import os
 import re
 import imp
+import copy
 import importlib
 import sys
 
@@ -24,6 +25,9 @@ import sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/genpy/src/")
 from genpy.generator import MsgGenerator
 from include.logger import Log
+from include.constants import Constants as C
+from include.msgCache import MsgCache
+from include.packageIndex import PackageIndex
 
 regex = re.compile(u'^(.*)(\\b.msg\\b)(.*)$')
 
@@ -37,12 +41,16 @@ class LibLoader:
         roslib. If every method fails FIROS will shutdown, since FIROS need the messages
         due to rospy beforehand. At least for The Subscriptions and Publishes defined in
         'topics.json'
+
+        The (crawled) packages on the system and the generated messages are kept in
+        the MsgCache (in C.MSG_CACHE), so that they are not retrieved again on the next start.
     '''
 
     # Our custom search path for genpy
-    searchpath = dict()
-    systemPath = dict()
+    searchpath = None
+    systemPath = None # The PackageIndex
     isGenerated = False # Check if Generated
+    cache = None # The MsgCache, see _getCache
 
 
     @staticmethod
@@ -54,7 +62,7 @@ class LibLoader:
             'namespace' still needs to be set to the actual package of the Message
         '''
         LibLoader._init_searchpath_for_available_msgs_on_system()
-        if len(LibLoader.searchpath) == 0:
+        if LibLoader.searchpath is None:
             # Initialize seachpath
             subdirs = [x[0] for x in os.walk(path)] # get all directories inside path (including itself)
             subdirs = subdirs[1:] # Remove reference to itself
@@ -73,44 +81,44 @@ class LibLoader:
     def _init_searchpath_for_available_msgs_on_system():
         ''' Initializes the systempath for genpy for available Messages. 
             To achieve this, we use the Environment-Variable 'ROS_PACKAGE_PATH'
-            which usually should be available.
+            which usually should be available. The msg-folders of the packages
+            are searched lazily by the PackageIndex.
         '''
 
-        if len(LibLoader.systemPath) != 0:
+        if LibLoader.systemPath is not None:
             # SystemPath is already initialized
             return 
 
         if "ROS_PACKAGE_PATH" not in os.environ:
             Log("WARNING", "The ENV 'ROS_PACKAGE_PATH' is not set. Unable to search for Messages on this system")
 
+        # The packages are only searched, when genpy requests them
+        LibLoader.systemPath = PackageIndex(os.environ.get('ROS_PACKAGE_PATH', ""), LibLoader._getCache())
 
-        pkgs_paths = os.environ.get('ROS_PACKAGE_PATH').split(":")
-        searchpath = dict()
-
-        for pkg_path in pkgs_paths:
-            # Retrieve all folder and Files from pkg_path which ends with ".msg"
-            result = [os.path.join(dp, f) for dp, dn, filenames in os.walk(pkg_path) for f in filenames if os.path.splitext(f)[1] == '.msg']
-            for found_msg in result:
-                # found_msg is like '/opt/.../share/PACKAGE_NAME/msg/THE_MESSAGE.msg'
-                # with very few exceptions (in case CMakeLists.txt tells Catkin to look for the Messages in another Folder)
-                # TODO DL Maybe we can look inside the parent folders for the nearest CMakeLists.txt-File. The pkg_name is then the 
-                # folder name, where the CMakeLists.txt-File is (always the case?)
-                if "/firos/" in  found_msg:
-                    # Skip the Project itself
-                    continue
-
-                path_parts = found_msg.split("/")
-                pkg_name = path_parts[path_parts.index("msg")-1]
 
-                if pkg_name in searchpath:
-                    # Skip already added package
-                    continue
+    @staticmethod
+    def _getCache():
+        ''' Returns the MsgCache or None, if it is disabled
+        '''
+        if LibLoader.cache is None and C.MSG_CACHE is not None:
+            LibLoader.cache = MsgCache(C.MSG_CACHE)
+        return LibLoader.cache
 
-                # Retrieve Package Folder and add it to the searchpath
-                path = '/'.join(path_parts[0:path_parts.index("msg")]) + "/msg"
-                searchpath[pkg_name] = [path]
 
-        LibLoader.systemPath = searchpath
+    @staticmethod
+    def _dependencies(clazz, search_path):
+        ''' Returns the Message-files of all (nested) Messages, which clazz depends on.
+            They are listed in the full text of the generated class
+        '''
+        msgFiles = []
+        for msgType in re.findall(u'^MSG: (\\S+)', clazz._full_text, re.MULTILINE):
+            package, name = msgType.split("/")
+            for folder in search_path.get(package, []):
+                msgFile = os.path.join(folder, name + ".msg")
+                if os.path.isfile(msgFile):
+                    msgFiles.append(msgFile)
+                    break
+        return msgFiles
 
 
     @staticmethod
@@ -139,6 +147,19 @@ class LibLoader:
             ##### 2: Try to load the Message given the Message-files inside FIROS/msgs
             current_path = os.path.dirname(os.path.abspath(__file__))
             msgsFold = current_path + "/../../msgs/" # FIROS/msgs - Folder
+
+            # Generated on a previous start (and the Message-files did not change)?
+            cache = LibLoader._getCache()
+            cachedModule = cache.getModule(msgType) if cache is not None else None
+            if cachedModule is not None:
+                try:
+                    module = imp.load_source(module_msg, cachedModule)
+                    clazz = getattr(module, module_msg)
+                    Log("INFO", "Message {}/{} loaded from the cache.".format(module_name, module_msg))
+                    return clazz
+                except Exception as e:
+                    Log("WARNING", "Could not load the cached Message {}/{}: {}".format(module_name, module_msg, e))
+
             search_path = LibLoader._init_search_path(msgsFold)
             search_path["namespace"] = module_name
             try:    
@@ -159,9 +180,14 @@ class LibLoader:
                 Log("WARNING", "Could not load Message {}/{}. Maybe it references other missing Messages?".format(module_name, module_msg))
             elif retcode == 0:
                 LibLoader.isGenerated = True
-                module = imp.load_source(module_msg, msgsFold + module_name + "/_" + module_msg + ".py")
+                generated = msgsFold + module_name + "/_" + module_msg + ".py"
+                module = imp.load_source(module_msg, generated)
                 clazz = getattr(module, module_msg)
                 Log("INFO", "Message {}/{} succesfully loaded.".format(module_name, module_msg))
+                if cache is not None:
+                    msgFiles = [msgsFold + module_name + "/" + module_msg + ".msg"]
+                    msgFiles.extend(LibLoader._dependencies(clazz, search_path))
+                    cache.putModule(msgType, generated, msgFiles)
                 return clazz 
 
 
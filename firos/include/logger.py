@@ -34,6 +34,7 @@ PRIORITIES = {
 
 _levelId = None
 handler = None
+_output = None
 
 def initLog():
     ''' Sets _levelID and handler
@@ -61,6 +62,12 @@ def initLog():
     else:
         handler = None
 
+def setOutput(stream):
+    ''' Sets the stream into which Log prints (None: stdout)
+    '''
+    global _output
+    _output = stream
+
 def Log(level, *args):
     ## \brief Logging function
     # \param Log Level (INFO, DEBUG, WARNING, ERROR, CRITICAL)
@@ -77,4 +84,7 @@ def Log(level, *args):
                 _logger.error(text)
             elif level == 'WARNING':
                 _logger.warning(text)
-        print(text)
+        if _output is None:
+            print(text)
+        else:
+            _output.write(text + "\n")
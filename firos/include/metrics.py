@@ -0,0 +1,162 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import bisect
+import threading
+
+
+# The upper bounds of the buckets of the histograms in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# The metrics, which are exposed: METRICS[name] = (type, help)
+METRICS = {
+    "firos_ros_messages_received_total": ("counter", "Messages received from ROS"),
+    "firos_ros_messages_throttled_total": ("counter", "Messages received from ROS and dropped because of pub_frequency"),
+    "firos_passthrough_bytes_total": ("counter", "Bytes of the serialized messages forwarded to the RawSinks (passthrough)"),
+    "firos_publish_seconds": ("histogram", "Duration of the publish of a message from ROS (conversion and request)"),
+    "firos_conversion_seconds": ("histogram", "Duration of the conversion of a message from ROS into an Entity"),
+    "firos_contextbroker_request_seconds": ("histogram", "Duration of the requests to the Context-Broker"),
+    "firos_contextbroker_errors_total": ("counter", "Requests to the Context-Broker, which failed"),
+    "firos_notifications_total": ("counter", "Notifications received from the Context-Broker"),
+    "firos_notification_seconds": ("histogram", "Duration of receiving and parsing a notification"),
+    "firos_entities_received_total": ("counter", "Entities received in notifications from the Context-Broker"),
+    "firos_ros_messages_published_total": ("counter", "Messages published into ROS"),
+    "firos_ros_publish_seconds": ("histogram", "Duration of the conversion and publish of a message into ROS"),
+}
+
+
+_local = threading.local()
+_shards = []            # The shards of all threads
+_shardsLock = threading.Lock()
+
+
+class _Shard(object):
+    ''' The metrics of one thread. Only this thread writes into its shard, so the hot path needs no lock.
+        The shards are summed up, when the metrics are read.
+    '''
+    __slots__ = ["counters", "histograms"]
+
+    def __init__(self):
+        self.counters = dict()      # counters[(name, topic)] -> value
+        self.histograms = dict()    # histograms[(name, topic)] -> [count of each bucket ..., count of +Inf, sum]
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shardsLock:
+            _shards.append(shard)
+    return shard
+
+
+def inc(name, topic=None, value=1):
+    ''' Increases the counter name (of the topic) by value
+    '''
+    counters = _shard().counters
+    key = (name, topic)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, topic, seconds):
+    ''' Adds a duration in seconds to the histogram name (of the topic)
+    '''
+    histograms = _shard().histograms
+    key = (name, topic)
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = [0] * (len(BUCKETS) + 2)
+    histogram[bisect.bisect_left(BUCKETS, seconds)] += 1
+    histogram[-1] += seconds
+
+
+def collect():
+    ''' Returns the sum of all shards: (counters, histograms), as in _Shard
+    '''
+    with _shardsLock:
+        shards = list(_shards)
+    counters = dict()
+    histograms = dict()
+    for shard in shards:
+        # Copied at once, the thread of the shard might add keys in the meantime
+        for key, value in list(shard.counters.items()):
+            counters[key] = counters.get(key, 0) + value
+        for key, histogram in list(shard.histograms.items()):
+            total = histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+            for i, value in enumerate(list(histogram)):
+                total[i] += value
+    return counters, histograms
+
+
+def render():
+    ''' Returns all metrics in the text format of Prometheus
+        (https://prometheus.io/docs/instrumenting/exposition_formats/)
+    '''
+    counters, histograms = collect()
+    lines = []
+    for name in sorted(METRICS):
+        metricType, description = METRICS[name]
+        lines.append("# HELP {} {}".format(name, description))
+        lines.append("# TYPE {} {}".format(name, metricType))
+        if metricType == "counter":
+            for (_, topic), value in _sorted(counters, name):
+                lines.append("{}{} {}".format(name, _labels(topic), _number(value)))
+        else:
+            for (_, topic), histogram in _sorted(histograms, name):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), histogram[:-1]):
+                    cumulative += count
+                    lines.append("{}_bucket{} {}".format(name, _labels(topic, le=bound), cumulative))
+                lines.append("{}_sum{} {}".format(name, _labels(topic), _number(histogram[-1])))
+                lines.append("{}_count{} {}".format(name, _labels(topic), cumulative))
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    ''' Removes all values (of all threads)
+    '''
+    with _shardsLock:
+        for shard in _shards:
+            shard.counters.clear()
+            shard.histograms.clear()
+
+
+def _sorted(values, name):
+    # Sorted by topic (None is the metric without topic)
+    return sorted(((key, value) for key, value in values.items() if key[0] == name), key=lambda item: item[0][1] or "")
+
+
+def _labels(topic, le=None):
+    labels = []
+    if topic is not None:
+        labels.append('topic="{}"'.format(_escape(topic)))
+    if le is not None:
+        labels.append('le="{}"'.format(le))
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
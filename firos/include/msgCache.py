@@ -0,0 +1,165 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import copy
+import json
+import shutil
+import hashlib
+import tempfile
+
+from include.logger import Log
+
+
+class MsgCache(object):
+    ''' A persistent cache on disk for the LibLoader. It contains:
+
+        - The index of the packages with messages on the system (package -> msg-folders), which
+          is otherwise retrieved by walking through the ROS_PACKAGE_PATH
+        - The python-modules, which genpy generated from .msg-files
+
+        Each entry saves the modification times of the folders and files it was created from and is
+        only used, if they are unchanged. Files with a changed modification time are hashed again,
+        so that an entry stays valid, if the content of its files did not change.
+
+        The generated modules are saved content-addressed: Their name is the hash of all .msg-files they
+        are generated from (the message and its dependencies).
+    '''
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, path):
+        ''' path: The folder of the cache (created if needed)
+        '''
+        self.path = path
+        self.manifest = dict(index=dict(), messages=dict())
+        try:
+            with open(os.path.join(path, self.MANIFEST)) as f:
+                manifest = json.load(f)
+            self.manifest["index"] = manifest.get("index", dict())
+            self.manifest["messages"] = manifest.get("messages", dict())
+        except (IOError, OSError, ValueError):
+            # No (or an invalid) cache yet
+            pass
+
+
+    def getIndex(self, key):
+        ''' Returns the cached index or None, if it is missing or outdated
+
+            key: The key of the index (e.g. the ROS_PACKAGE_PATH)
+        '''
+        entry = self.manifest["index"].get(key)
+        if entry is None:
+            return None
+        for folder, mtime in entry["folders"].items():
+            if _mtime(folder) != mtime:
+                return None
+        return copy.deepcopy(entry["index"])
+
+
+    def setIndex(self, key, index, folders):
+        ''' Saves the index
+
+            key: The key of the index (e.g. the ROS_PACKAGE_PATH)
+            index: The index (JSON-serializable)
+            folders: All folders, the index was retrieved from
+        '''
+        self.manifest["index"][key] = dict(index=copy.deepcopy(index), folders=dict((f, _mtime(f)) for f in folders))
+        self._save()
+
+
+    def getModule(self, msgType):
+        ''' Returns the path of the cached python-module of msgType or None, if it is missing or
+            one of its .msg-files changed
+        '''
+        entry = self.manifest["messages"].get(msgType)
+        if entry is None:
+            return None
+        modulePath = os.path.join(self.path, entry["module"])
+        if not os.path.isfile(modulePath):
+            return None
+
+        changed = False
+        for msgFile, (mtime, digest) in entry["files"].items():
+            current = _mtime(msgFile)
+            if current is None:
+                return None
+            if current != mtime:
+                # Only touched, or actually changed?
+                if _hash(msgFile) != digest:
+                    return None
+                entry["files"][msgFile] = [current, digest]
+                changed = True
+        if changed:
+            self._save()
+        return modulePath
+
+
+    def putModule(self, msgType, generatedPath, msgFiles):
+        ''' Saves the generated python-module of msgType
+
+            msgType: The type of the message, e.g. "my_msgs/Robot"
+            generatedPath: The path of the module, generated by genpy
+            msgFiles: The .msg-files, the module was generated from (the message and its dependencies)
+        '''
+        files = dict((msgFile, [_mtime(msgFile), _hash(msgFile)]) for msgFile in msgFiles)
+        key = hashlib.sha1(json.dumps(sorted((msgType, d) for _, d in files.values())).encode("utf-8")).hexdigest()
+        module = "{}_{}.py".format(msgType.replace("/", "_"), key)
+        try:
+            _makeDirs(self.path)
+            shutil.copyfile(generatedPath, os.path.join(self.path, module))
+        except (IOError, OSError) as e:
+            Log("WARNING", "Could not cache the generated message {}: {}".format(msgType, e))
+            return
+        self.manifest["messages"][msgType] = dict(module=module, files=files)
+        self._save()
+
+
+    def _save(self):
+        ''' Writes the manifest (atomically, so that another FIROS never reads a partial manifest)
+        '''
+        try:
+            _makeDirs(self.path)
+            fd, tmpPath = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.manifest, f)
+            os.rename(tmpPath, os.path.join(self.path, self.MANIFEST))
+        except (IOError, OSError) as e:
+            Log("WARNING", "Could not save the message cache in {}: {}".format(self.path, e))
+
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _makeDirs(path):
+    if not os.path.isdir(path):
+        os.makedirs(path)
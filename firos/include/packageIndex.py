@@ -0,0 +1,118 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+
+
+class PackageIndex(dict):
+    ''' The search path of genpy for the messages on this system (package -> [msg-folder]).
+
+        Instead of walking through every file in the ROS_PACKAGE_PATH beforehand, the msg-folder
+        of a package is only searched, when genpy (or FIROS) asks for the package. So only the
+        packages of the configured topics (and the packages they depend on) are resolved.
+
+        A package is first looked up directly in each path (e.g. '/opt/ros/melodic/share/sensor_msgs/msg').
+        Only if this fails (e.g. for nested packages in a workspace), the paths are crawled once for
+        all packages. The crawl stops at each package (a folder with a 'package.xml') and its
+        result is kept in the MsgCache.
+    '''
+
+    def __init__(self, rosPackagePath, cache=None):
+        ''' rosPackagePath: The ROS_PACKAGE_PATH (paths separated by ':')
+            cache: The MsgCache, where the crawled packages are kept (optional)
+        '''
+        dict.__init__(self)
+        self.rosPackagePath = rosPackagePath
+        self.paths = [path for path in rosPackagePath.split(":") if path]
+        self.cache = cache
+        self.missing = set()    # Packages, which are not on this system
+        self.crawled = None     # All packages with messages, after the crawl
+
+
+    def __contains__(self, package):
+        return self._lookup(package) is not None
+
+
+    def __missing__(self, package):
+        folders = self._lookup(package)
+        if folders is None:
+            raise KeyError(package)
+        return folders
+
+
+    def get(self, package, default=None):
+        folders = self._lookup(package)
+        return default if folders is None else folders
+
+
+    def _lookup(self, package):
+        ''' Returns the msg-folders of package or None, if it has no messages on this system
+        '''
+        if dict.__contains__(self, package):
+            return dict.__getitem__(self, package)
+        if package in self.missing:
+            return None
+
+        folders = self._find(package)
+        if folders is None:
+            self.missing.add(package)
+            return None
+        self[package] = folders
+        return folders
+
+
+    def _find(self, package):
+        for path in self.paths:
+            folder = os.path.join(path, package, "msg")
+            if "/firos/" not in folder and os.path.isdir(folder):
+                return [folder]
+
+        if self.crawled is None:
+            self.crawled = self._crawl()
+        folders = self.crawled.get(package)
+        return list(folders) if folders is not None else None
+
+
+    def _crawl(self):
+        ''' Crawls the ROS_PACKAGE_PATH for all packages with messages (or takes them from the cache)
+        '''
+        if self.cache is not None:
+            packages = self.cache.getIndex(self.rosPackagePath)
+            if packages is not None:
+                return packages
+
+        packages = dict()
+        folders = [] # All crawled folders, if one of them changes, the cached packages are outdated
+        for path in self.paths:
+            for dp, dn, filenames in os.walk(path):
+                folders.append(dp)
+                if "package.xml" in filenames:
+                    # A package, its sub folders are not crawled
+                    dn[:] = []
+                    package = os.path.basename(dp)
+                    folder = os.path.join(dp, "msg")
+                    if "/firos/" not in folder and package not in packages and os.path.isdir(folder):
+                        packages[package] = [folder]
+
+        if self.cache is not None:
+            self.cache.setIndex(self.rosPackagePath, packages, folders)
+        return packages
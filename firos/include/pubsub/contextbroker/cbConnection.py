@@ -0,0 +1,146 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+try:
+    from urllib3.util.retry import Retry
+except ImportError:
+    # Older requests-versions only ship a vendored urllib3
+    from requests.packages.urllib3.util.retry import Retry
+
+from include.logger import Log
+
+
+class CbConnection(object):
+    ''' The CbConnection is the HTTP-Transport to the ContextBroker, which is shared
+        between CbPublisher and CbSubscriber. It keeps a pool of persistent (keep-alive)
+        connections, so that not every request to the ContextBroker needs a new TCP-Handshake.
+
+        The pool is configured via the optional "connection"-entry in the
+        "contextbroker"-configuration (config.json):
+
+            "connection": {
+                "pool_size": 10,
+                "connect_timeout": 5,
+                "read_timeout": 10,
+                "retries": 3,
+                "backoff_factor": 0.1
+            }
+
+        Retries are only done on connection-errors and (for idempotent requests)
+        on the status codes in RETRY_STATUS.
+    '''
+
+    # Status codes of the ContextBroker (or a proxy in front of it), which are retried
+    RETRY_STATUS = [502, 503, 504]
+
+    # The shared Instance, retrieved via 'getConnection'
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    def __init__(self, configData=None):
+        ''' Set up the pooled session with the configuration in configData["connection"]
+
+            configData: The "contextbroker"-configuration of config.json
+        '''
+        conf = dict()
+        if configData is not None and "connection" in configData:
+            conf = configData["connection"]
+
+        self.poolSize = int(conf.get("pool_size", 10))
+        self.timeout = (float(conf.get("connect_timeout", 5)), float(conf.get("read_timeout", 10)))
+        self.retries = int(conf.get("retries", 3))
+        self.backoffFactor = float(conf.get("backoff_factor", 0.1))
+
+        retry = Retry(total=self.retries,
+                    backoff_factor=self.backoffFactor,
+                    status_forcelist=self.RETRY_STATUS,
+                    raise_on_status=False)
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.poolSize, max_retries=retry, pool_block=False)
+
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+
+    @classmethod
+    def getConnection(cls, configData=None):
+        ''' Returns the shared CbConnection. The first caller initializes it
+            with its configuration.
+
+            configData: The "contextbroker"-configuration of config.json
+        '''
+        with cls._instanceLock:
+            if cls._instance is None:
+                cls._instance = cls(configData)
+            return cls._instance
+
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        ''' Sends the request via the pooled session. The configured timeout is
+            used, if none is given explicitly
+        '''
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+
+    def getStatistics(self):
+        ''' Returns the statistics of the connection pool. A request which
+            needed a new connection is counted as a 'miss', a request on an already
+            opened (kept alive) connection as a 'hit'.
+        '''
+        numRequests = 0
+        numConnections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                numRequests += pool.num_requests
+                numConnections += pool.num_connections
+
+        return dict(requests=numRequests,
+                    hits=max(numRequests - numConnections, 0),
+                    misses=numConnections,
+                    pool_size=self.poolSize)
+
+
+    def close(self):
+        ''' Logs the pool statistics and closes all pooled connections
+        '''
+        stats = self.getStatistics()
+        Log("INFO", "Context-Broker connection pool: {} requests, {} hits, {} misses".format(
+            stats["requests"], stats["hits"], stats["misses"]))
+        self.session.close()
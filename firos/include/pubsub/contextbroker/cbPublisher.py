@@ -20,14 +20,28 @@ __maintainer__ = "Dominik Lux"
 __version__ = "0.0.1a"
 __status__ = "Developement"
 
+import re
 import json
-import requests
 import os
+import time
+import array
+import threading
+from collections import OrderedDict
+try:
+    # Python 3
+    from urllib.parse import quote
+except ImportError:
+    # Python 2
+    from urllib import quote
 
 from include.logger import Log
 from include.constants import Constants as C
-from include.FiwareObjectConverter.objectFiwareConverter import ObjectFiwareConverter
+from include.startup import runBounded
+from include import metrics
+from include import tracing
+from include.ros.ngsiSerializer import NgsiSerializer
 from include.pubsub.genericPubSub import Publisher
+from include.pubsub.contextbroker.cbConnection import CbConnection
 
 
 
@@ -37,7 +51,7 @@ class CbPublisher(Publisher):
         It creates not creaed Entities and updates their attributes via 'publishToCB'.
         On Shutdown the tracked Entities are deleted. 
 
-        Also the rawMsg is converted here via the Object Converter
+        Also the rawMsg is converted here via the NgsiSerializer (Object Converter)
 
         THIS IS THE ONLY FILE WHICH OPERATES ON /v2/entities
 
@@ -50,6 +64,15 @@ class CbPublisher(Publisher):
     CB_HEADER = {'Content-Type': 'application/json'}
     CB_BASE_URL = None
 
+    # Arrays with at least this length are compared via their hash in the delta mode
+    DELTA_HASH_LENGTH = 256
+
+    # The maximum number of Entities, which are created in one request by 'prepare'
+    PREPARE_BATCH_SIZE = 100
+
+    # The words of an error description of the ContextBroker, one of them might be the id of an Entity
+    DESCRIPTION_WORDS = re.compile("[^\\s,;:\\[\\]{}()\"']+")
+
     def __init__(self):
         ''' Lazy Initialization of CB_BASE_URL
             And set up the configuration via the config we received
@@ -71,6 +94,31 @@ class CbPublisher(Publisher):
 
         self.data = data
         self.CB_BASE_URL = "http://{}:{}/v2/entities/".format(data["address"], data["port"])
+        self.CB_BATCH_URL = "http://{}:{}/v2/op/update".format(data["address"], data["port"])
+        self.connection = CbConnection.getConnection(data)
+
+        # Optional: Collect the updates of all topics and send them together
+        self.batching = "batch" in data
+        if self.batching:
+            self.batchWindow = float(data["batch"].get("window", 50)) / 1000.0 # In Milliseconds
+            self.batchMaxSize = int(data["batch"].get("max_size", 100))
+            self.batchStopped = False
+            self.batchPending = OrderedDict() # batchPending[topic] -> (Entity-JSON, trace)
+            self.batchCond = threading.Condition()
+            self.batchThread = threading.Thread(target=self._batchRoutine, name="firos-cb-batch")
+            self.batchThread.daemon = True
+            self.batchThread.start()
+
+        # Optional: Send primitive arrays of some topics packed (base64) instead of JSON-Arrays
+        self.packedArrays = [(re.compile(regex), fields) for regex, fields in data.get("packed_arrays", {}).items()]
+        self.packedFields = dict() # packedFields[topic] -> set of fields to pack
+
+        # Optional: Only send the changed attributes on updates
+        self.delta = "delta" in data
+        if self.delta:
+            self.deltaFullRefresh = float(data["delta"].get("full_refresh", 30)) # In Seconds
+            self.deltaFingerprints = dict() # deltaFingerprints[topic] -> {attribute: fingerprint} of the last update
+            self.deltaLastFull = dict()     # deltaLastFull[topic] -> time of the last full update
 
 
     def publish(self, topic, rawMsg, msgDefintionDict):
@@ -90,55 +138,258 @@ class CbPublisher(Publisher):
         if self.noConf:
             return
 
+        start = time.time()
+        try:
+            self._publish(topic, rawMsg, msgDefintionDict)
+        finally:
+            metrics.observe("firos_publish_seconds", topic, time.time() - start)
+
+
+    def _publish(self, topic, rawMsg, msgDefintionDict):
+        ''' Creates or updates the Entity of the topic (see publish)
+        '''
+        if self.batching:
+            # The Entity is created or updated by the next batch (actionType 'append')
+            self.posted_history[topic] = rawMsg
+            jsonStr = self._entityJSON(topic, rawMsg, msgDefintionDict)
+            # The trace is finished by the batch-Thread, after it was sent
+            trace = tracing.detach()
+            with self.batchCond:
+                # Only the newest update of a topic is needed in a batch
+                self.batchPending.pop(topic, None)
+                self.batchPending[topic] = (jsonStr, trace)
+                self.batchCond.notify()
+            return
 
         # if struct not initilized, intitilize it even on ContextBroker!
         if topic not in self.posted_history:
             self.posted_history[topic] = rawMsg
+            if self.delta:
+                # The creation is the first full update
+                self._changedAttributes(topic, rawMsg)
             
-            obj = {s: getattr(rawMsg, s, None) for s in rawMsg.__slots__}
-            obj["type"] = rawMsg._type.replace("/", "%2F") # OCB Specific!!
-            obj["id"] = (topic).replace("/", ".") # OCB Specific!!
-            jsonStr = ObjectFiwareConverter.obj2Fiware(obj, 
-                        ind=None, 
-                        dataTypeDict=msgDefintionDict[topic],  
-                        ignorePythonMetaData=True, 
-                        encode=True)
-            response = requests.post(self.CB_BASE_URL, 
-                        data=jsonStr, 
-                        headers=self.CB_HEADER)
+            jsonStr = self._entityJSON(topic, rawMsg, msgDefintionDict)
+            response = self._post(self.CB_BASE_URL, jsonStr, topic)
             self._responseCheck(response, attrAction=0, topEnt=topic)
             return
 
         # Replace previous rawMsg with current one
         self.posted_history[topic] = rawMsg
 
+        # In delta mode, only changed attributes are updated
+        attrs = None
+        if self.delta:
+            attrs = self._changedAttributes(topic, rawMsg)
+            if attrs is not None and not attrs:
+                # Nothing changed
+                return
+
         # Create Update-JSON
-        obj = {s: getattr(rawMsg, s, None) for s in rawMsg.__slots__}
-        obj["type"] = rawMsg._type.replace("/", "%2F") # OCB Specific!!
-        obj["id"] = (topic).replace("/", ".") # OCB Specific!!
-        jsonStr = ObjectFiwareConverter.obj2Fiware(obj, 
-                ind=None, 
-                dataTypeDict=msgDefintionDict[topic],  
-                ignorePythonMetaData=True, 
-                showIdValue=False, 
-                encode=True) 
-        #print(jsonStr)
+        jsonStr = self._entityJSON(topic, rawMsg, msgDefintionDict, showIdValue=False, attrs=attrs)
 
         # Update attribute on ContextBroker
-        response = requests.post(self.CB_BASE_URL + obj["id"] + "/attrs", 
-                    data=jsonStr, 
-                    headers=self.CB_HEADER)
+        response = self._post(self.CB_BASE_URL + topic.replace("/", ".") + "/attrs", jsonStr, topic) # OCB Specific!!
         self._responseCheck(response, attrAction=1, topEnt=topic)
+        if self.delta and not response.ok:
+            # We do not know what the ContextBroker has, the next update is a full one
+            self.deltaFingerprints.pop(topic, None)
+
+
+    def prepare(self, topicList, topicTypes, msgDefintionDict):
+        ''' Creates the Entities of all topics at startup, before their first message is received.
+            They are created without attributes via /v2/op/update (up to PREPARE_BATCH_SIZE Entities in
+            one request) and the requests are sent concurrently (at most 'pool_size' of the connection).
+            The first message of a topic is then only an update of the Entity.
+
+            topicList: The topics, which are published
+            topicTypes: The ROS-Message-Type of each topic
+            msgDefintionDict: The Definition as obtained directly from ROS-Messages
+        '''
+        # Do nothing if no Configuratuion
+        if self.noConf:
+            return
+
+        topics = [topic for topic in topicList if topic not in self.posted_history]
+        batches = [topics[i:i + self.PREPARE_BATCH_SIZE] for i in range(0, len(topics), self.PREPARE_BATCH_SIZE)]
+
+        def createEntities(batch):
+            # The same id and type as in '_entityJSON' (encoded by the NgsiSerializer)
+            entities = [dict(id=quote(topic.replace("/", "."), safe=''), # OCB Specific!!
+                             type=quote(topicTypes[topic].replace("/", "%2F"), safe='')) # OCB Specific!!
+                        for topic in batch]
+            response = self._post(self.CB_BATCH_URL, json.dumps(dict(actionType="append", entities=entities)))
+            self._responseCheck(response, attrAction=0, topEnt=batch)
+            return response.ok
+
+        for batch, created in zip(batches, runBounded(createEntities, batches, self.connection.poolSize)):
+            if created is True:
+                for topic in batch:
+                    self.posted_history[topic] = None
+            elif isinstance(created, Exception):
+                Log("WARNING", "Could not create Entities {} in Contextbroker : {}".format(batch, created))
+
+
+    def _entityJSON(self, topic, rawMsg, msgDefintionDict, showIdValue=True, attrs=None):
+        ''' Converts the rawMsg into the Entity-JSON of the ContextBroker.
+            With showIdValue the id and type are added (needed for creation), otherwise only
+            the attributes are converted (needed for updates). With attrs only these attributes
+            are converted.
+        '''
+        start = time.time()
+        jsonStr = NgsiSerializer.obj2Fiware(rawMsg,
+                    (topic).replace("/", "."), # OCB Specific!!
+                    rawMsg._type.replace("/", "%2F"), # OCB Specific!!
+                    msgDefintionDict[topic],
+                    showIdValue=showIdValue,
+                    encode=True,
+                    packed=self._packedFields(topic),
+                    attrs=attrs)
+        metrics.observe("firos_conversion_seconds", topic, time.time() - start)
+        tracing.mark("converted")
+        return jsonStr
+
+
+    def _post(self, url, jsonStr, topic=None):
+        ''' Posts jsonStr to the ContextBroker and records the duration of the request (of the topic)
+        '''
+        tracing.mark("sent")
+        start = time.time()
+        try:
+            return self.connection.post(url, data=jsonStr, headers=self.CB_HEADER)
+        finally:
+            metrics.observe("firos_contextbroker_request_seconds", topic, time.time() - start)
+            tracing.mark("acknowledged")
+
+
+    def _changedAttributes(self, topic, rawMsg):
+        ''' Returns the attributes of rawMsg, which changed since the last update of the topic.
+            Returns None, if a full update is needed (no previous update or "full_refresh" passed)
+        '''
+        fingerprints = dict()
+        for key in rawMsg.__slots__:
+            if key != "type" and key != "id" and not key.startswith("_"):
+                fingerprints[key] = self._fingerprint(getattr(rawMsg, key, None))
+
+        previous = self.deltaFingerprints.get(topic)
+        self.deltaFingerprints[topic] = fingerprints
+
+        now = time.time()
+        if previous is None or now - self.deltaLastFull.get(topic, 0) >= self.deltaFullRefresh:
+            self.deltaLastFull[topic] = now
+            return None
+        return set(key for key in fingerprints if key not in previous or previous[key] != fingerprints[key])
+
+
+    def _fingerprint(self, value):
+        ''' Returns something comparable of an attribute, by value. Nested messages are
+            fingerprinted by their fields and large arrays are not kept (and compared
+            element by element), only their hash
+        '''
+        if hasattr(value, "tobytes"):
+            # numpy.ndarray or array.array
+            return hash(value.tobytes())
+        t = type(value)
+        if t is float and value != value:
+            # NaN is never equal to itself
+            return "NaN"
+        if t is list or t is tuple:
+            if len(value) >= self.DELTA_HASH_LENGTH:
+                try:
+                    if type(value[0]) is float:
+                        # Also stable with NaN (their hash is not on newer Python versions)
+                        return (len(value), hash(array.array('d', value).tobytes()))
+                    if not hasattr(value[0], "__slots__"):
+                        return (len(value), hash(tuple(value)))
+                except (TypeError, OverflowError):
+                    # Not only numbers or not hashable
+                    pass
+            return tuple(self._fingerprint(item) for item in value)
+        if t is bytes and len(value) >= self.DELTA_HASH_LENGTH:
+            return (len(value), hash(value))
+        if hasattr(value, "__slots__"):
+            # A nested ROS-Message
+            return tuple(self._fingerprint(getattr(value, key, None)) for key in value.__slots__)
+        return value
+
+
+    def _packedFields(self, topic):
+        ''' Returns the fields of the topic, which are packed (see "packed_arrays")
+        '''
+        if topic not in self.packedFields:
+            fields = set()
+            for regex, topicFields in self.packedArrays:
+                if regex.search(topic):
+                    fields.update(topicFields)
+            self.packedFields[topic] = fields
+        return self.packedFields[topic]
+
+
+    def _batchRoutine(self):
+        ''' The Routine of the batch-Thread. After the first update is pending, it waits
+            the batch window (or until max_size updates of different topics are pending).
+            Then all pending updates are sent in one request via /v2/op/update
+        '''
+        while True:
+            with self.batchCond:
+                while not self.batchPending and not self.batchStopped:
+                    self.batchCond.wait()
+                if self.batchStopped:
+                    return
+
+                deadline = time.time() + self.batchWindow
+                while len(self.batchPending) < self.batchMaxSize and not self.batchStopped:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.batchCond.wait(remaining)
+                if self.batchStopped:
+                    return
+
+                batch = self.batchPending
+                self.batchPending = OrderedDict()
+
+            # 'append' creates not existing Entities and updates/adds the attributes of existing ones
+            jsonStr = '{"actionType": "append", "entities": [' + ", ".join(entity for entity, _ in batch.values()) + ']}'
+            traces = [trace for _, trace in batch.values() if trace is not None]
+            for trace in traces:
+                trace.mark("sent")
+            try:
+                response = self._post(self.CB_BATCH_URL, jsonStr)
+                self._responseCheck(response, attrAction=3, topEnt=list(batch.keys()))
+            except Exception as ex:
+                Log("ERROR", "Could not send batch update to Contextbroker for topics: {} : {}".format(list(batch.keys()), ex))
+            finally:
+                for trace in traces:
+                    tracing.finish(trace, "acknowledged", detached=True)
 
 
     def unpublish(self):
         ''' 
             Removes all previously tracked topics on ContextBroker
             This method also gets automaticall called, someone sent Firos the Shutdown Signal
+
+            With batching, updates which are still pending are dropped (not sent),
+            since their Entities are deleted anyway.
+
+            This is the last call on the ContextBroker, so the connection pool is closed here
         '''
+        # Do nothing if no Configuratuion
+        if self.noConf:
+            return
+
+        if self.batching:
+            # Stop the batches (dropping the pending updates), otherwise the Entities would be created again
+            with self.batchCond:
+                self.batchStopped = True
+                self.batchPending.clear()
+                self.batchCond.notify()
+            self.batchThread.join(self.connection.timeout[1])
+
         for idd in self.posted_history.keys():
-            response = requests.delete(self.CB_BASE_URL + idd.replace("/", ".")) # OCB Specific!!
+            response = self.connection.delete(self.CB_BASE_URL + idd.replace("/", ".")) # OCB Specific!!
             self._responseCheck(response, attrAction=2, topEnt=idd)
+
+        self.connection.close()
         
         
 
@@ -147,16 +398,38 @@ class CbPublisher(Publisher):
         ''' Check if Response is ok (2XX and some 3XX). If not print an individual Error.
             
             response: the actual response
-            attrAction: One of [0, 1, 2]  which maps to -> [Creation, Update, Deletion]
-            topEnt: the String of an Entity or a topic, which was used
+            attrAction: One of [0, 1, 2, 3]  which maps to -> [Creation, Update, Deletion, Batch-Update]
+            topEnt: the String of an Entity or a topic, which was used (a list of topics for Batch-Updates)
         '''
         if not response.ok:
+            if attrAction != 3:
+                metrics.inc("firos_contextbroker_errors_total", None if isinstance(topEnt, list) else topEnt)
             if attrAction == 0:
                 Log("WARNING", "Could not create Entitiy {} in Contextbroker :".format(topEnt))
                 Log("WARNING", response.content)
             elif attrAction == 1:
                 Log("ERROR", "Cannot update attributes in Contextbroker for topic: {} :".format(topEnt))
                 Log("ERROR", response.content)
+            elif attrAction == 3:
+                failed = self._failedTopics(response, topEnt)
+                for topic in (failed or [None]):
+                    metrics.inc("firos_contextbroker_errors_total", topic)
+                for topic in (failed or topEnt):
+                    Log("ERROR", "Cannot update Entity in Contextbroker for topic: {} :".format(topic))
+                Log("ERROR", response.content)
             else:
                 Log("WARNING", "Could not delete Entitiy {} in Contextbroker :".format(topEnt))
-                Log("WARNING", response.content)
\ No newline at end of file
+                Log("WARNING", response.content)
+
+
+    def _failedTopics(self, response, topics):
+        ''' Returns the topics of a failed batch, whose Entities are named in the description
+            of the error (e.g. "do not exist: .robot1.cmd - [ entity itself ]"). The ids need to
+            match exactly, so that ".robot1.cmd" is not mistaken for ".robot1.cmd_vel"
+        '''
+        try:
+            description = str(response.json().get("description", ""))
+        except (ValueError, AttributeError):
+            return []
+        words = set(self.DESCRIPTION_WORDS.findall(description))
+        return [topic for topic in topics if quote(topic.replace("/", "."), safe='') in words] # OCB Specific!!
@@ -20,26 +20,34 @@ __maintainer__ = "Dominik Lux"
 __version__ = "0.0.1a"
 __status__ = "Developement"
 
-import time
-import requests
 import json
+import time
 import threading
 try:
     # Python 3
     import _thread as thread
     from http.server import BaseHTTPRequestHandler
-    from http.server import HTTPServer
 except ImportError:
     # Pyrhon 2
     import thread
     from BaseHTTPServer import BaseHTTPRequestHandler
-    from BaseHTTPServer import HTTPServer
+
+try:
+    # Optional, parses the notifications a lot faster than the json-module
+    from orjson import loads as jsonLoads
+except ImportError:
+    jsonLoads = json.loads
 
 from include.constants import Constants as C
 from include.logger import Log
+from include import metrics
+from include import tracing
 from include.pubsub.genericPubSub import Subscriber
+from include.pubsub.contextbroker.cbConnection import CbConnection
+from include.pubsub.contextbroker.subscriptionManager import SubscriptionManager
 from include.ros.topicHandler import RosTopicHandler
-from include.FiwareObjectConverter.objectFiwareConverter import ObjectFiwareConverter
+from include.pubsub.publishPipeline import PublishPipeline, BLOCK
+from include.server.pooledHTTPServer import PooledHTTPServer
 
 
 
@@ -53,14 +61,12 @@ class CbSubscriber(Subscriber):
         this Objects also converts the received data from ContextBroker
         back into a Python-Object. 
 
-        Here each topic of an robot is subscribed seperately.
+        Here each topic of an robot is subscribed seperately (or all topics of a message type
+        together, with "id_pattern"). The subscriptions are maintained by the SubscriptionManager.
 
-        THIS IS THE ONLY FILE WHICH OPERATES ON /v2/subscriptions
+        THIS IS THE ONLY FILE WHICH OPERATES ON /v2/subscriptions (via the SubscriptionManager)
     '''
 
-    # Saves the subscriptions IDs returned from ContextBroker.
-    # Follwoing Structure: subscriptionIds[ROBOT_ID][TOPIC] returns a sub-Id in String
-    subscriptionIds = {}
     CB_BASE_URL = None
     FIROS_NOTIFY_URL = None
 
@@ -101,10 +107,15 @@ class CbSubscriber(Subscriber):
         else:
             data["subscription"]["subscription_refresh_delay"] = float(data["subscription"]["subscription_refresh_delay"])
 
+        data["subscription"]["id_pattern"] = bool(data["subscription"].get("id_pattern", False))
+        data["subscription"]["workers"] = int(data["subscription"].get("workers", 4))
+
 
         self.data = data
         self.serverIsRunning = False
+        self.subscriptions = None
         self.CB_BASE_URL = "http://{}:{}".format(data["address"], data["port"])
+        self.connection = CbConnection.getConnection(data)
 
 
     def subscribe(self, topicList, topicTypes, msgDefintions):
@@ -112,7 +123,7 @@ class CbSubscriber(Subscriber):
             msgDefintions: The Messages-Definitions from ROS
 
             This method only gets called once (or multiple times, if we get a reset!)! So we need to make sure, that in this file
-            'RosTopicHandler.publish' is called somehow independently after some Signal arrived (from elsewhere).
+            'RosTopicHandler.publishEntity' is called somehow independently after some Signal arrived (from elsewhere).
 
             Keep in mind that Firos can get a Reset-Signal, in this case, this method is called again. Make sure that this method can get called 
             multiple times!
@@ -121,14 +132,15 @@ class CbSubscriber(Subscriber):
             so that the Context-Broker can notify us after it received a Message. 
 
             In addition to that, the Context-Broker needs to know how to notify us. This is solved by adding subscriptions into 
-            the Context-Broker, which we need to manually maintain. Again we start a Thread for each Topic which handles the Subscriptions
+            the Context-Broker, which we need to manually maintain. This is done by the SubscriptionManager, which renews all
+            subscriptions in one thread.
 
 
 
             So After everything is set up, Firos can be notified, explicitly here the method:
             """CBServer.CBHandler.do_post""" is invoked by Notification. This method handles the Conversion back into a conform "ROS-Message".
 
-            After we did the Conversion, we simply need to call  """RosTopicHandler.publish"""
+            After we did the Conversion, we simply need to call  """RosTopicHandler.publishEntity"""
 
 
         '''
@@ -139,18 +151,35 @@ class CbSubscriber(Subscriber):
         ### Start the HTTPServer and wait until it is ready!
         if not self.serverIsRunning:
             server_ready = threading.Event()
-            self.server = CBServer(server_ready)
+            self.server = CBServer(server_ready, self.data)
             thread.start_new_thread(self.server.start, ())
             self.serverIsRunning = True
             server_ready.wait()
 
 
-        # If not already subscribed, start a new thread which handles the subscription for each topic for an robot.
-        # And only If the topic list is not empty!
+        # The subscriptions are created (and renewed) by the SubscriptionManager in its own thread
+        if self.subscriptions is None:
+            conf = self.data["subscription"]
+            self.subscriptions = SubscriptionManager(self.connection, self.CB_BASE_URL,
+                    "http://{}:{}".format(C.EP_SERVER_ADRESS, self.server.port),
+                    length=conf["subscription_length"],
+                    refreshDelay=conf["subscription_refresh_delay"],
+                    throttling=conf["throttling"],
+                    idPattern=conf["id_pattern"],
+                    workers=conf["workers"])
+
+        if len(topicList) > 0:
+            Log("INFO", "Subscribing on Context-Broker to topics: " + str(list(topicList)))
         for topic in topicList:
-            if topic not in self.subscriptionIds:
-                Log("INFO", "Subscribing on Context-Broker to topics: " + str(list(topicList)))
-                thread.start_new_thread(self.subscribeThread, (topic, topicTypes, msgDefintions)) #Start Thread via subscription         
+            attrs = list(msgDefintions[topic].keys())
+            if C.TRACING_SIZE > 0:
+                # The origin of the traces of the notifications
+                attrs.append("dateModified")
+            self.subscriptions.subscribe(topic, topicTypes[topic], attrs)
+
+        # The subscriptions are created concurrently, wait until they are done (FIROS then receives notifications)
+        if not self.subscriptions.wait(sum(self.connection.timeout)):
+            Log("WARNING", "Not all subscriptions are created yet, they are created in the background")
 
 
     def unsubscribe(self):
@@ -166,93 +195,9 @@ class CbSubscriber(Subscriber):
         self.server.close()
 
         # Unsubscribe to all Topics
-        for topic in self.subscriptionIds:
-            response = requests.delete(self.CB_BASE_URL + self.subscriptionIds[topic])
-            self._checkResponse(response, subID=self.subscriptionIds[topic])
-
-
-
-    ####################################################
-    ########## Helpful Classes and Methods #############
-    ####################################################
-
-    def subscribeThread(self, topic, topicTypes, msgDefintions):
-        ''' 
-            A Subscription-Thread. Its Life-Cycle is as follows:
-            -> Subscribe -> Delete old Subs-ID -> Save new Subs-ID -> Wait ->
-
-            topic: The Topic (string) to subscribe to.
-        '''
-        while True:
-            # Subscribe
-            jsonData = self.subscribeJSONGenerator(topic, topicTypes, msgDefintions)
-            response = requests.post(self.CB_BASE_URL + "/v2/subscriptions", data=jsonData, headers={'Content-Type': 'application/json'})
-            self._checkResponse(response, created=True, robTop=topic)
-
-            if 'Location' in response.headers:
-                newSubID = response.headers['Location'] # <- get subscription-ID
-            else:
-                Log("WARNING",  "Firos was not able to subscribe to topic: {}".format(topic))
-
-            # Unsubscribe
-            if topic in self.subscriptionIds:
-                response = requests.delete(self.CB_BASE_URL + self.subscriptionIds[topic])
-                self._checkResponse(response, subID=self.subscriptionIds[topic])
-                
-            # Save new ID
-            self.subscriptionIds[topic] = newSubID
-
-            # Wait
-            time.sleep(int(self.data["subscription"]["subscription_length"] * self.data["subscription"]["subscription_refresh_delay"])) # sleep Length * Refresh-Rate (where 0 < Refresh-Rate < 1)
-            Log("INFO", "Refreshing Subscription for topic: " + str(topic))
-
-
-    def subscribeJSONGenerator(self, topic, topicTypes, msgDefintions):
-        ''' 
-            This method returns the correct JSON-format to subscribe to the ContextBroker. 
-            The Expiration-Date/Throttle and Type of topics is retreived here via the configuration we got
-
-            topic: The actual topic to subscribe to.
-        '''
-        # This struct correspondes to following JSON-format:
-        # https://fiware-orion.readthedocs.io/en/master/user/walkthrough_apiv2/index.html#subscriptions
-        struct =  {
-            "subject": {
-                "entities": [
-                    {
-                    "id": str(topic).replace("/", "."),  # OCB Specific!!
-                    "type": topicTypes[topic].replace("/", "%2F") # OCB Specific!!
-                    }
-                ]
-            },
-            "notification": {
-            "http": {
-                "url": "http://{}:{}".format(C.EP_SERVER_ADRESS, self.server.port)
-            },
-            "attrs": list(msgDefintions[topic].keys())
-            },
-            "expires": time.strftime("%Y-%m-%dT%H:%M:%S.00Z", time.gmtime(time.time() + self.data["subscription"]["subscription_length"])), # ISO 8601
-            "throttling": self.data["subscription"]["throttling"]  
-            }
-        return json.dumps(struct)
-
-
-    def _checkResponse(self, response, robTop=None, subID=None, created=False):
-        ''' 
-            If a not good response from ContextBroker is received, the error will be printed.
-    
-            response: The response from ContextBroker
-            robTop:   A string (topic), for the curretn robot/topic
-            subID:    The Subscription ID string, which should get deleted
-            created:  Creation or Deletion of a subscription (bool)
-        '''
-        if not response.ok:
-            if created:
-                Log("ERROR", "Could not create subscription for topic {} in Context-Broker :".format(robTop))
-                Log("ERROR", response.content)
-            else:
-                Log("WARNING", "Could not delete subscription {} from Context-Broker :".format(subID))
-                Log("WARNING", response.content)
+        if self.subscriptions is not None:
+            self.subscriptions.close()
+            self.subscriptions = None
 
 
 
@@ -263,16 +208,33 @@ class CBServer:
         This is the HTTPServer, which start listening on an adress and a free port
         Here we provide 3 methods: Initialize, start and stop. Start and stop either 
         start or stop this Server.
+
+        The notifications are received concurrently by a pool of threads (with Keep-Alive, so that
+        the ContextBroker can reuse its connections). They are converted and published into ROS
+        by a PublishPipeline: The notifications of one topic are published in order, different
+        topics in parallel.
     '''
-    def __init__(self, thread_event):
+    def __init__(self, thread_event, configData=None):
         '''
             Set up HTTPServer
             thread_event: The Event where the main Thread waits on
+            configData: The "contextbroker"-configuration with the optional "notification"-entry
         '''
-        self.stopped = False
         self.thread_event = thread_event
 
-        Protocol = "HTTP/1.0"
+        conf = dict()
+        if configData is not None and "notification" in configData:
+            conf = configData["notification"]
+        workers = int(conf.get("workers", 4))
+        self.keepAlive = float(conf.get("keep_alive", 5))
+
+        if self.keepAlive > 0:
+            Protocol = "HTTP/1.1"
+            # Idle connections are closed after this timeout, so that they do not block a worker
+            self.CBHandler.timeout = self.keepAlive
+        else:
+            Protocol = "HTTP/1.0"
+            self.CBHandler.timeout = None
 
         if C.EP_SERVER_PORT is not None and isinstance(C.EP_SERVER_PORT, int) :
             server_address = ("0.0.0.0", C.EP_SERVER_PORT)
@@ -280,7 +242,13 @@ class CBServer:
             server_address = ("0.0.0.0", 0)
 
         self.CBHandler.protocol_version = Protocol
-        self.httpd = HTTPServer(server_address, self.CBHandler)
+        self.httpd = PooledHTTPServer(server_address, self.CBHandler, workers=workers)
+
+        # Commands for ROS should not get lost, so the receiver blocks if the queue of a topic is full
+        self.httpd.executor = PublishPipeline(self._publish,
+                    queueSize=int(conf.get("queue_size", 1000)),
+                    workers=max(workers, 1),
+                    overflowPolicy=BLOCK)
 
     def start(self):
         '''
@@ -293,21 +261,38 @@ class CBServer:
 
         # Notify and start handling Requests
         self.thread_event.set()
-        while not self.stopped:
-            self.httpd.handle_request()
+        self.httpd.serve_forever()
 
     def close(self):
         '''
-            Stops the HTTPServer
+            Stops the HTTPServer. Notifications, which are currently received, are finished first.
+            Queued notifications are not published anymore.
+        '''
+        self.httpd.shutdown()
+        self.httpd.server_close(timeout=self.keepAlive + 1)
+        self.httpd.executor.close()
+
+
+    def _publish(self, topic, item):
+        ''' The routine of the executor. Converts the Entity of a notification back and
+            publishes it in ROS.
+
+            topic: The topic (the id of the Entity)
+            item: The Entity as received from the ContextBroker (as dict) and its trace (or None)
+
+            we invoke """RosTopicHandler.publishEntity""" here, which decodes the Entity via
+            the (cached) DecodePlan of the topic!
         '''
-        self.stopped = True
+        data, trace = item
+        if RosTopicHandler.publishEntity(topic, data):
+            tracing.finish(trace, "published")
 
     class CBHandler(BaseHTTPRequestHandler):
         ''' This is the FIROS-HTTP-Request-Handler. It is needed,
             because the ContextBroker sends Information about the
             subscriptions via HTTP. This Class just handles incoming 
-            Requests and converts the received Data into a "ROS-conform Message".
-            in """do_POST""" we invoke """RosTopicHandler.publish"""
+            Requests and hands the received Data over to the executor of the server,
+            which converts it into a "ROS-conform Message" (see CBServer._publish).
         '''
         def log_message(self, format, *args):
             ''' Suppress prints! '''
@@ -317,76 +302,47 @@ class CBServer:
             '''
                 We do not respond to GETs. We do Nothing!!
             '''
-            pass
+            self.close_connection = True
 
 
         def do_POST(self):
             ''' The ContextBroker is informing us via one of our subscriptions.
-                We convert the received content back and publish 
-                it in ROS.
+                Each received Entity is queued for its topic, it is converted 
+                back and published in ROS by the executor.
 
                 self: The "request" from the Context-Broker
-
-                we invoke """RosTopicHandler.publish""" here!
             '''
             # retreive Data and get the updated information
+            # The notification is parsed only once, the Entities are decoded directly into ROS-Messages
+            start = time.time()
             recData = self.rfile.read(int(self.headers['Content-Length']))
-            receivedData = json.loads(recData)
-            data = receivedData['data'][0] # Specific to NGSIv2 
-            jsonData = json.dumps(data)
+            try:
+                entities = jsonLoads(recData)['data']
+                if not isinstance(entities, list):
+                    raise TypeError("'data' is no list")
+            except (ValueError, TypeError, KeyError) as ex:
+                # Not JSON (orjson and json both raise a ValueError) or no notification
+                Log("WARNING", "Received an invalid notification from the Context-Broker: {}".format(ex))
+                self.send_response(400)
+                self.end_headers()
+                return
+            metrics.observe("firos_notification_seconds", None, time.time() - start)
+            metrics.inc("firos_notifications_total")
+
+            # A notification can contain multiple Entities (Specific to NGSIv2)
+            for data in entities:
+                if not isinstance(data, dict) or "id" not in data:
+                    # Only this Entity is skipped, not the others of the notification
+                    Log("WARNING", "Received an invalid Entity from the Context-Broker: {}".format(data))
+                    continue
+                topic = str(data["id"]).replace(".", "/")
+                metrics.inc("firos_entities_received_total", topic)
+                trace = None
+                if C.TRACING_SIZE > 0:
+                    modified = data.get("dateModified")
+                    trace = tracing.start("contextbroker", topic, tracing.parseDate(modified.get("value")) if isinstance(modified, dict) else None)
+                self.server.executor.put(topic, (data, trace))
 
-
-
-            obj = self.TypeValue()
-            ObjectFiwareConverter.fiware2Obj(jsonData, obj, setAttr=True, useMetaData=False, encoded=True)
-            obj.id = obj.id.replace(".", "/")
-            obj.type = obj.type.replace("%2F", "/")
-            
-            objType = obj.type
-            topic = obj.id
-
-            del data["id"]
-            del data["type"]
-            tempDict = dict(type=objType, value=data)
-
-            dataStruct = self._buildTypeStruct(tempDict)
-
-            RosTopicHandler.publish(topic, obj.__dict__, dataStruct)
             # # Send OK!
             self.send_response(204)
             self.end_headers() # Python 3 needs an extra end_headers after send_response
-
-
-        ### Back Conversion From Entity-JSON into Python-Object
-        def _buildTypeStruct(self, obj):
-            ''' This generates a struct containing a type (the actual ROS-Message-Type) and 
-                its value (either empty or more ROS-Message-Types).
-
-                This struct is used later to recursivley load needed Messages and fill them with 
-                content before they are posted back to ROS.
-
-                obj:    The received update from Context-Broker
-            '''
-            s = {}
-
-            # Searching for a point to get ROS-Message-Types from the obj
-            if 'value' in obj and 'type' in obj and "/" in obj['type'] : 
-                s['type'] = obj['type']
-                objval = obj['value'] 
-                s['value'] = {}
-
-                # For each value in Object repeat!
-                for k in objval:
-                    if 'type' in objval[k] and 'value' in objval[k] and objval[k]['type'] == 'array': # Check if we got an Array-Type value
-                        l = []
-                        for klist in objval[k]['value']:
-                            l.append(self._buildTypeStruct(klist))
-                        s['value'][k] = l
-                    else:
-                        s['value'][k] = self._buildTypeStruct(objval[k])
-
-            return s
-
-        class TypeValue(object):
-            ''' A Stub-Object to parse the received data
-            '''
\ No newline at end of file
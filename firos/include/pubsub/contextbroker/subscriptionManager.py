@@ -0,0 +1,248 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import time
+import heapq
+import threading
+
+from include.logger import Log
+
+
+class SubscriptionManager(object):
+    ''' The SubscriptionManager maintains the subscriptions of FIROS on the ContextBroker.
+
+        A bounded number of threads (workers) creates and renews all subscriptions, shortly before they
+        expire. A subscription is created once and then only its "expires" is updated via PATCH
+        (instead of deleting and creating it again). If the ContextBroker does not know the subscription anymore
+        (e.g. after a restart), it is created again.
+
+        With idPattern, all topics of a message type are covered by one subscription with
+        an "idPattern" (matching exactly the ids of the topics), instead of one subscription per topic.
+    '''
+
+    # Seconds until a failed creation/renewal is tried again (at most length * refreshDelay)
+    RETRY_DELAY = 5
+
+    def __init__(self, connection, baseUrl, notifyUrl, length=300, refreshDelay=0.9, throttling=0, idPattern=False, workers=4):
+        ''' connection: The CbConnection to the ContextBroker
+            baseUrl: The URL of the ContextBroker, e.g. "http://localhost:1026"
+            notifyUrl: The URL, where the ContextBroker notifies FIROS
+            length: The duration of a subscription in seconds
+            refreshDelay: The subscriptions are renewed after length * refreshDelay seconds (0 < refreshDelay < 1)
+            throttling: The throttling of the notifications in seconds
+            idPattern: Use one subscription per message type instead of one per topic
+            workers: The number of threads, which create and renew the subscriptions
+        '''
+        self.connection = connection
+        self.baseUrl = baseUrl
+        self.notifyUrl = notifyUrl
+        self.length = length
+        self.refreshDelay = refreshDelay
+        self.throttling = throttling
+        self.idPattern = idPattern
+        self.workers = max(int(workers), 1)
+        self.closed = False
+
+        self._cond = threading.Condition()
+        self._subscriptions = dict()  # _subscriptions[key] -> dict(id, type, topics, attrs, changed, pending, busy, due)
+        self._due = []                # heap of (due, key)
+        self._threads = []
+
+
+    def subscribe(self, topic, topicType, attrs):
+        ''' Adds the topic to the subscriptions. The subscription is created (or updated)
+            by the workers of the SubscriptionManager, this method does not block (see 'wait').
+
+            topic: The topic (the id of the Entity is derived from it)
+            topicType: The ROS-Message-Type of the topic
+            attrs: The attributes, which should be notified
+        '''
+        key = topicType if self.idPattern else topic
+        with self._cond:
+            if self.closed:
+                return
+            sub = self._subscriptions.get(key)
+            if sub is None:
+                sub = dict(id=None, type=topicType, topics=set(), attrs=set(), changed=True, pending=True, busy=False, due=None)
+                self._subscriptions[key] = sub
+            elif topic in sub["topics"]:
+                return
+            sub["topics"].add(topic)
+            sub["attrs"].update(attrs)
+            sub["changed"] = True
+            sub["pending"] = True
+            self._schedule(key, time.time())
+
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._work, name="firos-subscriptions-{}".format(len(self._threads)))
+                t.daemon = True
+                t.start()
+                self._threads.append(t)
+
+
+    def wait(self, timeout=None):
+        ''' Waits until each added topic was subscribed (or its subscription failed once).
+            Returns False if the timeout passed before.
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while not self.closed and any(sub["pending"] for sub in self._subscriptions.values()):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+
+    def getSubscriptions(self):
+        ''' Returns the ids of the created subscriptions: {key: subscription-id}, where key is
+            the topic (or the message type with idPattern)
+        '''
+        with self._cond:
+            return dict((key, sub["id"]) for key, sub in self._subscriptions.items() if sub["id"] is not None)
+
+
+    def close(self):
+        ''' Stops the renewing and deletes all subscriptions from the ContextBroker
+        '''
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+
+        subscriptions = self.getSubscriptions()
+        with self._cond:
+            self._subscriptions.clear()
+        for key, subId in subscriptions.items():
+            response = self.connection.delete(self.baseUrl + "/v2/subscriptions/" + subId)
+            if not response.ok:
+                Log("WARNING", "Could not delete subscription {} from Context-Broker :".format(subId))
+                Log("WARNING", response.content)
+
+
+    def _schedule(self, key, due):
+        ''' Schedules the renewal of a subscription. Needs to be called while holding _cond
+        '''
+        self._subscriptions[key]["due"] = due
+        heapq.heappush(self._due, (due, key))
+        self._cond.notify_all()
+
+
+    def _work(self):
+        ''' The routine of each worker. It waits until the next subscription is due and renews it.
+        '''
+        while True:
+            with self._cond:
+                while not self.closed and (not self._due or self._due[0][0] > time.time()):
+                    self._cond.wait(self._due[0][0] - time.time() if self._due else None)
+                if self.closed:
+                    return
+                due, key = heapq.heappop(self._due)
+                sub = self._subscriptions[key]
+                if sub["due"] != due or sub["busy"]:
+                    # Outdated entry (the subscription was scheduled again) or another worker
+                    # is currently renewing it (it is scheduled again afterwards)
+                    continue
+                subId, changed = sub["id"], sub["changed"]
+                sub["changed"] = False
+                sub["busy"] = True
+                body = self._subscriptionJSON(sub)
+
+            try:
+                ok = self._renew(key, subId, changed, body)
+            except Exception as e:
+                Log("ERROR", "Could not renew subscription of {} on Context-Broker: {}".format(key, e))
+                ok = False
+
+            with self._cond:
+                delay = self.length * self.refreshDelay
+                if not ok:
+                    sub["changed"] = sub["changed"] or changed
+                    delay = min(delay, self.RETRY_DELAY)
+                sub["busy"] = False
+                if sub["due"] == due:
+                    sub["pending"] = False
+                    self._schedule(key, time.time() + delay)
+                else:
+                    # Scheduled again in the meantime, maybe skipped by another worker
+                    self._schedule(key, sub["due"])
+
+
+    def _renew(self, key, subId, changed, body):
+        ''' Creates the subscription, updates it if topics were added or only extends its
+            expiration. Returns True on success
+        '''
+        if subId is not None:
+            if changed:
+                data = body
+            else:
+                data = dict(expires=body["expires"])
+            response = self.connection.patch(self.baseUrl + "/v2/subscriptions/" + subId, data=json.dumps(data),
+                                             headers={'Content-Type': 'application/json'})
+            if response.ok:
+                return True
+            if response.status_code != 404:
+                Log("WARNING", "Could not renew subscription {} for {} on Context-Broker :".format(subId, key))
+                Log("WARNING", response.content)
+                return False
+            Log("INFO", "Subscription for {} does not exist anymore, creating it again".format(key))
+
+        response = self.connection.post(self.baseUrl + "/v2/subscriptions", data=json.dumps(body),
+                                        headers={'Content-Type': 'application/json'})
+        if not response.ok or 'Location' not in response.headers:
+            Log("ERROR", "Could not create subscription for {} in Context-Broker :".format(key))
+            Log("ERROR", response.content)
+            return False
+
+        with self._cond:
+            # The Location is "/v2/subscriptions/<id>"
+            self._subscriptions[key]["id"] = response.headers['Location'].split("/")[-1]
+        Log("INFO", "Subscribed on Context-Broker to: {}".format(key))
+        return True
+
+
+    def _subscriptionJSON(self, sub):
+        ''' Returns the subscription as specified in:
+            https://fiware-orion.readthedocs.io/en/master/user/walkthrough_apiv2/index.html#subscriptions
+        '''
+        ids = sorted(str(topic).replace("/", ".") for topic in sub["topics"])  # OCB Specific!!
+        if self.idPattern:
+            entity = dict(idPattern="^(" + "|".join(i.replace(".", "\\.") for i in ids) + ")$")
+        else:
+            entity = dict(id=ids[0])
+        entity["type"] = sub["type"].replace("/", "%2F")  # OCB Specific!!
+
+        return {
+            "subject": {
+                "entities": [entity]
+            },
+            "notification": {
+                "http": {
+                    "url": self.notifyUrl
+                },
+                "attrs": sorted(sub["attrs"])
+            },
+            "expires": time.strftime("%Y-%m-%dT%H:%M:%S.00Z", time.gmtime(time.time() + self.length)),  # ISO 8601
+            "throttling": self.throttling
+        }
@@ -0,0 +1,87 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import threading
+try:
+    # Python 3
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    # Python 2
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from include.constants import Constants as C
+from include.logger import initLog
+from include.pubsub.contextbroker.cbConnection import CbConnection
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        return
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+
+class Test_CbConnection(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+        cls.server = HTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        cls.url = "http://127.0.0.1:{}/v2/entities".format(cls.server.server_address[1])
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_Configuration(self):
+        connection = CbConnection({"connection": {"pool_size": 3, "connect_timeout": 1, "read_timeout": 2,
+                                                  "retries": 0, "backoff_factor": 0}})
+        self.assertEqual(connection.poolSize, 3)
+        self.assertEqual(connection.timeout, (1.0, 2.0))
+        self.assertEqual(connection.retries, 0)
+
+        connection = CbConnection()
+        self.assertEqual(connection.poolSize, 10)
+        self.assertEqual(connection.timeout, (5.0, 10.0))
+
+    def test_Reuse_And_Statistics(self):
+        connection = CbConnection({"connection": {"pool_size": 2}})
+        for _ in range(5):
+            self.assertTrue(connection.get(self.url).ok)
+
+        # One connection is opened and kept alive for the following requests
+        self.assertEqual(connection.getStatistics(), dict(requests=5, hits=4, misses=1, pool_size=2))
+        connection.close()
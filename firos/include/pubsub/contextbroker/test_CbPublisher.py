@@ -0,0 +1,292 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import time
+import unittest
+import threading
+
+from include.constants import Constants as C
+from include.logger import initLog
+from include import tracing
+
+try:
+    from include.pubsub.contextbroker.cbPublisher import CbPublisher
+except ImportError:
+    # The FiwareObjectConverter or requests is missing
+    CbPublisher = None
+
+
+class String(object):
+    __slots__ = ['data']
+    _slot_types = ['string']
+    _type = 'std_msgs/String'
+    def __init__(self, data=''):
+        self.data = data
+
+
+class Response(object):
+    def __init__(self, status, content=None):
+        self.status_code = status
+        self.ok = status < 400
+        self.content = json.dumps(content) if content is not None else ""
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Connection(object):
+    ''' Records the requests to the ContextBroker
+    '''
+    poolSize = 4
+    timeout = (1, 1)
+
+    def __init__(self):
+        self.posts = []
+        self.deletes = []
+        self.posted = threading.Condition()
+
+    def post(self, url, data=None, headers=None):
+        with self.posted:
+            self.posts.append((time.time(), url, json.loads(data)))
+            self.posted.notify_all()
+        return Response(204)
+
+    def delete(self, url):
+        self.deletes.append(url)
+        return Response(204)
+
+    def close(self):
+        pass
+
+    def waitFor(self, count, timeout=2):
+        deadline = time.time() + timeout
+        with self.posted:
+            while len(self.posts) < count and time.time() < deadline:
+                self.posted.wait(deadline - time.time())
+        return self.posts
+
+
+@unittest.skipIf(CbPublisher is None, "FiwareObjectConverter is not available")
+class Test_CbPublisher_Batch(unittest.TestCase):
+
+    DEFINITIONS = {"/robot1/cmd": {"data": "string"}, "/robot1/cmd_vel": {"data": "string"}}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def tearDown(self):
+        self.publisher.unpublish()
+        del CbPublisher.configData
+
+    def _publisher(self, window, maxSize=100):
+        CbPublisher.configData = {"address": "cb", "port": 1026, "batch": {"window": window, "max_size": maxSize}}
+        self.publisher = CbPublisher()
+        self.publisher.posted_history = dict()
+        self.publisher.connection = self.connection = Connection()
+        return self.publisher
+
+    def test_Coalesce_Updates(self):
+        publisher = self._publisher(window=100)
+        start = time.time()
+        publisher.publish("/robot1/cmd", String("first"), self.DEFINITIONS)
+        publisher.publish("/robot1/cmd_vel", String("other"), self.DEFINITIONS)
+        publisher.publish("/robot1/cmd", String("newest"), self.DEFINITIONS)
+
+        posts = self.connection.waitFor(1)
+        sent, url, body = posts[0]
+        self.assertEqual(url, "http://cb:1026/v2/op/update")
+        self.assertEqual(body["actionType"], "append")
+        # One Entity per topic, with the newest update
+        self.assertEqual([(e["id"], e["data"]["value"]) for e in body["entities"]],
+                         [(".robot1.cmd_vel", "other"), (".robot1.cmd", "newest")])
+        # Sent after the window
+        self.assertGreaterEqual(sent - start, 0.09)
+        time.sleep(0.15)
+        self.assertEqual(len(self.connection.posts), 1)
+
+    def test_Max_Size_Flushes_Early(self):
+        publisher = self._publisher(window=5000, maxSize=2)
+        start = time.time()
+        publisher.publish("/robot1/cmd", String("a"), self.DEFINITIONS)
+        publisher.publish("/robot1/cmd_vel", String("b"), self.DEFINITIONS)
+
+        posts = self.connection.waitFor(1)
+        self.assertEqual(len(posts), 1)
+        self.assertLess(posts[0][0] - start, 1)
+        self.assertEqual(len(posts[0][2]["entities"]), 2)
+
+    def test_Unpublish_Drops_Pending(self):
+        publisher = self._publisher(window=5000)
+        publisher.publish("/robot1/cmd", String("a"), self.DEFINITIONS)
+        publisher.unpublish()
+        self.assertEqual(self.connection.posts, [])
+        self.assertEqual(self.connection.deletes, ["http://cb:1026/v2/entities/.robot1.cmd"])
+        publisher.posted_history.clear()
+
+    def test_Traces_Finished_After_Sent(self):
+        C.TRACING_SIZE = 10
+        self.addCleanup(tracing.reset)
+        self.addCleanup(setattr, C, "TRACING_SIZE", 0)
+        publisher = self._publisher(window=50)
+
+        # As in the topicHandler, the trace is finished after 'publish' returned
+        trace = tracing.start("ros", "/robot1/cmd")
+        tracing.activate(trace)
+        publisher.publish("/robot1/cmd", String("a"), self.DEFINITIONS)
+        tracing.finish(trace)
+        self.assertEqual(tracing.report()["ros"]["count"], 0)
+
+        self.connection.waitFor(1)
+        deadline = time.time() + 2
+        while tracing.report()["ros"]["count"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        stages = tracing.report()["ros"]["stages"]
+        for stage in ["converted", "sent", "acknowledged"]:
+            self.assertTrue(stages[stage] is not None, stage)
+
+    def test_Failed_Topics(self):
+        publisher = self._publisher(window=50)
+        topics = ["/robot1/cmd", "/robot1/cmd_vel"]
+        response = Response(422, {"error": "PartialUpdate", "description": "do not exist: .robot1.cmd_vel - [ entity itself ]"})
+        self.assertEqual(publisher._failedTopics(response, topics), ["/robot1/cmd_vel"])
+
+        response = Response(422, {"error": "PartialUpdate", "description": "do not exist: .robot1.cmd - [ entity itself ]"})
+        self.assertEqual(publisher._failedTopics(response, topics), ["/robot1/cmd"])
+
+        self.assertEqual(publisher._failedTopics(Response(500), topics), [])
+
+
+@unittest.skipIf(CbPublisher is None, "FiwareObjectConverter is not available")
+class Test_CbPublisher_Prepare(unittest.TestCase):
+
+    DEFINITIONS = {"/robot1/cmd_vel": {"data": "string"}}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def setUp(self):
+        CbPublisher.configData = {"address": "cb", "port": 1026}
+        self.publisher = CbPublisher()
+        self.publisher.posted_history = dict()
+        self.publisher.connection = self.connection = Connection()
+
+    def tearDown(self):
+        self.publisher.unpublish()
+        del CbPublisher.configData
+
+    def test_Same_Id_And_Type_As_Published(self):
+        self.publisher.prepare(["/robot1/cmd_vel"], {"/robot1/cmd_vel": "std_msgs/String"}, self.DEFINITIONS)
+        prepared = self.connection.posts[0][2]["entities"][0]
+
+        published = json.loads(self.publisher._entityJSON("/robot1/cmd_vel", String("a"), self.DEFINITIONS))
+        self.assertEqual((prepared["id"], prepared["type"]), (published["id"], published["type"]))
+        self.assertEqual(prepared["type"], "std_msgs%252FString")
+
+
+class Point(object):
+    __slots__ = ['x', 'y']
+    _slot_types = ['float64', 'float64']
+    _type = 'geometry_msgs/Point'
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+
+class Pose(object):
+    __slots__ = ['position', 'ranges', 'frame_id']
+    _slot_types = ['geometry_msgs/Point', 'float32[]', 'string']
+    _type = 'test_msgs/Pose'
+    def __init__(self, x=0.0, ranges=None, frame_id='map'):
+        self.position = Point(x)
+        self.ranges = ranges if ranges is not None else []
+        self.frame_id = frame_id
+
+
+@unittest.skipIf(CbPublisher is None, "FiwareObjectConverter is not available")
+class Test_CbPublisher_Delta(unittest.TestCase):
+
+    DEFINITIONS = {"/robot1/pose": {"position": {"x": "float64", "y": "float64"},
+                                    "ranges": "float32[]", "frame_id": "string"}}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def setUp(self):
+        CbPublisher.configData = {"address": "cb", "port": 1026, "delta": {"full_refresh": 3600}}
+        self.publisher = CbPublisher()
+        self.publisher.posted_history = dict()
+        self.publisher.connection = self.connection = Connection()
+
+    def tearDown(self):
+        self.publisher.unpublish()
+        del CbPublisher.configData
+
+    def _updates(self, *messages):
+        ''' Publishes the messages and returns the updated attributes of each request after the creation
+        '''
+        for msg in messages:
+            self.publisher.publish("/robot1/pose", msg, self.DEFINITIONS)
+        return [set(body.keys()) for _, url, body in self.connection.posts[1:]]
+
+    def test_Unchanged(self):
+        self.assertEqual(self._updates(Pose(1.0, [0.5, 2.0]), Pose(1.0, [0.5, 2.0])), [])
+
+    def test_Changed_Nested_Field(self):
+        first, second = Pose(1.0), Pose(1.0)
+        second.position.y = 2.0
+        self.assertEqual(self._updates(first, second), [set(["position"])])
+        self.assertTrue(self.connection.posts[1][1].endswith("/.robot1.pose/attrs"))
+
+    def test_NaN(self):
+        nan = float("nan")
+        updates = self._updates(Pose(nan, [float("nan"), 1.0]), Pose(float("nan"), [nan, 1.0]),
+                                Pose(float("nan"), [1.0, 1.0]))
+        self.assertEqual(updates, [set(["ranges"])])
+
+    def test_NaN_Large_Array(self):
+        # Large arrays are only compared via their hash
+        def ranges(last):
+            return [float("nan") for _ in range(CbPublisher.DELTA_HASH_LENGTH)] + [last]
+        self.assertEqual(self._updates(Pose(1.0, ranges(1.0)), Pose(1.0, ranges(1.0)), Pose(1.0, ranges(2.0))),
+                         [set(["ranges"])])
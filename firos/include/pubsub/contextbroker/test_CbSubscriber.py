@@ -0,0 +1,181 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import sys
+import json
+import time
+import unittest
+import threading
+
+from include.constants import Constants as C
+from include.logger import initLog
+from include.pubsub.publishPipeline import PublishPipeline, BLOCK
+
+try:
+    from include.pubsub.contextbroker import cbSubscriber
+except ImportError:
+    # ROS is missing
+    cbSubscriber = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from importlib import reload
+except ImportError:
+    # Python 2 has reload as builtin
+    pass
+
+
+class Server(object):
+    ''' The parts of the PooledHTTPServer, which are used by the CBHandler
+    '''
+    def __init__(self, executor):
+        self.executor = executor
+
+
+@unittest.skipIf(cbSubscriber is None, "ROS is not available")
+class Test_CbSubscriber(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "CRITICAL"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def setUp(self):
+        self.published = []
+        self.lock = threading.Lock()
+        self.addCleanup(setattr, cbSubscriber.RosTopicHandler, "publishEntity", cbSubscriber.RosTopicHandler.publishEntity)
+        cbSubscriber.RosTopicHandler.publishEntity = staticmethod(self._publishEntity)
+
+        # As in the CBServer, the Entities are published by its routine
+        self.server = Server(PublishPipeline(lambda topic, item: cbSubscriber.CBServer._publish(None, topic, item),
+                                             queueSize=10, workers=2, overflowPolicy=BLOCK))
+        self.addCleanup(self.server.executor.close)
+
+    def _publishEntity(self, topic, entity):
+        if entity.get("fail"):
+            raise ValueError("Cannot decode")
+        with self.lock:
+            self.published.append((topic, entity["data"]["value"]))
+        return True
+
+    def _notify(self, body):
+        ''' Handles a notification with the body, returns the status of the response
+        '''
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        handler = cbSubscriber.CBServer.CBHandler.__new__(cbSubscriber.CBServer.CBHandler)
+        handler.rfile = io.BytesIO(body)
+        handler.headers = {"Content-Length": str(len(body))}
+        handler.server = self.server
+        statuses = []
+        handler.send_response = statuses.append
+        handler.end_headers = lambda: None
+        handler.do_POST()
+        return statuses
+
+    def _waitFor(self, count):
+        deadline = time.time() + 2
+        while len(self.published) < count and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        with self.lock:
+            return sorted(self.published)
+
+    def _entity(self, topic, value, **kwargs):
+        entity = dict(id=topic.replace("/", "."), type="std_msgs%2FString", data=dict(type="string", value=value))
+        entity.update(kwargs)
+        return entity
+
+    def test_Multiple_Entities(self):
+        entities = [self._entity("/robot1/cmd", "a"), self._entity("/robot2/cmd", "b"), self._entity("/robot1/cmd", "c")]
+        self.assertEqual(self._notify(dict(subscriptionId="1", data=entities)), [204])
+
+        self.assertEqual(self._waitFor(3), [("/robot1/cmd", "a"), ("/robot1/cmd", "c"), ("/robot2/cmd", "b")])
+        # In order for each topic
+        self.assertEqual([value for topic, value in self.published if topic == "/robot1/cmd"], ["a", "c"])
+
+    def test_Bad_Entity_Does_Not_Drop_Others(self):
+        entities = [self._entity("/robot1/cmd", "a"), {"type": "no id"}, "not an entity",
+                    self._entity("/robot2/cmd", "b", fail=True), self._entity("/robot3/cmd", "c")]
+        self.assertEqual(self._notify(dict(subscriptionId="1", data=entities)), [204])
+
+        self.assertEqual(self._waitFor(2), [("/robot1/cmd", "a"), ("/robot3/cmd", "c")])
+        self.assertEqual(self.server.executor.getStatistics()["topics"]["/robot2/cmd"]["failed"], 1)
+
+    def test_Malformed_Notification(self):
+        for body in [b"{not json", b"", b"[1, 2]", json.dumps(dict(subscriptionId="1")).encode("utf-8"),
+                     json.dumps(dict(subscriptionId="1", data="no list")).encode("utf-8")]:
+            self.assertEqual(self._notify(body), [400], body)
+
+        # Later notifications are still received
+        self.assertEqual(self._notify(dict(subscriptionId="1", data=[self._entity("/robot1/cmd", "a")])), [204])
+        self.assertEqual(self._waitFor(1), [("/robot1/cmd", "a")])
+
+    def _reload(self, module):
+        ''' Reloads the cbSubscriber with the given orjson (None as if it is not installed)
+        '''
+        original = sys.modules.get("orjson")
+        sys.modules["orjson"] = module
+        try:
+            return reload(cbSubscriber)
+        finally:
+            if original is None:
+                del sys.modules["orjson"]
+            else:
+                sys.modules["orjson"] = original
+
+    def test_Json_Fallback(self):
+        global cbSubscriber
+        self.addCleanup(lambda: globals().update(cbSubscriber=self._reload(orjson)))
+        cbSubscriber = self._reload(None)
+        self.assertIs(cbSubscriber.jsonLoads, json.loads)
+
+        entities = [self._entity("/robot1/cmd", u"\u00e4"), self._entity("/robot2/cmd", "b", speed=dict(type="number", value=1.5))]
+        self.assertEqual(self._notify(dict(subscriptionId="1", data=entities)), [204])
+        self.assertEqual(self._waitFor(2), [("/robot1/cmd", u"\u00e4"), ("/robot2/cmd", "b")])
+        self.assertEqual(self._notify(b"{not json"), [400])
+
+    @unittest.skipIf(orjson is None, "orjson is not available")
+    def test_Orjson_Equals_Json(self):
+        self.assertIs(cbSubscriber.jsonLoads, orjson.loads)
+        entities = [self._entity("/robot1/cmd", u"\u00e4", speed=dict(type="number", value=1.5)),
+                    self._entity("/robot2/cmd", "b", flags=dict(type="array", value=[1, None, True]))]
+        body = json.dumps(dict(subscriptionId="1", data=entities)).encode("utf-8")
+        self.assertEqual(cbSubscriber.jsonLoads(body), json.loads(body))
+        self.assertRaises(ValueError, cbSubscriber.jsonLoads, b"{not json")
+
+        self.assertEqual(self._notify(body), [204])
+        self.assertEqual(self._waitFor(2), [("/robot1/cmd", u"\u00e4"), ("/robot2/cmd", "b")])
+
+
+if __name__ == '__main__':
+    unittest.main()
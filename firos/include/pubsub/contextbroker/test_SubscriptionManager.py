@@ -0,0 +1,161 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import time
+import unittest
+import threading
+
+from include.constants import Constants as C
+from include.logger import initLog
+from include.pubsub.contextbroker.subscriptionManager import SubscriptionManager
+
+
+class Response(object):
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.ok = status < 400
+        self.headers = headers or {}
+        self.content = ""
+
+
+class Connection(object):
+    ''' Records the requests, like the ContextBroker it creates subscriptions with increasing ids
+    '''
+    def __init__(self):
+        self.requests = []
+        self.existing = set()
+        self.lock = threading.Lock()
+
+    def post(self, url, data=None, headers=None):
+        with self.lock:
+            subId = "sub{}".format(len(self.requests))
+            self.existing.add(subId)
+            self.requests.append(("POST", url, json.loads(data)))
+            return Response(201, {"Location": "/v2/subscriptions/" + subId})
+
+    def patch(self, url, data=None, headers=None):
+        with self.lock:
+            self.requests.append(("PATCH", url, json.loads(data)))
+            return Response(204 if url.split("/")[-1] in self.existing else 404)
+
+    def delete(self, url):
+        with self.lock:
+            self.requests.append(("DELETE", url, None))
+            return Response(204)
+
+    def methods(self):
+        with self.lock:
+            return [r[0] for r in self.requests]
+
+
+class Test_SubscriptionManager(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def setUp(self):
+        self.connection = Connection()
+
+    def tearDown(self):
+        self.manager.close()
+
+    def _manager(self, **kwargs):
+        self.manager = SubscriptionManager(self.connection, "http://cb", "http://firos:1234",
+                                           length=1, refreshDelay=0.1, **kwargs)
+        return self.manager
+
+    def _waitFor(self, count):
+        for _ in range(200):
+            if len(self.connection.requests) >= count:
+                return
+            time.sleep(0.01)
+
+    def test_Renew_Via_Patch(self):
+        manager = self._manager()
+        manager.subscribe("/robot/cmd", "geometry_msgs/Twist", ["linear", "angular"])
+        self._waitFor(3)
+
+        methods = self.connection.methods()
+        self.assertEqual(methods[:3], ["POST", "PATCH", "PATCH"])
+        method, url, body = self.connection.requests[0]
+        self.assertEqual(body["subject"]["entities"], [{"id": ".robot.cmd", "type": "geometry_msgs%2FTwist"}])
+        self.assertEqual(body["notification"], {"http": {"url": "http://firos:1234"}, "attrs": ["angular", "linear"]})
+
+        # Only the expiration is renewed
+        method, url, body = self.connection.requests[1]
+        self.assertEqual(url, "http://cb/v2/subscriptions/sub0")
+        self.assertEqual(list(body.keys()), ["expires"])
+
+    def test_Recreate_Unknown_Subscription(self):
+        manager = self._manager()
+        manager.subscribe("/robot/cmd", "geometry_msgs/Twist", ["linear"])
+        self._waitFor(1)
+        self.connection.existing.clear()
+        self._waitFor(4)
+
+        self.assertEqual(self.connection.methods()[:3], ["POST", "PATCH", "POST"])
+        self.assertEqual(manager.getSubscriptions(), {"/robot/cmd": "sub2"})
+
+    def test_Id_Pattern(self):
+        manager = self._manager(idPattern=True)
+        manager.subscribe("/robot1/cmd", "geometry_msgs/Twist", ["linear"])
+        manager.subscribe("/robot2/cmd", "geometry_msgs/Twist", ["linear"])
+        manager.subscribe("/robot1/pose", "geometry_msgs/Pose", ["position"])
+        self._waitFor(2)
+        time.sleep(0.05)
+
+        # One subscription per type, a topic added later is patched into the subject
+        self.assertEqual(len([r for r in self.connection.requests if r[0] == "POST"]), 2)
+        entities = dict()
+        for method, url, body in self.connection.requests:
+            if "subject" in body:
+                entity = body["subject"]["entities"][0]
+                entities[entity["type"]] = entity["idPattern"]
+        self.assertEqual(entities, {"geometry_msgs%2FPose": "^(\\.robot1\\.pose)$",
+                                    "geometry_msgs%2FTwist": "^(\\.robot1\\.cmd|\\.robot2\\.cmd)$"})
+
+    def test_Wait(self):
+        manager = self._manager(workers=3)
+        for i in range(10):
+            manager.subscribe("/robot{}/cmd".format(i), "geometry_msgs/Twist", ["linear"])
+
+        self.assertTrue(manager.wait(2))
+        self.assertEqual(len(manager.getSubscriptions()), 10)
+        self.assertEqual(len(set(manager.getSubscriptions().values())), 10)
+
+    def test_Close_Deletes_Subscriptions(self):
+        manager = self._manager()
+        manager.subscribe("/a", "std_msgs/String", ["data"])
+        manager.subscribe("/b", "std_msgs/String", ["data"])
+        self._waitFor(2)
+        manager.close()
+
+        deleted = sorted(r[1] for r in self.connection.requests if r[0] == "DELETE")
+        self.assertEqual(deleted, ["http://cb/v2/subscriptions/sub0", "http://cb/v2/subscriptions/sub1"])
@@ -0,0 +1,37 @@
+from include.pubsub.genericPubSub import RawSink
+
+
+class SomeExampleRawSink(RawSink):
+    '''
+        This class just needs to inherit RawSink.
+
+        It receives the messages of the passthrough topics (see "passthrough" in config.json)
+        as they were serialized in ROS, e.g. to record or replay them.
+    '''
+
+    def __init__(self):
+        '''
+            Here you can do things that need to be initialized.
+
+            You can use the data provided by the 'config.json' here which can be retreived via:
+            """self.configData""". This is not None, as long as in config.json a key exists, which has
+            the same name as the subfolder this File is in.
+        '''
+
+
+    def publishRaw(self, topic, msgType, buf):
+        '''
+            Here goes the Routine to forward the serialized message.
+            It is called automatically (in the rospy-callback)!
+
+            buf is a memoryview of the buffer of rospy, copy it (e.g. via """buf.tobytes()""")
+            if it is needed after this call.
+        '''
+        pass
+
+    def unpublish(self):
+        '''
+            Here goes the Routine which needs to be done on shutdown.
+            It is called automatically!
+        '''
+        pass
\ No newline at end of file
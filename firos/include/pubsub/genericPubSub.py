@@ -32,6 +32,7 @@ import inspect
 import importlib
 
 from include.constants import Constants as C
+from include import startup
 
 # ABC compatibility with Python 2 and 3
 ABC = abc.ABCMeta('ABC', (object,), {'__slots__': ()}) 
@@ -54,6 +55,13 @@ class Publisher(ABC):
     def unpublish(self):
         pass
 
+    def prepare(self, topicList, topicTypes, msgDefinitions):
+        '''
+            Optional: Called once at startup with all topics, which are going to be published.
+            Publishers can prepare them here at once (e.g. create the Entities).
+        '''
+        pass
+
 
 class Subscriber(ABC):
     '''
@@ -74,6 +82,34 @@ class Subscriber(ABC):
         pass
 
 
+class RawSink(ABC):
+    '''
+        Abstract RawSink. Import this and set it as base to write your own sink
+        for the passthrough topics (see "passthrough" in config.json). Their messages
+        are not deserialized, the sink receives the serialized ROS-Message as it is.
+    '''
+
+    # Data which is added via config.json
+    # This will be initialized before__init__() is even called!
+    configData = dict()
+
+    @abc.abstractmethod
+    def publishRaw(self, topic, msgType, buf):
+        '''
+            topic: The topic of the message
+            msgType: The ROS-Message-Type of the topic, e.g. "sensor_msgs/CompressedImage"
+            buf: The serialized message as memoryview of the buffer of rospy (no copy!).
+                 It is only valid during the call, copy it (e.g. buf.tobytes()) to keep it.
+        '''
+        pass
+
+    def unpublish(self):
+        '''
+            Optional: Called once at shutdown
+        '''
+        pass
+
+
 class PubSub(object):
     '''
         This is a generic Publisher and Subscriber class which contains all
@@ -82,11 +118,12 @@ class PubSub(object):
         a subfolder (depending on this files location). 
 
         This class maps the calls 'publish', 'unpublish', 'subscribe' and 'unsubscribe'
-        to each Publisher and Subscriber.
+        to each Publisher and Subscriber and 'publishRaw' to each RawSink.
     '''
 
     publishers = []
     subscribers = []
+    rawSinks = []
 
     def __init__(self):
         '''
@@ -107,40 +144,59 @@ class PubSub(object):
             if not fi.startswith("_") and os.path.isdir(folder + os.path.sep + fi):
                 subfolders[fi] = {}
 
-        ### Get all Files inside those subfolders
+        ### Get all Modules inside those subfolders
         for i in subfolders.keys():
-            for _, _, files in os.walk(folder + os.path.sep + i):
-                for f in files:
-                    if not f.startswith("_"):
-                        subfolders[i][f.split(".")[0]] = None
+            for name in self._moduleNames(folder + os.path.sep + i):
+                subfolders[i][name] = None
 
         ### Import the modules, defined in the files        
         for fold in subfolders.keys():
-            for fil in subfolders[fold].keys():
-                module_def = "include.pubsub." + fold + "." + fil
-                __import__(module_def) # module needs to be imported manually!
-                clsmembers = inspect.getmembers(sys.modules[module_def], \
-                    lambda member: inspect.isclass(member) and member.__module__ == module_def)
-                for clazz in clsmembers:
-                    subfolders[fold][fil] = clazz[1]
+            with startup.Phase("import " + fold):
+                for fil in subfolders[fold].keys():
+                    module_def = "include.pubsub." + fold + "." + fil
+                    __import__(module_def) # module needs to be imported manually!
+                    clsmembers = inspect.getmembers(sys.modules[module_def], \
+                        lambda member: inspect.isclass(member) and member.__module__ == module_def)
+                    for clazz in clsmembers:
+                        subfolders[fold][fil] = clazz[1]
 
         ### Distinguish between Subscribers and Publishers and add them appropiatly
         for fold in subfolders.keys():
-            for fil in subfolders[fold].keys():
-                # initialize config data
-                subfolders[fold][fil].configData = self._getPubSubConstants(fold)
-                if subfolders[fold][fil].__base__ is Subscriber:
-                    # We found a Subscriber
-                    self.subscribers.append(subfolders[fold][fil]())
-                elif subfolders[fold][fil].__base__ is Publisher:
-                    # We found a Publisher
-                    self.publishers.append(subfolders[fold][fil]())
-                else:
-                    # We do nothing to other classes
-                    pass
+            with startup.Phase("init " + fold):
+                for fil in subfolders[fold].keys():
+                    if subfolders[fold][fil] is None:
+                        # The module does not define a class
+                        continue
+                    # initialize config data
+                    subfolders[fold][fil].configData = self._getPubSubConstants(fold)
+                    if subfolders[fold][fil].__base__ is Subscriber:
+                        # We found a Subscriber
+                        self.subscribers.append(subfolders[fold][fil]())
+                    elif subfolders[fold][fil].__base__ is Publisher:
+                        # We found a Publisher
+                        self.publishers.append(subfolders[fold][fil]())
+                    elif subfolders[fold][fil].__base__ is RawSink:
+                        # We found a RawSink
+                        self.rawSinks.append(subfolders[fold][fil]())
+                    else:
+                        # We do nothing to other classes
+                        pass
 
         pass
 
+    @staticmethod
+    def _moduleNames(path):
+        ''' Returns the names of the modules in path, which are loaded. Private files (starting with '_'),
+            tests ('test_*'), compiled files and other files which are no python-source are skipped
+        '''
+        names = []
+        for f in sorted(os.listdir(path)):
+            if f.startswith("_") or f.startswith("test_") or not f.endswith(".py"):
+                continue
+            if os.path.isfile(path + os.path.sep + f):
+                names.append(f[:-len(".py")])
+        return names
+
     def _getPubSubConstants(self, fold):
         '''
             Depending on the Folder-Name the corresponding entry of Constants is loaded
@@ -158,6 +214,21 @@ class PubSub(object):
         for pub in self.publishers:
             pub.publish(topic, rawMsg, msgDefinitions)
 
+
+    def publishRaw(self, topic, msgType, buf):
+        '''
+            Call publishRaw on each RawSink
+        '''
+        for sink in self.rawSinks:
+            sink.publishRaw(topic, msgType, buf)
+
+
+    def prepare(self, topicList, topicTypes, msgDefinitions):
+        '''
+            Call prepare on each Publisher
+        '''
+        for pub in self.publishers:
+            pub.prepare(topicList, topicTypes, msgDefinitions)
     
     def unpublish(self):
         '''
@@ -165,6 +236,8 @@ class PubSub(object):
         '''
         for pub in self.publishers:
             pub.unpublish()
+        for sink in self.rawSinks:
+            sink.unpublish()
 
     def subscribe(self, topicList, topicTypes, msgDefinitions):
         '''
@@ -0,0 +1,233 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import threading
+import traceback
+from collections import deque
+
+from include.logger import Log
+
+
+# The policies, what to do if the queue of a topic is full
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+OVERFLOW_POLICIES = [DROP_OLDEST, DROP_NEWEST, BLOCK]
+
+
+class PublishPipeline(object):
+    ''' The PublishPipeline decouples the receiving of ROS-Messages (rospy-callbacks)
+        from publishing them (e.g. to the Context-Broker). Each topic has its own
+        bounded queue. A pool of worker-threads takes the messages from the queues
+        and calls the publishRoutine.
+
+        The messages of one topic are always published in order by only one worker
+        at a time. Different topics are published in parallel.
+
+        If the queue of a topic is full, the overflowPolicy decides what happens:
+            "drop_oldest": The oldest queued message is dropped
+            "drop_newest": The new message is dropped
+            "block":       The caller waits until the queue has space again
+
+        Topics can also be set to coalesce (see 'setCoalesce'). Such a topic only keeps
+        the newest unpublished message, older ones are replaced without being published.
+    '''
+
+    def __init__(self, publishRoutine, queueSize=100, workers=1, overflowPolicy=DROP_OLDEST):
+        ''' Creates the pipeline and starts the worker-threads
+
+            publishRoutine: A function (topic, msg), which actually publishes the message
+            queueSize: The maximum number of queued messages per topic
+            workers: The number of worker-threads
+            overflowPolicy: One of OVERFLOW_POLICIES
+        '''
+        if overflowPolicy not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy '{}'. Use one of {}".format(overflowPolicy, OVERFLOW_POLICIES))
+
+        self.publishRoutine = publishRoutine
+        self.queueSize = max(int(queueSize), 1)
+        self.overflowPolicy = overflowPolicy
+        self.closed = False
+
+        self._cond = threading.Condition()
+        self._queues = dict()     # _queues[topic] -> deque of messages
+        self._scheduled = set()   # topics, which are either in _ready or currently published
+        self._ready = deque()     # topics, which have messages and no worker yet
+        self._stats = dict()      # _stats[topic] -> dict of counters
+        self._coalesce = dict()   # _coalesce[topic] -> minimal interval between two publishes in seconds
+        self._notBefore = dict()  # _notBefore[topic] -> time, when the next message of a coalesced topic may be published
+
+        self._workers = []
+        for i in range(max(int(workers), 1)):
+            t = threading.Thread(target=self._work, name="firos-publisher-{}".format(i))
+            t.daemon = True
+            t.start()
+            self._workers.append(t)
+
+
+    def setCoalesce(self, topic, minInterval=0):
+        ''' Sets the topic to coalesce. Only the newest message of this topic is kept
+            and published as soon as the previous publish is done and at least
+            minInterval seconds have passed since then.
+
+            topic: The topic to coalesce
+            minInterval: The minimal time between two publishes in seconds
+        '''
+        with self._cond:
+            self._coalesce[topic] = max(float(minInterval), 0)
+
+
+    def put(self, topic, msg):
+        ''' Queues the message for the topic. Returns False if the
+            message was dropped (or the pipeline is closed)
+        '''
+        with self._cond:
+            if self.closed:
+                return False
+            queue = self._queues.get(topic)
+            if queue is None:
+                queue = self._queues[topic] = deque()
+                self._stats[topic] = dict(enqueued=0, published=0, dropped=0, failed=0, max_depth=0)
+            stats = self._stats[topic]
+
+            if topic in self._coalesce and queue:
+                # Replace the unpublished message with the newer one
+                queue[0] = msg
+                stats["enqueued"] += 1
+                stats["dropped"] += 1
+                return True
+
+            if len(queue) >= self.queueSize:
+                if self.overflowPolicy == DROP_NEWEST:
+                    stats["dropped"] += 1
+                    return False
+                elif self.overflowPolicy == DROP_OLDEST:
+                    queue.popleft()
+                    stats["dropped"] += 1
+                else:
+                    while len(queue) >= self.queueSize and not self.closed:
+                        self._cond.wait()
+                    if self.closed:
+                        return False
+
+            queue.append(msg)
+            stats["enqueued"] += 1
+            stats["max_depth"] = max(stats["max_depth"], len(queue))
+            self._schedule(topic)
+            return True
+
+
+    def _schedule(self, topic):
+        ''' Marks the topic as ready, if no worker is already responsible for it.
+            Needs to be called while holding _cond
+        '''
+        if topic not in self._scheduled:
+            self._scheduled.add(topic)
+            self._setReady(topic)
+
+
+    def _setReady(self, topic):
+        ''' Hands the topic over to the workers. Coalesced topics are delayed
+            via a timer until their minimal interval has passed.
+            Needs to be called while holding _cond
+        '''
+        delay = self._notBefore.get(topic, 0) - time.time()
+        if delay > 0:
+            timer = threading.Timer(delay, self._release, [topic])
+            timer.daemon = True
+            timer.start()
+        else:
+            self._ready.append(topic)
+            self._cond.notify_all()
+
+
+    def _release(self, topic):
+        ''' Called by the timer of a delayed coalesced topic
+        '''
+        with self._cond:
+            if not self.closed:
+                self._ready.append(topic)
+                self._cond.notify_all()
+
+
+    def _work(self):
+        ''' The Routine of each worker. It takes one message of a ready topic, publishes it
+            and reschedules the topic if more messages are queued. This way, a topic with
+            many messages does not starve the other topics.
+        '''
+        while True:
+            with self._cond:
+                while not self._ready and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    return
+                topic = self._ready.popleft()
+                msg = self._queues[topic].popleft()
+                if topic in self._coalesce:
+                    self._notBefore[topic] = time.time() + self._coalesce[topic]
+                # Wake up blocked producers, there is space again
+                self._cond.notify_all()
+
+            success = True
+            try:
+                self.publishRoutine(topic, msg)
+            except Exception:
+                success = False
+                Log("ERROR", "Could not publish message on topic {}:\n{}".format(topic, traceback.format_exc()))
+
+            with self._cond:
+                stats = self._stats[topic]
+                if success:
+                    stats["published"] += 1
+                else:
+                    stats["failed"] += 1
+
+                if self._queues[topic]:
+                    self._setReady(topic)
+                else:
+                    self._scheduled.discard(topic)
+
+
+    def getStatistics(self):
+        ''' Returns the current queue depths and counters of each topic
+        '''
+        with self._cond:
+            topics = dict()
+            for topic, stats in self._stats.items():
+                topicStats = dict(stats)
+                topicStats["depth"] = len(self._queues[topic])
+                topicStats["coalesce"] = topic in self._coalesce
+                topics[topic] = topicStats
+            return dict(workers=len(self._workers),
+                        queue_size=self.queueSize,
+                        overflow_policy=self.overflowPolicy,
+                        topics=topics)
+
+
+    def close(self):
+        ''' Stops the workers. Messages, which are still queued, are not published anymore.
+            Blocked callers are released.
+        '''
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
@@ -0,0 +1,78 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from include.pubsub.genericPubSub import PubSub, RawSink
+
+
+class RecordingSink(RawSink):
+    def __init__(self):
+        self.received = []
+        self.closed = False
+
+    def publishRaw(self, topic, msgType, buf):
+        self.received.append((topic, msgType, buf.tobytes()))
+
+    def unpublish(self):
+        self.closed = True
+
+
+class Test_GenericPubSub(unittest.TestCase):
+
+    def setUp(self):
+        # Without loading the plugins
+        self.pubsub = PubSub.__new__(PubSub)
+        self.pubsub.publishers = []
+        self.pubsub.rawSinks = [RecordingSink(), RecordingSink()]
+
+    def test_Raw_Sink_Is_Abstract(self):
+        self.assertRaises(TypeError, RawSink)
+
+    def test_Publish_Raw(self):
+        self.pubsub.publishRaw("/camera/image/compressed", "sensor_msgs/CompressedImage", memoryview(b"\x01\x02\x03"))
+        for sink in self.pubsub.rawSinks:
+            self.assertEqual(sink.received, [("/camera/image/compressed", "sensor_msgs/CompressedImage", b"\x01\x02\x03")])
+
+    def test_Unpublish_Closes_Raw_Sinks(self):
+        self.pubsub.unpublish()
+        self.assertTrue(all(sink.closed for sink in self.pubsub.rawSinks))
+
+    def test_Module_Names(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        os.mkdir(os.path.join(folder, "__pycache__"))
+        os.mkdir(os.path.join(folder, "nested.py"))
+        for f in ["publisher.py", "subscriber.py", "_private.py", "__init__.py", "test_publisher.py",
+                  "publisher.pyc", "stale.pyc", "config.json", "README"]:
+            open(os.path.join(folder, f), "w").close()
+
+        # Only python-sources, no tests, private, compiled or other files
+        self.assertEqual(PubSub._moduleNames(folder), ["publisher", "subscriber"])
+
+    def test_Plugin_Tests_Are_Not_Loaded(self):
+        folder = os.path.join(os.path.dirname(os.path.realpath(__file__)), "contextbroker")
+        self.assertEqual(PubSub._moduleNames(folder), ["cbConnection", "cbPublisher", "cbSubscriber", "subscriptionManager"])
+
@@ -0,0 +1,206 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import unittest
+import threading
+
+from include.constants import Constants as C
+from include.logger import initLog
+from include.pubsub.publishPipeline import PublishPipeline
+
+
+class Test_PublishPipeline(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        # The failed publish is logged as error
+        C.LOGLEVEL = "CRITICAL"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def setUp(self):
+        '''
+            The publish-Routine of the pipeline waits until 'release' is set,
+            so that the queues can be filled deterministically
+        '''
+        self.release = threading.Event()
+        self.published = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.release.set()
+        self.pipeline.close()
+
+    def _publish(self, topic, msg):
+        self.release.wait()
+        with self.lock:
+            self.published.append((topic, msg))
+
+    def _waitFor(self, count):
+        for _ in range(200):
+            with self.lock:
+                if len(self.published) >= count:
+                    return
+            time.sleep(0.01)
+
+    def _fill(self, policy, queueSize=2):
+        self.pipeline = PublishPipeline(self._publish, queueSize=queueSize, workers=1, overflowPolicy=policy)
+        # The first message is taken by the worker which then waits on 'release'
+        self.pipeline.put("/a", 0)
+        time.sleep(0.05)
+        for i in range(1, 5):
+            self.pipeline.put("/a", i)
+
+
+    def test_Drop_Oldest(self):
+        self._fill("drop_oldest")
+        self.release.set()
+        self._waitFor(3)
+
+        self.assertEqual(self.published, [("/a", 0), ("/a", 3), ("/a", 4)])
+        self.assertEqual(self.pipeline.getStatistics()["topics"]["/a"]["dropped"], 2)
+
+    def test_Drop_Newest(self):
+        self._fill("drop_newest")
+        self.release.set()
+        self._waitFor(3)
+
+        self.assertEqual(self.published, [("/a", 0), ("/a", 1), ("/a", 2)])
+        self.assertEqual(self.pipeline.getStatistics()["topics"]["/a"]["dropped"], 2)
+
+    def test_Block(self):
+        self.pipeline = PublishPipeline(self._publish, queueSize=1, workers=1, overflowPolicy="block")
+        producer = threading.Thread(target=lambda: [self.pipeline.put("/a", i) for i in range(4)])
+        producer.start()
+        time.sleep(0.05)
+        self.assertTrue(producer.is_alive())
+
+        self.release.set()
+        producer.join(2)
+        self._waitFor(4)
+        self.assertEqual(self.published, [("/a", i) for i in range(4)])
+
+    def test_Queue_Depth(self):
+        self._fill("drop_oldest", queueSize=10)
+        stats = self.pipeline.getStatistics()
+
+        self.assertEqual(stats["topics"]["/a"]["depth"], 4)
+        self.assertEqual(stats["topics"]["/a"]["enqueued"], 5)
+        self.assertEqual(stats["topics"]["/a"]["published"], 0)
+
+    def test_Topics_In_Parallel(self):
+        self.pipeline = PublishPipeline(self._publish, queueSize=10, workers=2)
+        self.pipeline.put("/a", 0)
+        self.pipeline.put("/a", 1)
+        self.pipeline.put("/b", 0)
+        time.sleep(0.05)
+
+        # Each topic is taken by one worker, the second message of '/a' needs to wait
+        self.assertEqual(self.pipeline.getStatistics()["topics"]["/a"]["depth"], 1)
+        self.assertEqual(self.pipeline.getStatistics()["topics"]["/b"]["depth"], 0)
+
+    def test_Coalesce(self):
+        self.pipeline = PublishPipeline(self._publish, queueSize=10, workers=1)
+        self.pipeline.setCoalesce("/tf")
+        self.pipeline.put("/tf", 0)
+        time.sleep(0.05)
+        for i in range(1, 5):
+            self.pipeline.put("/tf", i)
+
+        # Only the newest message is kept
+        self.assertEqual(self.pipeline.getStatistics()["topics"]["/tf"]["depth"], 1)
+
+        self.release.set()
+        self._waitFor(2)
+        time.sleep(0.05)
+        self.assertEqual(self.published, [("/tf", 0), ("/tf", 4)])
+
+    def test_Coalesce_Min_Interval(self):
+        self.release.set()
+        self.pipeline = PublishPipeline(self._publish, queueSize=10, workers=1)
+        self.pipeline.setCoalesce("/tf", 0.2)
+        self.pipeline.put("/tf", 0)
+        self._waitFor(1)
+        self.pipeline.put("/tf", 1)
+        self.pipeline.put("/tf", 2)
+        time.sleep(0.05)
+
+        # The newest message waits until the interval passed
+        self.assertEqual(self.published, [("/tf", 0)])
+        self._waitFor(2)
+        self.assertEqual(self.published, [("/tf", 0), ("/tf", 2)])
+
+    def test_Order_With_Concurrent_Producers(self):
+        # As in the CbSubscriber: The notifications are received by several threads, blocking if a queue is full
+        self.release.set()
+        self.pipeline = PublishPipeline(self._publish, queueSize=2, workers=3, overflowPolicy="block")
+        topics = ["/a", "/b", "/c", "/d"]
+        producers = [threading.Thread(target=lambda topic=topic: [self.pipeline.put(topic, i) for i in range(50)])
+                     for topic in topics]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join(5)
+        self._waitFor(len(topics) * 50)
+
+        # Nothing is dropped and each topic is published in order
+        for topic in topics:
+            self.assertEqual([msg for t, msg in self.published if t == topic], list(range(50)))
+            self.assertEqual(self.pipeline.getStatistics()["topics"][topic]["dropped"], 0)
+
+    def test_Block_Released_On_Close(self):
+        self.pipeline = PublishPipeline(self._publish, queueSize=1, workers=1, overflowPolicy="block")
+        results = []
+        producer = threading.Thread(target=lambda: results.extend(self.pipeline.put("/a", i) for i in range(3)))
+        producer.start()
+        time.sleep(0.05)
+        # The worker waits on the first message, the second is queued and the third blocks
+        self.assertTrue(producer.is_alive())
+
+        self.pipeline.close()
+        producer.join(2)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(results, [True, True, False])
+
+    def test_Failed_Publish(self):
+        self.release.set()
+        def publish(topic, msg):
+            if msg == 0:
+                raise ValueError("Cannot convert")
+            self._publish(topic, msg)
+        self.pipeline = PublishPipeline(publish, queueSize=10, workers=1)
+        for i in range(3):
+            self.pipeline.put("/a", i)
+        self._waitFor(2)
+
+        # The following messages of the topic are still published
+        self.assertEqual(self.published, [("/a", 1), ("/a", 2)])
+        self.assertEqual(self.pipeline.getStatistics()["topics"]["/a"]["failed"], 1)
+
+    def test_Unknown_Policy(self):
+        self.pipeline = PublishPipeline(self._publish, workers=1)
+        self.assertRaises(ValueError, PublishPipeline, self._publish, overflowPolicy="unknown")
@@ -0,0 +1,487 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import json
+import math
+import array
+import base64
+from json.encoder import encode_basestring_ascii as _jsonString
+try:
+    # Python 3
+    from urllib.parse import quote, unquote
+except ImportError:
+    # Python 2
+    from urllib import quote, unquote
+
+try:
+    # Optional, only needed for messages of rospy.numpy_msg
+    import numpy
+except ImportError:
+    numpy = None
+
+from include.FiwareObjectConverter.objectFiwareConverter import ObjectFiwareConverter
+from include.logger import Log
+
+
+# Same threshold as in the ObjectFiwareConverter, when (u)int8-Arrays are converted into base64
+THRESH = 256
+INFINITY = float("inf")
+
+# Separator between two numbers in an array, see _numberArray
+NUMBER_SEPARATOR = ', "type": "number"}, {"value": '
+FLOAT_TYPE = set([float])
+INT_TYPE = set([int])
+
+try:
+    # Python 2
+    INTEGER_TYPES = (int, long)
+    STRING_TYPES = (str, unicode)
+except NameError:
+    # Python 3
+    INTEGER_TYPES = (int,)
+    STRING_TYPES = (str,)
+
+# The type of packed arrays in the ContextBroker (see NgsiSerializer.pack)
+PACKED_TYPE = "packed"
+
+# The ROS primitive types, which can be packed: ROS-Type -> (typecode of array, dtype)
+PACKED_TYPES = {
+    "bool": ("B", "|b1"),
+    "int8": ("b", "|i1"),
+    "byte": ("b", "|i1"),
+    "uint8": ("B", "|u1"),
+    "char": ("B", "|u1"),
+    "int16": ("h", "<i2"),
+    "uint16": ("H", "<u2"),
+    "int32": ("i", "<i4"),
+    "uint32": ("I", "<u4"),
+    "int64": ("q", "<i8"),
+    "uint64": ("Q", "<u8"),
+    "float32": ("f", "<f4"),
+    "float64": ("d", "<f8"),
+}
+try:
+    array.array("q")
+except ValueError:
+    # Python 2 has no 'q', but 'l' has 8 bytes on 64-Bit
+    PACKED_TYPES["int64"] = ("l", "<i8")
+    PACKED_TYPES["uint64"] = ("L", "<u8")
+
+# Cache of the metadata-JSON of (string) dataTypes
+_METADATA = dict()
+
+# Compiled plans of classes: _PLANS[(class, id(dataType))] -> (dataType, _ObjectPlan)
+# The dataType is kept referenced, so that its id stays unique
+_PLANS = dict()
+
+# The message classes, which were converted by the ObjectFiwareConverter (the warning is logged once)
+_FALLBACKS = set()
+
+
+class UnsupportedTypeError(TypeError):
+    ''' A value of a message cannot be converted by the compiled plans
+    '''
+    pass
+
+
+class NgsiSerializer(object):
+    ''' The NgsiSerializer converts ROS-Messages into the Entity-JSON of the ContextBroker.
+        The output is the same Entity (the JSON equivalent, up to the order of the keys) as of
+
+            ObjectFiwareConverter.obj2Fiware(obj, ind=None, dataTypeDict, ignorePythonMetaData=True, ...)
+
+        But instead of walking through each message (and its dataTypeDict) reflectively, the
+        structure of a message class is compiled once into a plan (see 'compile'), which is
+        cached in the registry. Only the values are retrieved for each message.
+
+        If a message contains something, which the plans do not cover (UnsupportedTypeError), the
+        ObjectFiwareConverter is used as fallback.
+    '''
+
+    # registry[(msgClass, id(dataTypeDict))] -> (dataTypeDict, _EntityPlan)
+    registry = dict()
+
+    @classmethod
+    def compile(cls, msgClass, dataTypeDict):
+        ''' Compiles the plan of the message class for the given dataTypeDict (see rosMsg2Dict)
+            and adds it to the registry. This should be called once, after the message class
+            is loaded.
+
+            msgClass: The ROS-Message-class
+            dataTypeDict: The dictionary of the data types of this message class
+        '''
+        plan = _EntityPlan(msgClass, dataTypeDict)
+        cls.registry[(msgClass, id(dataTypeDict))] = (dataTypeDict, plan)
+        return plan
+
+
+    @classmethod
+    def obj2Fiware(cls, rawMsg, entityId, entityType, dataTypeDict, showIdValue=True, encode=False, packed=(), attrs=None):
+        ''' Converts the ROS-Message into the Entity-JSON.
+
+            rawMsg: The ROS-Message
+            entityId: The id of the Entity
+            entityType: The type of the Entity
+            dataTypeDict: The dictionary of the data types of this message class
+            showIdValue: Adds id and type to the Entity-JSON
+            encode: Escapes the strings (OCB Specific!)
+            packed: The attributes (primitive arrays), which are packed (see 'pack')
+            attrs: Only these attributes are converted, if given (None converts all)
+        '''
+        try:
+            entry = cls.registry.get((type(rawMsg), id(dataTypeDict)))
+            if entry is None:
+                plan = cls.compile(type(rawMsg), dataTypeDict)
+            else:
+                plan = entry[1]
+            return plan.encode(rawMsg, entityId, entityType, showIdValue, encode, packed, attrs)
+        except UnsupportedTypeError as ex:
+            # Something which is not covered here, let the ObjectFiwareConverter handle it
+            if type(rawMsg) not in _FALLBACKS:
+                _FALLBACKS.add(type(rawMsg))
+                Log("WARNING", "Messages of {} are converted by the ObjectFiwareConverter: {}".format(entityType, ex))
+            return cls._reflective(rawMsg, entityId, entityType, dataTypeDict, showIdValue, encode, attrs, packed)
+
+
+    @staticmethod
+    def _reflective(rawMsg, entityId, entityType, dataTypeDict, showIdValue=True, encode=False, attrs=None, packed=()):
+        ''' Converts the ROS-Message via the ObjectFiwareConverter, which walks through a dict
+            of its __slots__ (and its dataTypeDict) for each message. The packed attributes are
+            packed here and appended (as in the compiled plans, only primitive arrays are packed)
+        '''
+        packable = dict()
+        for key, keyType in zip(rawMsg.__slots__, getattr(rawMsg, "_slot_types", ())):
+            if key in packed and keyType.endswith("]") and keyType.split("[")[0] in PACKED_TYPES:
+                packable[key] = keyType
+
+        obj = {s: getattr(rawMsg, s, None) for s in rawMsg.__slots__
+                    if (attrs is None or s in attrs) and s not in packable}
+        obj["type"] = entityType
+        obj["id"] = entityId
+        jsonStr = ObjectFiwareConverter.obj2Fiware(obj,
+                    ind=None,
+                    dataTypeDict=dataTypeDict,
+                    ignorePythonMetaData=True,
+                    showIdValue=showIdValue,
+                    encode=encode)
+
+        packedAttrs = [_jsonString(key) + ": " + NgsiSerializer.pack(getattr(rawMsg, key), keyType)
+                        for key, keyType in packable.items() if attrs is None or key in attrs]
+        if not packedAttrs:
+            return jsonStr
+        head = jsonStr.rstrip()[:-1].rstrip()
+        return head + (", " if head != "{" else "") + ", ".join(packedAttrs) + "}"
+
+
+    @staticmethod
+    def pack(value, rosType):
+        ''' Returns the JSON of a packed array. Instead of a JSON-Array of numbers, the value is
+            the (url-safe) base64 of the packed little-endian buffer. The metadata contains the
+            dataType, the dtype (as in numpy) and the shape of the array:
+
+                {"value": "AACAPwAAAEA%3D", "type": "packed", "metadata": {
+                    "dataType": {"type": "dataType", "value": "float32[]"},
+                    "dtype": {"type": "string", "value": "<f4"},
+                    "shape": {"type": "array", "value": [2]}}}
+
+            value: The array (list, tuple, bytes or numpy.ndarray)
+            rosType: The ROS-Type of the array, e.g. "float32[]"
+        '''
+        typecode, dtype = PACKED_TYPES[rosType.split("[")[0]]
+        if numpy is not None and type(value) is numpy.ndarray:
+            buf = value.astype(dtype).tobytes()
+        elif typecode == "B" and type(value) is bytes:
+            buf = value
+        else:
+            arr = array.array(typecode, value)
+            if sys.byteorder != "little":
+                arr.byteswap()
+            buf = arr.tobytes() if hasattr(arr, "tobytes") else arr.tostring()
+
+        # '=' is a forbidden character in the ContextBroker, it is only used for padding
+        encoded = base64.urlsafe_b64encode(buf).decode("ascii").replace("=", "%3D")
+        metadata = dict(dataType=dict(type="dataType", value=rosType),
+                        dtype=dict(type="string", value=dtype),
+                        shape=dict(type="array", value=[len(buf) // array.array(typecode).itemsize]))
+        return '{"value": "' + encoded + '", "type": "' + PACKED_TYPE + '", "metadata": ' + json.dumps(metadata) + '}'
+
+
+    @staticmethod
+    def unpack(attribute):
+        ''' Returns the array of a packed attribute (see 'pack'), as received from the ContextBroker.
+            The buffer is not copied element by element: uint8-Arrays are returned as bytes,
+            all others as array.array, which can be directly set on a ROS-Message.
+
+            attribute: The received attribute (dict) with value, type and metadata
+        '''
+        rosType = attribute["metadata"]["dataType"]["value"]
+        typecode = PACKED_TYPES[rosType.split("[")[0]][0]
+        buf = base64.urlsafe_b64decode(unquote(attribute["value"]).encode("ascii"))
+        if rosType.startswith("uint8") or rosType.startswith("char"):
+            return buf
+
+        arr = array.array(typecode)
+        if hasattr(arr, "frombytes"):
+            arr.frombytes(buf)
+        else:
+            arr.fromstring(buf)
+        if sys.byteorder != "little":
+            arr.byteswap()
+        return arr
+
+
+
+class _EntityPlan(object):
+    ''' The compiled plan of a message class on Entity-level.
+        Each slot of the message is an attribute of the Entity.
+    '''
+
+    def __init__(self, msgClass, dataTypeDict):
+        self.slots = []
+        self.packable = dict() # packable[key] -> ROS-Type of primitive arrays
+        defaultMsg = msgClass()
+        for key, keyType in zip(msgClass.__slots__, msgClass._slot_types):
+            if key == "type" or key == "id" or key.startswith("_"):
+                # Not allowed as attribute, skipped by the ObjectFiwareConverter
+                continue
+            dataType = dataTypeDict.get(key)
+            self.slots.append((key, _jsonString(key) + ": ", dataType))
+            if keyType.endswith("]") and keyType.split("[")[0] in PACKED_TYPES:
+                self.packable[key] = keyType
+
+            # Compile the plans of nested messages
+            default = getattr(defaultMsg, key, None)
+            if hasattr(default, "__slots__"):
+                _getPlan(type(default), dataType)
+
+
+    def encode(self, rawMsg, entityId, entityType, showIdValue, encode, packed=(), only=None):
+        slots = self.slots
+        if only is not None:
+            slots = [slot for slot in slots if slot[0] in only]
+
+        if packed:
+            attrs = []
+            for key, prefix, dataType in slots:
+                if key in packed and key in self.packable:
+                    attrs.append(prefix + NgsiSerializer.pack(getattr(rawMsg, key), self.packable[key]))
+                else:
+                    attrs.append(prefix + _attribute(getattr(rawMsg, key, None), dataType, encode, True))
+        else:
+            attrs = [prefix + _attribute(getattr(rawMsg, key, None), dataType, encode, True)
+                        for key, prefix, dataType in slots]
+
+        if showIdValue:
+            if encode:
+                entityType = quote(entityType, safe='')
+                entityId = quote(entityId, safe='')
+            attrs.insert(0, '"type": ' + _jsonString(entityType) + ', "id": ' + _jsonString(entityId))
+
+        return "{" + ", ".join(attrs) + "}"
+
+
+
+class _ObjectPlan(object):
+    ''' The compiled plan of a (nested) class with a specific dataType. ROS-Messages are
+        recognized by '_type', '_slot_types' and '__slots__'.
+    '''
+
+    def __init__(self, clazz, dataType):
+        self.isRos = hasattr(clazz, '_type') and hasattr(clazz, '_slot_types') and hasattr(clazz, '__slots__')
+        self.slots = []
+
+        if self.isRos:
+            self.typeJSON = (_jsonString(clazz._type), _jsonString(quote(clazz._type, safe='')))
+            for key, keyType in zip(clazz.__slots__, clazz._slot_types):
+                if key.startswith('_'):
+                    continue
+                innerDataType = None
+                uint8 = False
+                if dataType is not None and key in dataType:
+                    innerDataType = dataType[key]
+                    uint8 = "uint8[" in innerDataType
+                # Long (u)int8-Arrays may be converted into base64 (see _base64)
+                self.slots.append((key, _jsonString(key) + ": ", 'int8[' in keyType, dataType is not None and key in dataType, innerDataType, uint8))
+        else:
+            # Simple class, only the known slots are converted
+            self.typeJSON = (_jsonString(clazz.__name__),) * 2
+            for key in clazz.__slots__:
+                if key.startswith('_'):
+                    continue
+                innerDataType = None
+                if dataType is not None and key in dataType:
+                    innerDataType = dataType[key]
+                self.slots.append((key, _jsonString(key) + ": ", innerDataType))
+
+        self.dataType = dataType
+
+
+    def encode(self, obj, encode):
+        ''' Returns the JSON of the value and the type
+        '''
+        if not self.isRos:
+            value = [prefix + _attribute(getattr(obj, key), innerDataType, encode) for key, prefix, innerDataType in self.slots]
+            return "{" + ", ".join(value) + "}", self.typeJSON[0]
+
+        value = []
+        for key, prefix, isInt8, hasDataType, innerDataType, uint8 in self.slots:
+            attr = getattr(obj, key)
+            if isInt8 and len(attr) >= THRESH:
+                value.append(prefix + _base64(attr, 'b', self.dataType[key]))
+            elif hasDataType:
+                if uint8:
+                    # SPECIAL ROS CASE we have uint8[]-Array as a String or bytes
+                    toConvert = None
+                    if type(attr) is str:
+                        toConvert = array.array("B", attr).tolist()
+                    if bytes is not str and type(attr) is bytes:
+                        toConvert = list(attr)
+                    if toConvert is not None and len(toConvert) >= THRESH:
+                        value.append(prefix + _base64(attr, 'B', innerDataType))
+                    else:
+                        value.append(prefix + _attribute(toConvert, innerDataType, encode))
+                else:
+                    value.append(prefix + _attribute(attr, innerDataType, encode))
+            else:
+                value.append(prefix + _attribute(attr, None, encode))
+        return "{" + ", ".join(value) + "}", self.typeJSON[encode]
+
+
+
+def _getPlan(clazz, dataType):
+    ''' Returns the (cached) plan of the class with the dataType
+    '''
+    entry = _PLANS.get((clazz, id(dataType)))
+    if entry is None:
+        if not hasattr(clazz, '__slots__'):
+            # Objects with a __dict__ cannot be compiled
+            return None
+        entry = (dataType, _ObjectPlan(clazz, dataType))
+        _PLANS[(clazz, id(dataType))] = entry
+    return entry[1]
+
+
+def _attribute(value, dataType, encode, baseEntity=False):
+    ''' Returns the JSON of an attribute {"value": ..., "type": ..., "metadata": ...}
+        exactly as the EntityAttribute of the ObjectFiwareConverter (without python metadata)
+    '''
+    t = type(value)
+    metadata = baseEntity
+    if t is float:
+        result = '{"value": ' + _jsonFloat(value) + ', "type": "number"'
+    elif t is bool:
+        result = '{"value": ' + ('true' if value else 'false') + ', "type": "boolean"'
+    elif t in INTEGER_TYPES:
+        result = '{"value": ' + str(value) + ', "type": "number"'
+    elif t in STRING_TYPES:
+        if encode:
+            value = quote(value, safe='')
+        result = '{"value": ' + _jsonString(value) + ', "type": "string"'
+    elif value is None:
+        result = '{"value": null, "type": ""'
+    elif t is list or t is tuple:
+        items = _numberArray(value)
+        if items is None:
+            items = ", ".join([_attribute(item, None, encode) for item in value])
+        result = '{"value": [' + items + '], "type": "array"'
+        metadata = True
+    elif numpy is not None and t is numpy.ndarray:
+        # Arrays of numpy_msg are handled like lists
+        return _attribute(value.tolist(), dataType, encode, baseEntity)
+    elif t is dict:
+        items = []
+        for key, item in value.items():
+            if type(key) not in STRING_TYPES:
+                raise UnsupportedTypeError("Only string keys are supported")
+            innerDataType = None
+            if dataType is not None and key in dataType:
+                innerDataType = dataType[key]
+            items.append(_jsonString(key) + ": " + _attribute(item, innerDataType, encode))
+        result = '{"value": {' + ", ".join(items) + '}, "type": "object"'
+    elif t is complex:
+        result = '{"value": [' + _attribute(value.real, None, encode) + ", " + _attribute(value.imag, None, encode) + '], "type": "array"'
+    else:
+        plan = _getPlan(t, dataType)
+        if plan is None:
+            raise UnsupportedTypeError("Cannot compile {}".format(t))
+        valueJSON, typeJSON = plan.encode(value, encode)
+        result = '{"value": ' + valueJSON + ', "type": ' + typeJSON
+
+    if metadata and dataType is not None:
+        return result + ', "metadata": ' + _metadata(dataType) + '}'
+    return result + '}'
+
+
+def _numberArray(value):
+    ''' Returns the JSON of the items of an array, which only contains floats (or only ints),
+        in one pass over the whole array. E.g. the ranges of a LaserScan or the data of
+        an OccupancyGrid. Returns None for other arrays, they are converted item by item.
+    '''
+    if not value:
+        return ""
+    types = set(map(type, value))
+    if types == FLOAT_TYPE:
+        if any(map(math.isnan, value)) or any(map(math.isinf, value)):
+            # nan or inf, which are represented differently in JSON
+            return None
+        items = NUMBER_SEPARATOR.join(map(float.__repr__, value))
+    elif types == INT_TYPE:
+        # Booleans are of their own type and are not joined here
+        items = NUMBER_SEPARATOR.join(map(int.__repr__, value))
+    else:
+        # The array contains other types as well
+        return None
+    return '{"value": ' + items + ', "type": "number"}'
+
+
+def _base64(value, typecode, dataType):
+    ''' Returns the JSON of a long (u)int8-Array, which is converted into base64
+    '''
+    arr = array.array(typecode, value)
+    encoded = quote(base64.b64encode(arr.tobytes() if hasattr(arr, "tobytes") else arr.tostring()), safe='')
+    if dataType is None:
+        return '{"value": ' + _jsonString(encoded) + ', "type": "base64", "metadata": {}}'
+    return '{"value": ' + _jsonString(encoded) + ', "type": "base64", "metadata": ' + _metadata(dataType) + '}'
+
+
+def _metadata(dataType):
+    ''' Returns the JSON of the metadata containing the dataType
+    '''
+    if type(dataType) in STRING_TYPES:
+        metadata = _METADATA.get(dataType)
+        if metadata is None:
+            metadata = _METADATA[dataType] = json.dumps(dict(dataType=dict(type="dataType", value=dataType)))
+        return metadata
+    return json.dumps(dict(dataType=dict(type="dataType", value=dataType)))
+
+
+def _jsonFloat(value):
+    ''' Same representation of floats as in json.dumps
+    '''
+    if value != value:
+        return 'NaN'
+    elif value == INFINITY:
+        return 'Infinity'
+    elif value == -INFINITY:
+        return '-Infinity'
+    return float.__repr__(value)
@@ -17,17 +17,23 @@
 import os
 import re
 import json
+import bisect
 import rostopic
 import rospy
 
 from include.logger import Log
 from include.constants import Constants as C
+from include import startup
 
 
 entries = [] # Entries we found in the ROS-World 
+topicTypes = {} # The MessageTypes of the entries (from the same call to the ROS-Master): topicTypes["topic"] = MessageType
 whitelist = {} # The Current Whitelist FIROS is currently using
 robots = {} # The dictionary containing: robots["topics"] = [MessageType, pubSub]
 
+_regexes = {} # The compiled regexes of the whitelist: _regexes[regex] = (compiled regex, literal prefix)
+_sortedEntries = (None, []) # (entries, sorted entries) to find the entries with a prefix via bisect
+
 class RosConfigurator:
     '''
         RosConfigurator -> This is an OLD Name
@@ -42,9 +48,13 @@ class RosConfigurator:
             update our current information abour the entries or not
         '''
         global entries
+        global topicTypes
         if refresh or len(entries) == 0:
-            listOfData = rospy.get_published_topics()
+            with startup.Phase("published topics"):
+                listOfData = rospy.get_published_topics()
             entries = [item for sublist in listOfData for item in sublist if item.startswith("/")]
+            # The types are already known from the ROS-Master, no need to ask it again for each topic
+            topicTypes = dict((topic, topicType) for topic, topicType in listOfData)
             
         return entries
     
@@ -111,15 +121,54 @@ class RosConfigurator:
             entries:The String Entries. Each element is in the following structure "/ROBOT_ID/TOPIC_NAME"
             pubsub: A String. Either "publisher" or "subscriber"
         '''
-        for entry in entries:
-            matches = re.search(regex, entry)
-            if matches is not None:
-                # We found a Match. Now add it to robots
-                
-                if entry not in robots:
-                    # if not already added, add it
-                    topic_type, _, _ = rostopic.get_topic_type(entry)
-                    robots[entry] = [topic_type ,pubsub]
+        compiled, prefix = RosConfigurator._compile(regex)
+        for entry in RosConfigurator._candidates(entries, prefix):
+            if entry not in robots and compiled.search(entry) is not None:
+                # We found a Match and it is not already added. Now add it to robots
+                robots[entry] = [RosConfigurator.getTopicType(entry), pubsub]
+
+
+    @staticmethod
+    def getTopicType(topic):
+        '''
+            Returns the MessageType of the topic. It is taken from the last call to the ROS-Master
+            in getAllTopics, only unknown topics are requested from the ROS-Master.
+        '''
+        if topic not in topicTypes:
+            with startup.Phase("type", topic):
+                topicTypes[topic], _, _ = rostopic.get_topic_type(topic)
+        return topicTypes[topic]
+
+
+    @staticmethod
+    def _compile(regex):
+        '''
+            Returns the compiled regex and its literal prefix (compiled only once for each regex)
+        '''
+        if regex not in _regexes:
+            _regexes[regex] = (re.compile(regex), _literalPrefix(regex))
+        return _regexes[regex]
+
+
+    @staticmethod
+    def _candidates(entries, prefix):
+        '''
+            Returns the entries, which start with prefix. These are found in the sorted
+            entries via bisect, instead of trying the regex on every entry.
+        '''
+        global _sortedEntries
+        if not prefix:
+            return entries
+        if _sortedEntries[0] is not entries:
+            _sortedEntries = (entries, sorted(entries))
+        sortedEntries = _sortedEntries[1]
+
+        candidates = []
+        for i in range(bisect.bisect_left(sortedEntries, prefix), len(sortedEntries)):
+            if not sortedEntries[i].startswith(prefix):
+                break
+            candidates.append(sortedEntries[i])
+        return candidates
 
 
     @staticmethod
@@ -156,3 +205,22 @@ class RosConfigurator:
 
         if restore:
             whitelist = RosConfigurator.getWhiteList(restore=True)
+
+
+
+def _literalPrefix(regex):
+    '''
+        Returns the literal prefix, each match of the regex starts with. E.g. "^/robot1/.*" -> "/robot1/".
+        It is empty, if the regex is not anchored with "^" or contains alternatives.
+    '''
+    if not regex.startswith("^") or "|" in regex:
+        return ""
+    prefix = ""
+    for char in regex[1:]:
+        if char in "*?{":
+            # The previous character is optional
+            return prefix[:-1]
+        if char in ".^$+[]()\\":
+            break
+        prefix += char
+    return prefix
@@ -0,0 +1,251 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import unittest
+
+from include.constants import Constants as C
+from include.logger import initLog
+
+try:
+    from include.FiwareObjectConverter.objectFiwareConverter import ObjectFiwareConverter
+    from include.ros import ngsiSerializer
+    from include.ros.ngsiSerializer import NgsiSerializer, _numberArray
+except ImportError:
+    ObjectFiwareConverter = None
+
+
+# Minimal message classes, structured like the ones generated by genpy
+
+class Time(object):
+    __slots__ = ['secs', 'nsecs']
+    def __init__(self):
+        self.secs = 0
+        self.nsecs = 0
+
+class Header(object):
+    __slots__ = ['seq', 'stamp', 'frame_id']
+    _slot_types = ['uint32', 'time', 'string']
+    _type = 'std_msgs/Header'
+    def __init__(self):
+        self.seq = 0
+        self.stamp = Time()
+        self.frame_id = ''
+
+class Grid(object):
+    __slots__ = ['header', 'resolution', 'valid', 'ranges', 'data', 'image']
+    _slot_types = ['std_msgs/Header', 'float32', 'bool', 'float32[]', 'int8[]', 'test_msgs/Image']
+    _type = 'test_msgs/Grid'
+    def __init__(self):
+        self.header = Header()
+        self.resolution = 0.0
+        self.valid = False
+        self.ranges = []
+        self.data = []
+        self.image = Image()
+
+class Image(object):
+    __slots__ = ['encoding', 'data']
+    _slot_types = ['string', 'uint8[]']
+    _type = 'test_msgs/Image'
+    def __init__(self):
+        self.encoding = ''
+        self.data = b''
+
+
+def msg2Dict(msg):
+    # Same as rosMsg2Dict in topicHandler
+    obj = {}
+    for key, t in zip(msg.__slots__, msg._slot_types):
+        attr = getattr(msg, key)
+        obj[key] = msg2Dict(attr) if hasattr(attr, '__slots__') and hasattr(attr, '_slot_types') else t
+    return obj
+
+
+class Settings(object):
+    # Not covered by the compiled plans (no __slots__), but by the ObjectFiwareConverter
+    def __init__(self):
+        self.mode = "auto"
+        self.level = 2
+
+class Config(object):
+    __slots__ = ['name', 'settings', 'ranges']
+    _slot_types = ['string', 'test_msgs/Settings', 'float32[]']
+    _type = 'test_msgs/Config'
+    def __init__(self):
+        self.name = ''
+        self.settings = Settings()
+        self.ranges = []
+
+
+@unittest.skipIf(ObjectFiwareConverter is None, "FiwareObjectConverter is not available")
+class Test_NgsiSerializer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def _convert(self, msg, showIdValue, encode):
+        dataTypeDict = msg2Dict(type(msg)())
+        obj = {s: getattr(msg, s, None) for s in msg.__slots__}
+        obj["type"] = msg._type
+        obj["id"] = "robot.grid"
+        expected = ObjectFiwareConverter.obj2Fiware(obj, ind=None, dataTypeDict=dataTypeDict,
+                        ignorePythonMetaData=True, showIdValue=showIdValue, encode=encode)
+        actual = NgsiSerializer.obj2Fiware(msg, "robot.grid", msg._type, dataTypeDict,
+                        showIdValue=showIdValue, encode=encode)
+        return expected, actual
+
+    def _assertSame(self, msg):
+        for showIdValue in [True, False]:
+            for encode in [True, False]:
+                expected, actual = self._convert(msg, showIdValue, encode)
+                # The order of the keys differs on Python 2, the Entities are the same
+                self.assertEqual(json.loads(expected), json.loads(actual))
+
+    def test_Default_Message(self):
+        self._assertSame(Grid())
+
+    def test_Filled_Message(self):
+        msg = Grid()
+        msg.header.seq = 42
+        msg.header.frame_id = "map/frame 1"
+        msg.resolution = 0.05
+        msg.valid = True
+        msg.ranges = [0.1, 1e300, float("inf"), float("nan"), -0.0, 3]
+        msg.data = [-1, 0, 100]
+        msg.image.encoding = "rgb8"
+        msg.image.data = b'\x00\x01\xff'
+        self._assertSame(msg)
+
+    def test_Base64_Arrays(self):
+        msg = Grid()
+        msg.data = [i % 100 for i in range(1000)]
+        msg.image.data = bytes(bytearray(range(256))) * 2
+        self._assertSame(msg)
+
+    def test_Number_Arrays(self):
+        msg = Grid()
+        msg.ranges = tuple(i / 7.0 for i in range(1000))
+        msg.data = list(range(-500, 500))
+        self._assertSame(msg)
+
+        # Arrays, which are not only floats or ints, are converted item by item
+        for ranges in [[True, False], [1.5, 2, None], [1, 2.5], [1e-7, float("-inf")], ["1", "2"]]:
+            msg.ranges = ranges
+            self._assertSame(msg)
+
+    def test_Number_Arrays_Joined(self):
+        # Arrays of only floats or only ints are joined in one pass
+        self.assertEqual(json.loads("[" + _numberArray([1.5, -2.25]) + "]"),
+                         [dict(value=1.5, type="number"), dict(value=-2.25, type="number")])
+        self.assertEqual(json.loads("[" + _numberArray((1, -2)) + "]"),
+                         [dict(value=1, type="number"), dict(value=-2, type="number")])
+
+        # Everything else is converted item by item
+        for value in [[True, False], [1, True], [1, 2.5], [0.5, float("nan")], [float("inf")], ["1"]]:
+            self.assertIsNone(_numberArray(value))
+
+    def test_Fallback(self):
+        logged = []
+        self.addCleanup(setattr, ngsiSerializer, "Log", ngsiSerializer.Log)
+        ngsiSerializer.Log = lambda level, *args: logged.append(level)
+        ngsiSerializer._FALLBACKS.discard(Config)
+
+        msg = Config()
+        msg.name = "robot"
+        dataTypeDict = {"name": "string", "settings": "test_msgs/Settings", "ranges": "float32[]"}
+        for _ in range(2):
+            actual = NgsiSerializer.obj2Fiware(msg, "robot.config", msg._type, dataTypeDict)
+            expected = NgsiSerializer._reflective(msg, "robot.config", msg._type, dataTypeDict)
+            self.assertEqual(json.loads(actual), json.loads(expected))
+        # Warned once per message class
+        self.assertEqual(logged, ["WARNING"])
+
+    def test_Fallback_Packed(self):
+        ngsiSerializer._FALLBACKS.add(Config)
+        msg = Config()
+        msg.ranges = [0.5, -1.25]
+        dataTypeDict = {"name": "string", "settings": "test_msgs/Settings", "ranges": "float32[]"}
+        for attrs in [None, ["ranges"]]:
+            entity = json.loads(NgsiSerializer.obj2Fiware(msg, "robot.config", msg._type, dataTypeDict,
+                                packed=["ranges"], attrs=attrs))
+            self.assertEqual(entity["ranges"]["type"], "packed")
+            self.assertEqual(list(NgsiSerializer.unpack(entity["ranges"])), [0.5, -1.25])
+            self.assertEqual("settings" in entity, attrs is None)
+
+        # The same packed attributes as of the compiled plans
+        msg = Grid()
+        msg.ranges = (0.5, -1.25, 3.0)
+        dataTypeDict = msg2Dict(Grid())
+        for showIdValue in [True, False]:
+            expected = NgsiSerializer.obj2Fiware(msg, "robot.grid", msg._type, dataTypeDict, showIdValue=showIdValue,
+                                                 encode=True, packed=["ranges"])
+            actual = NgsiSerializer._reflective(msg, "robot.grid", msg._type, dataTypeDict, showIdValue=showIdValue,
+                                                encode=True, packed=["ranges"])
+            self.assertEqual(json.loads(actual), json.loads(expected))
+
+    def test_Errors_Are_Raised(self):
+        # Other errors (e.g. a bug in a plan) are not hidden by the fallback
+        def encode(*args):
+            raise ValueError("broken")
+        dataTypeDict = msg2Dict(Grid())
+        NgsiSerializer.compile(Grid, dataTypeDict).encode = encode
+        self.assertRaises(ValueError, NgsiSerializer.obj2Fiware, Grid(), "robot.grid", Grid._type, dataTypeDict)
+
+    def test_Packed_Arrays(self):
+        msg = Grid()
+        msg.ranges = (0.5, -1.25, 3.0)
+        msg.data = list(range(-128, 128))
+        dataTypeDict = msg2Dict(Grid())
+        entity = json.loads(NgsiSerializer.obj2Fiware(msg, "robot.grid", msg._type, dataTypeDict,
+                        encode=True, packed=["ranges", "data", "header"]))
+
+        self.assertEqual(entity["ranges"]["type"], "packed")
+        self.assertEqual(entity["ranges"]["metadata"]["dtype"]["value"], "<f4")
+        self.assertEqual(entity["ranges"]["metadata"]["shape"]["value"], [3])
+        self.assertEqual(list(NgsiSerializer.unpack(entity["ranges"])), [0.5, -1.25, 3.0])
+        self.assertEqual(list(NgsiSerializer.unpack(entity["data"])), msg.data)
+
+        # Only primitive arrays are packed
+        self.assertEqual(entity["header"]["type"], "std_msgs%2FHeader")
+
+    def test_Packed_Bytes(self):
+        data = bytes(bytearray(range(256)))
+        attribute = json.loads(NgsiSerializer.pack(data, "uint8[]"))
+
+        self.assertNotIn("=", attribute["value"])
+        self.assertEqual(NgsiSerializer.unpack(attribute), data)
+
+    def test_Compiled_Once(self):
+        dataTypeDict = msg2Dict(Grid())
+        NgsiSerializer.compile(Grid, dataTypeDict)
+        plan = NgsiSerializer.registry[(Grid, id(dataTypeDict))][1]
+
+        NgsiSerializer.obj2Fiware(Grid(), "robot.grid", Grid._type, dataTypeDict)
+        self.assertIs(NgsiSerializer.registry[(Grid, id(dataTypeDict))][1], plan)
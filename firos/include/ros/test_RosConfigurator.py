@@ -0,0 +1,71 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+try:
+    from include.ros import rosConfigurator
+    from include.ros.rosConfigurator import RosConfigurator, _literalPrefix
+except ImportError:
+    rosConfigurator = None
+
+
+@unittest.skipIf(rosConfigurator is None, "ROS is not available")
+class Test_RosConfigurator(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = ["/turtle1/cmd_vel", "/turtle1/pose", "/turtle2/cmd_vel", "/turtle10/pose", "/rosout"]
+        rosConfigurator.topicTypes = {
+            "/turtle1/cmd_vel": "geometry_msgs/Twist",
+            "/turtle1/pose": "turtlesim/Pose",
+            "/turtle2/cmd_vel": "geometry_msgs/Twist",
+            "/turtle10/pose": "turtlesim/Pose",
+            "/rosout": "rosgraph_msgs/Log"
+        }
+
+    def test_Literal_Prefix(self):
+        self.assertEqual(_literalPrefix("^/turtle1/cmd_vel$"), "/turtle1/cmd_vel")
+        self.assertEqual(_literalPrefix("^/turtle1/.*"), "/turtle1/")
+        self.assertEqual(_literalPrefix("^/turtles?/pose"), "/turtle")
+        self.assertEqual(_literalPrefix("^/turtle1+/pose"), "/turtle1")
+        self.assertEqual(_literalPrefix("^/turtle1/pose|^/rosout"), "")
+        self.assertEqual(_literalPrefix("/turtle1/.*"), "")
+
+    def test_Add_Robots(self):
+        robots = {}
+        RosConfigurator.addRobots(robots, "^/turtle1/.*", self.entries, "subscriber")
+        RosConfigurator.addRobots(robots, "/pose$", self.entries, "publisher")
+        self.assertEqual(robots, {
+            "/turtle1/cmd_vel": ["geometry_msgs/Twist", "subscriber"],
+            "/turtle1/pose": ["turtlesim/Pose", "subscriber"],
+            "/turtle10/pose": ["turtlesim/Pose", "publisher"]
+        })
+
+    def test_Add_Robots_Optional_Prefix(self):
+        robots = {}
+        RosConfigurator.addRobots(robots, "^/turtle1?/cmd_vel", self.entries, "publisher")
+        RosConfigurator.addRobots(robots, "^/turtle[0-9]+/pose$", self.entries, "publisher")
+        self.assertEqual(sorted(robots.keys()), ["/turtle1/cmd_vel", "/turtle1/pose", "/turtle10/pose"])
+
+
+if __name__ == '__main__':
+    unittest.main()
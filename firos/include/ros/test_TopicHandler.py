@@ -0,0 +1,198 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import unittest
+
+from include.constants import Constants as C
+from include.logger import initLog
+
+try:
+    import genpy
+    from include.ros import topicHandler
+    from include.ros.ngsiSerializer import NgsiSerializer
+    Message = genpy.Message
+except ImportError:
+    topicHandler = None
+    Message = object
+
+
+class AnyMsg(object):
+    ''' As rospy.AnyMsg, the buffer is the serialized message
+    '''
+    def __init__(self, buff):
+        self._buff = buff
+
+
+class Sinks(object):
+    def __init__(self):
+        self.received = []
+
+    def publishRaw(self, topic, msgType, buf):
+        self.received.append((topic, msgType, buf))
+
+    def publish(self, topic, rawMsg, msgDefinitions):
+        raise AssertionError("Passthrough topics are not published")
+
+
+@unittest.skipIf(topicHandler is None, "ROS is not available")
+class Test_TopicHandler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def setUp(self):
+        self.cloudPubSub = topicHandler.CloudPubSub
+        topicHandler.CloudPubSub = Sinks()
+        topicHandler.ROS_TOPIC_TYPE["/camera/compressed"] = "sensor_msgs/CompressedImage"
+
+    def tearDown(self):
+        topicHandler.CloudPubSub = self.cloudPubSub
+        del topicHandler.ROS_TOPIC_TYPE["/camera/compressed"]
+
+    def test_Passthrough_Forwards_Buffer(self):
+        data = AnyMsg(b"\x00\x01serialized")
+        topicHandler._passthroughRoutine(data, {"topic": "/camera/compressed"})
+
+        topic, msgType, buf = topicHandler.CloudPubSub.received[0]
+        self.assertEqual((topic, msgType), ("/camera/compressed", "sensor_msgs/CompressedImage"))
+        self.assertTrue(isinstance(buf, memoryview))
+        self.assertEqual(buf.tobytes(), b"\x00\x01serialized")
+        # Not copied
+        self.assertTrue(buf.obj is data._buff)
+
+
+# Minimal message classes, structured like the ones generated by genpy
+
+def _init(msg, defaults, args, kwds):
+    # As the generated constructors: missing (None) arguments get their default value
+    if args or kwds:
+        Message.__init__(msg, *args, **kwds)
+    for slot, default in zip(msg.__slots__, defaults):
+        if getattr(msg, slot, None) is None:
+            setattr(msg, slot, default())
+
+class Time(object):
+    __slots__ = ['secs', 'nsecs']
+    def __init__(self, secs=0, nsecs=0):
+        self.secs = secs
+        self.nsecs = nsecs
+
+class Duration(object):
+    __slots__ = ['secs', 'nsecs']
+    def __init__(self, secs=0, nsecs=0):
+        self.secs = secs
+        self.nsecs = nsecs
+
+class Vector(Message):
+    __slots__ = ['x', 'y']
+    _slot_types = ['float64', 'float64']
+    _type = 'test_msgs/Vector'
+    def __init__(self, *args, **kwds):
+        _init(self, [float, float], args, kwds)
+
+class Path(Message):
+    __slots__ = ['stamp', 'timeout', 'frame_id', 'start', 'points', 'ranges', 'ids', 'valid']
+    _slot_types = ['time', 'duration', 'string', 'test_msgs/Vector', 'test_msgs/Vector[]',
+                   'float32[]', 'int32[]', 'bool']
+    _type = 'test_msgs/Path'
+    def __init__(self, *args, **kwds):
+        _init(self, [Time, Duration, str, Vector, list, list, list, bool], args, kwds)
+
+
+def msg2Dict(msg):
+    # Same as rosMsg2Dict in topicHandler
+    obj = {}
+    for key, t in zip(msg.__slots__, msg._slot_types):
+        attr = getattr(msg, key)
+        obj[key] = msg2Dict(attr) if hasattr(attr, '_slot_types') else t
+    return obj
+
+
+def fields(msg):
+    # The values of a message, nested messages and times as dicts
+    if hasattr(msg, '__slots__'):
+        return dict((slot, fields(getattr(msg, slot))) for slot in msg.__slots__)
+    if type(msg) is list:
+        return [fields(item) for item in msg]
+    return msg
+
+
+@unittest.skipIf(topicHandler is None, "ROS is not available")
+class Test_DecodePlan(unittest.TestCase):
+
+    def setUp(self):
+        # Arrays of messages load their class by the type
+        topicHandler.ROS_MESSAGE_CLASSES['test_msgs/Vector'] = Vector
+
+    def tearDown(self):
+        del topicHandler.ROS_MESSAGE_CLASSES['test_msgs/Vector']
+        topicHandler.DecodePlan.plans.clear()
+
+    def _path(self):
+        msg = Path()
+        msg.stamp = Time(1500000000, 250)
+        msg.timeout = Duration(3, 5)
+        msg.frame_id = "map/frame 1"
+        msg.start = Vector(0.5, -1.5)
+        msg.points = [Vector(1.0, 2.0), Vector(3.0, 4.0)]
+        msg.ranges = [0.25, 1.5]
+        msg.ids = [-1, 0, 7]
+        msg.valid = True
+        return msg
+
+    def _entity(self, msg):
+        return json.loads(NgsiSerializer.obj2Fiware(msg, "robot.path", msg._type, msg2Dict(Path()), encode=True))
+
+    def test_Round_Trip(self):
+        msg = self._path()
+        decoded = topicHandler.DecodePlan.get(Path).decode(self._entity(msg))
+
+        self.assertTrue(type(decoded) is Path)
+        self.assertTrue(type(decoded.start) is Vector)
+        self.assertTrue(type(decoded.stamp) is Time and type(decoded.timeout) is Duration)
+        self.assertEqual(fields(decoded), fields(msg))
+
+    def test_Round_Trip_Defaults(self):
+        msg = Path()
+        self.assertEqual(fields(topicHandler.DecodePlan.get(Path).decode(self._entity(msg))), fields(msg))
+
+        # Missing attributes keep their default value
+        decoded = topicHandler.DecodePlan.get(Path).decode({"frame_id": {"type": "string", "value": "odom"}})
+        expected = fields(msg)
+        expected["frame_id"] = "odom"
+        self.assertEqual(fields(decoded), expected)
+
+    def test_Generated_Matches_Reflective(self):
+        plan = topicHandler.DecodePlan.get(Path)
+        # genpy-Messages are decoded by the generated constructor
+        self.assertIn("decode", vars(plan))
+
+        for entity in [self._entity(self._path()), self._entity(Path()), {"points": self._entity(self._path())["points"]}]:
+            self.assertEqual(fields(plan.decode(entity)), fields(topicHandler.DecodePlan.decode(plan, entity)))
@@ -21,17 +21,33 @@ __version__ = "0.0.1a"
 __status__ = "Developement"
 
 import os
+import re
+import array
+import base64
+import operator
 import rospy
+import genpy
 import importlib
 import time
+try:
+    # Python 3
+    from urllib.parse import unquote
+except ImportError:
+    # Python 2
+    from urllib import unquote
 
 from include.logger import Log
 from include.constants import Constants as C 
 from include.libLoader import LibLoader
 from include import confManager
+from include import startup
+from include import metrics
+from include import tracing
 
 # PubSub Handlers
 from include.pubsub.genericPubSub import PubSub
+from include.pubsub.publishPipeline import PublishPipeline
+from include.ros.ngsiSerializer import NgsiSerializer, PACKED_TYPE, STRING_TYPES
 
 # this Message is needed, for the Listeners on connect on disconnect
 import std_msgs.msg
@@ -46,6 +62,14 @@ ROS_SUBSCRIBER = {}
 # save time stamps of ids. LAST_PUBLISH_TIME[topic] would return a time 
 LAST_PUBLISH_TIME = dict()
 
+# Topics (matching C.PUB_COALESCE), where only the newest message is published.
+# Instead of dropping them, the PublishPipeline keeps the newest message until it can be published
+COALESCED_TOPICS = set()
+
+# Topics (matching C.PASSTHROUGH), which are subscribed via rospy.AnyMsg. Their messages are not
+# deserialized, the serialized buffer is forwarded to the RawSinks instead
+PASSTHROUGH_TOPICS = set()
+
 # Topics in ROS do only have one data-type! 
 # (There might be an Exception to this if the topic gets deregistered, this is currently ignored)
 # We use this here to load the type of an topic and the dictionary rep. only once!
@@ -55,19 +79,42 @@ ROS_TOPIC_AS_DICT ={}
 # ROS-Node Subscribers  (connect/disconnect)
 subscribers = []
 
-# Actual ROS-Classes are used in instantiateROSMessage and loadMsgHandlers. 
+# Actual ROS-Classes are used in instantiateROSMessage, the DecodePlans and loadMsgHandlers. 
 # An entry is the ._type-Attribute of the ROS-Messages ('/' is replaced by '.')
 ROS_MESSAGE_CLASSES = {}
 
+# The DecodePlans of the topics, which are published into ROS: DECODE_PLANS[(topic, type)]
+DECODE_PLANS = {}
+
 # If shutdown is signaled, do stop posting ROS-Messages to the ContextBroker
 SHUTDOWN_SIGNAL = False
 
 CloudPubSub = None
 
+# If configured, the received ROS-Messages are published via worker-threads
+# (see PublishPipeline) instead of directly inside the rospy-callback
+PublishQueue = None
+
 def initPubAndSub():
-    global CloudPubSub
+    global CloudPubSub, PublishQueue
     CloudPubSub = PubSub()
 
+    # Coalesced topics always need the pipeline (at least one worker)
+    if C.PUB_WORKERS > 0 or len(C.PUB_COALESCE) > 0:
+        PublishQueue = PublishPipeline(_publishToCB, queueSize=C.PUB_QUEUE_SIZE, 
+                        workers=max(C.PUB_WORKERS, 1), overflowPolicy=C.PUB_OVERFLOW_POLICY)
+        Log("INFO", "Publishing with {} workers (queue size: {}, overflow policy: {})".format(
+            max(C.PUB_WORKERS, 1), C.PUB_QUEUE_SIZE, C.PUB_OVERFLOW_POLICY))
+
+
+def getPublishStatistics():
+    ''' Returns the statistics of the PublishPipeline (queue depths, dropped messages, ...)
+        or None, if messages are directly published in the rospy-callback
+    '''
+    if PublishQueue is None:
+        return None
+    return PublishQueue.getStatistics()
+
 def loadMsgHandlers(topics_data):
     ''' This method initializes The Publisher and Subscriber for ROS and 
         the Subscribers for the Context-broker (based on ROS-Publishers).
@@ -84,37 +131,72 @@ def loadMsgHandlers(topics_data):
     Log("INFO", "Getting configuration data")
     Log("INFO", "Generating topic handlers:")
 
-    # Generate 
-    for topic in topics_data.keys():
-        # for each topic and topic in topics_data:
-
-        # Load specific message from robot_data
-        msg = str(topics_data[topic][0])
-        theclass = LibLoader.loadFromSystem(msg, topic) 
-        
-        # Add specific message in struct to not load it again later.
-        if theclass._type not in ROS_MESSAGE_CLASSES:
-            ROS_MESSAGE_CLASSES[theclass._type] = theclass  # setting Class
-
-        # Create, if not already, a dictionary from the corresponding message-type
-        if topic not in ROS_TOPIC_AS_DICT:
-            ROS_TOPIC_AS_DICT[topic] = rosMsg2Dict(theclass())
-        
-        # Set the topic class-type, which is for each topic always the same
-        ROS_TOPIC_TYPE[topic] = theclass._type
-
-        # Create Publisher or Subscriber
-        if topics_data[topic][1].lower() == "subscriber":
-            # Case it is a subscriber, add it in subscribers
-            additionalArgsCallback = {"topic": topic} # Add addtional Infos about topic
-            ROS_SUBSCRIBER[topic] = rospy.Subscriber(topic, theclass, _publishToCBRoutine, additionalArgsCallback)
-            ROS_SUBSCRIBER_LAST_MESSAGE[topic] = None # No message currently published
-        else:
-            # Case it is a publisher, add it in publishers
-            ROS_PUBLISHER[topic] = rospy.Publisher(topic, theclass, queue_size=C.ROS_SUB_QUEUE_SIZE, latch=True)
+    # Load the message classes, each message-type only once (many topics share the same type)
+    with startup.Phase("message classes"):
+        typeDicts = dict()
+        for topic in topics_data.keys():
+            # Load specific message from robot_data
+            msg = str(topics_data[topic][0])
+            with startup.Phase("class", topic):
+                if msg in ROS_MESSAGE_CLASSES:
+                    theclass = ROS_MESSAGE_CLASSES[msg]
+                else:
+                    theclass = LibLoader.loadFromSystem(msg, topic) 
+            
+            # Add specific message in struct to not load it again later.
+            if theclass._type not in ROS_MESSAGE_CLASSES:
+                ROS_MESSAGE_CLASSES[theclass._type] = theclass  # setting Class
+
+            # Create, if not already, a dictionary from the corresponding message-type
+            # (shared by all topics of the type, so that its serializer is compiled only once)
+            if topic not in ROS_TOPIC_AS_DICT:
+                if theclass._type not in typeDicts:
+                    with startup.Phase("serializer", topic):
+                        typeDicts[theclass._type] = rosMsg2Dict(theclass())
+                        # Compile the conversion of this message-type into an Entity once
+                        try:
+                            NgsiSerializer.compile(theclass, typeDicts[theclass._type])
+                        except Exception as e:
+                            Log("WARNING", "Could not compile the serializer of {}, the Object Converter is used: {}".format(theclass._type, e))
+                ROS_TOPIC_AS_DICT[topic] = typeDicts[theclass._type]
+            
+            # Set the topic class-type, which is for each topic always the same
+            ROS_TOPIC_TYPE[topic] = theclass._type
+
+    # Create Publisher or Subscriber
+    with startup.Phase("ros topics"):
+        for topic in topics_data.keys():
+            with startup.Phase("ros topic", topic):
+                theclass = ROS_MESSAGE_CLASSES[ROS_TOPIC_TYPE[topic]]
+                if topics_data[topic][1].lower() == "subscriber":
+                    # Case it is a subscriber, add it in subscribers
+                    additionalArgsCallback = {"topic": topic} # Add addtional Infos about topic
+                    if any(re.search(regex, topic) for regex in C.PASSTHROUGH):
+                        PASSTHROUGH_TOPICS.add(topic)
+                        ROS_SUBSCRIBER[topic] = rospy.Subscriber(topic, rospy.AnyMsg, _passthroughRoutine, additionalArgsCallback)
+                    else:
+                        if any(re.search(regex, topic) for regex in C.PUB_COALESCE):
+                            PublishQueue.setCoalesce(topic, C.PUB_FREQUENCY / 1000.0)
+                            COALESCED_TOPICS.add(topic)
+                        ROS_SUBSCRIBER[topic] = rospy.Subscriber(topic, theclass, _publishToCBRoutine, additionalArgsCallback)
+                    ROS_SUBSCRIBER_LAST_MESSAGE[topic] = None # No message currently published
+                else:
+                    # Case it is a publisher, add it in publishers
+                    ROS_PUBLISHER[topic] = rospy.Publisher(topic, theclass, queue_size=C.ROS_SUB_QUEUE_SIZE, latch=True)
+                    # Build the decoding of the received Entities once
+                    try:
+                        getDecodePlan(topic, theclass._type)
+                    except Exception as e:
+                        Log("WARNING", "Could not build the decode plan of {}: {}".format(theclass._type, e))
+
+    # Prepare the publishing of all ROS-Subscribers at once (e.g. create the Entities),
+    # the passthrough topics are not published by the Publishers
+    with startup.Phase("entities"):
+        CloudPubSub.prepare([topic for topic in ROS_SUBSCRIBER if topic not in PASSTHROUGH_TOPICS], ROS_TOPIC_TYPE, ROS_TOPIC_AS_DICT)
 
     # After initializing ROS-PUB/SUBs, intitialize ContextBroker-Subscriber based on ROS-Publishers for each robot
-    CloudPubSub.subscribe(ROS_PUBLISHER.keys(), ROS_TOPIC_TYPE, ROS_TOPIC_AS_DICT)  
+    with startup.Phase("subscriptions"):
+        CloudPubSub.subscribe(ROS_PUBLISHER.keys(), ROS_TOPIC_TYPE, ROS_TOPIC_AS_DICT)  
     Log("INFO", "\n")
     Log("INFO", "Subscribed to " + str(list(ROS_PUBLISHER.keys())) + "\n")
 
@@ -126,22 +208,83 @@ def _publishToCBRoutine(data, args):
 
         Here we also use the PUB_FREQUENCY-variable, to limit the number of publishes, if needed
 
+        If the PublishPipeline is enabled, the message is only queued here and published by a worker.
+        Coalesced topics are not dropped by PUB_FREQUENCY, instead the newest message
+        waits in the PublishPipeline until it can be published
+
         data: data received from ROS
         args: additional arguments we set prior
     '''
     if not SHUTDOWN_SIGNAL:
         topic = args['topic'] # Retreiving additional Infos, which were set on initialization 
+        metrics.inc("firos_ros_messages_received_total", topic)
+
+        if topic in COALESCED_TOPICS:
+            PublishQueue.put(topic, (data, _startTrace(topic, data)))
+            ROS_SUBSCRIBER_LAST_MESSAGE[topic] = data
+            return
     
         t = time.time() * 1000 # Get Millis
         if topic in LAST_PUBLISH_TIME and LAST_PUBLISH_TIME[topic] >= t:
             # Case: We want it to publish again, but we did not wait PUB_FREQUENCY milliseconds
+            metrics.inc("firos_ros_messages_throttled_total", topic)
             return 
 
-        CloudPubSub.publish(topic, data, ROS_TOPIC_AS_DICT) 
+        trace = _startTrace(topic, data)
+        if C.PUB_WORKERS > 0:
+            PublishQueue.put(topic, (data, trace))
+        else:
+            tracing.activate(trace)
+            try:
+                CloudPubSub.publish(topic, data, ROS_TOPIC_AS_DICT)
+            finally:
+                tracing.finish(trace)
+            startup.messageBridged()
         ROS_SUBSCRIBER_LAST_MESSAGE[topic] = data
         LAST_PUBLISH_TIME[topic] = t + C.PUB_FREQUENCY
 
 
+def _passthroughRoutine(data, args):
+    ''' This routine is executed on every received message of a passthrough topic. rospy did not
+        deserialize it (rospy.AnyMsg), its serialized buffer is forwarded as memoryview (without a copy)
+        to the RawSinks. No conversion is done, PUB_FREQUENCY and the PublishPipeline do not apply here.
+
+        data: The rospy.AnyMsg, its buffer contains the serialized message
+        args: additional arguments we set prior
+    '''
+    if not SHUTDOWN_SIGNAL:
+        topic = args['topic']
+        metrics.inc("firos_ros_messages_received_total", topic)
+        buf = memoryview(data._buff)
+        CloudPubSub.publishRaw(topic, ROS_TOPIC_TYPE[topic], buf)
+        metrics.inc("firos_passthrough_bytes_total", topic, len(buf))
+        startup.messageBridged()
+
+
+def _publishToCB(topic, item):
+    ''' The publish-Routine of the PublishPipeline-workers
+
+        item: The message and its trace (or None)
+    '''
+    if not SHUTDOWN_SIGNAL:
+        data, trace = item
+        tracing.activate(trace)
+        try:
+            CloudPubSub.publish(topic, data, ROS_TOPIC_AS_DICT)
+        finally:
+            tracing.finish(trace)
+        startup.messageBridged()
+
+
+def _startTrace(topic, data):
+    ''' Starts the trace of a message received from ROS (if tracing is enabled),
+        its origin is the stamp of its std_msgs/Header
+    '''
+    if C.TRACING_SIZE > 0:
+        return tracing.start("ros", topic, tracing.stampOf(data))
+    return None
+
+
 
 class RosTopicHandler:
     ''' The Class RosTopicHandler is a Wrapper-Class which 
@@ -153,8 +296,10 @@ class RosTopicHandler:
     
     @staticmethod
     def publish(topic, convertedData, dataStruct):
-        ''' This method publishes the receive data from the 
-            ContextBroker to ROS
+        ''' This method publishes the received data of a Subscriber to ROS. It is the entry
+            for Subscribers of other standards (see examplePubSub), which convert the received data
+            into an object and its dataStruct (instantiated via instantiateROSMessage). The
+            benchmarks also use it for comparison. The contextbroker-standard uses 'publishEntity'.
 
             topic: The topic to be published
             convertedData: the converted data from the Subscriber
@@ -165,8 +310,35 @@ class RosTopicHandler:
                 # check if a publisher to this topic is set 
                 # then check the received and expected type to be equal
                 # Iff, then publish received message to ROS
+                start = time.time()
                 newMsg = instantiateROSMessage(convertedData, dataStruct)
                 ROS_PUBLISHER[topic].publish(newMsg)
+                metrics.observe("firos_ros_publish_seconds", topic, time.time() - start)
+                metrics.inc("firos_ros_messages_published_total", topic)
+
+
+    @staticmethod
+    def publishEntity(topic, entity):
+        ''' This method publishes an Entity, as received from the ContextBroker, to ROS.
+            The Entity is directly decoded into the ROS-Message via the DecodePlan of the topic.
+
+            topic: The topic to be published
+            entity: The received Entity (as dict) with id, type and the attributes
+
+            Returns True, if the Entity was published
+        '''
+        if topic in ROS_PUBLISHER and topic in ROS_TOPIC_TYPE:
+            msgType = unquote(entity["type"])
+            if ROS_TOPIC_TYPE[topic] == msgType:
+                # Only publish, if the received and expected type are equal
+                start = time.time()
+                newMsg = getDecodePlan(topic, msgType).decode(entity)
+                ROS_PUBLISHER[topic].publish(newMsg)
+                metrics.observe("firos_ros_publish_seconds", topic, time.time() - start)
+                metrics.inc("firos_ros_messages_published_total", topic)
+                startup.messageBridged()
+                return True
+        return False
 
 
     @staticmethod
@@ -179,6 +351,9 @@ class RosTopicHandler:
         '''
         SHUTDOWN_SIGNAL = True
 
+        if PublishQueue is not None:
+            PublishQueue.close()
+
         CloudPubSub.unsubscribe()
         CloudPubSub.unpublish()
 
@@ -194,7 +369,9 @@ class RosTopicHandler:
 def instantiateROSMessage(obj, dataStruct):
     ''' This method instantiates via obj and dataStruct the actual ROS-Message like
         "geometry_msgs.Twist". Explicitly it loads the ROS-Message-class (if not already done)
-        with the dataStruct["type"] if given and recursively sets all attributes of the Message. 
+        with the dataStruct["type"] if given and recursively sets all attributes of the Message.
+        Used by 'RosTopicHandler.publish' (Subscribers of other standards and the benchmarks), the
+        Entities of the ContextBroker are decoded via the DecodePlans instead.
 
         obj: The Object to instantiate
         dataStruct: The corresponding dataStruct, which helps by setting the explicit ROS-Message
@@ -230,7 +407,7 @@ def instantiateROSMessage(obj, dataStruct):
                 setattr(t, k, obj[k])
             return t
         else:
-            # something more simple (int, long, float), return it
+            # something more simple (int, long, float, or a packed array), return it
             return obj
 
             
@@ -240,6 +417,182 @@ class Temp(object):
     pass
 
 
+###############################################################################
+#######################   Decoding of received Entities   #####################
+###############################################################################
+
+def getDecodePlan(topic, msgType):
+    ''' Returns the DecodePlan of a topic and its type. It is only built on the first call.
+
+        topic: The topic
+        msgType: The ROS-Message-Type of the topic, e.g. "geometry_msgs/Twist"
+    '''
+    plan = DECODE_PLANS.get((topic, msgType))
+    if plan is None:
+        plan = DecodePlan.get(_loadMessageClass(msgType))
+        DECODE_PLANS[(topic, msgType)] = plan
+    return plan
+
+
+class DecodePlan(object):
+    ''' A DecodePlan converts the attributes of a received Entity directly into an instance of
+        a ROS-Message. The structure is only retrieved once from the message class (its
+        __slots__ and _slot_types): For each slot the plan contains a decoder, which converts
+        the received attribute into the value of the slot (primitives, arrays, base64, packed
+        arrays and nested messages, which have their own plan).
+
+        For genpy-Messages the source of a constructor-function is generated from the decoders
+        (see '_generate'), which replaces 'decode'.
+
+        Attributes which are not received (or null) keep their default value.
+    '''
+
+    # The plans of each message class: plans[msgClass] -> DecodePlan
+    plans = {}
+
+    @classmethod
+    def get(cls, msgClass):
+        ''' Returns the (cached) DecodePlan of the message class
+        '''
+        plan = cls.plans.get(msgClass)
+        if plan is None:
+            plan = DecodePlan(msgClass)
+            cls.plans[msgClass] = plan
+        return plan
+
+    def __init__(self, msgClass):
+        self.msgClass = msgClass
+        # A list of (slot, decoder, onValue), the decoder gets the attribute or only its value
+        self.fields = []
+        defaults = msgClass()
+        slotTypes = getattr(msgClass, "_slot_types", None)
+        if slotTypes is None:
+            # e.g. Time and Duration, their slots are defined in the base class
+            for clazz in msgClass.__mro__:
+                for slot in getattr(clazz, "__slots__", ()):
+                    self.fields.append((slot, _decodeGeneric, False))
+        else:
+            for slot, slotType in zip(msgClass.__slots__, slotTypes):
+                self.fields.append((slot,) + _fieldDecoder(slotType, getattr(defaults, slot)))
+            if issubclass(msgClass, genpy.Message):
+                self.decode = self._generate()
+
+    def decode(self, attributes):
+        ''' Returns the ROS-Message of the received attributes
+
+            attributes: A dict of the attributes ({"value": ..., "type": ...}), e.g. the Entity
+        '''
+        instance = self.msgClass()
+        for slot, decoder, onValue in self.fields:
+            attribute = attributes.get(slot)
+            # 'id' and 'type' of the Entity are no attributes
+            if type(attribute) is dict and attribute.get("value") is not None:
+                setattr(instance, slot, decoder(attribute["value"] if onValue else attribute))
+        return instance
+
+    def _generate(self):
+        ''' Generates and compiles a function, which decodes all attributes into local variables
+            and passes them as positional arguments to the constructor of the message class.
+            genpy replaces the missing ones (None) by their default value. E.g. for geometry_msgs/Vector3:
+
+                def decode(attributes, _cls=Vector3, _f0=float, _f1=float, _f2=float):
+                    v = attributes.get('x')
+                    a0 = _f0(v['value']) if type(v) is dict and v.get('value') is not None else None
+                    ...
+                    return _cls(a0, a1, a2)
+        '''
+        namespace = dict(_cls=self.msgClass)
+        lines = []
+        for index, (slot, decoder, onValue) in enumerate(self.fields):
+            namespace["_f%d" % index] = decoder
+            lines.append("    v = attributes.get({!r})".format(slot))
+            lines.append("    a{0} = _f{0}({1}) if type(v) is dict and v.get('value') is not None else None".format(
+                index, "v['value']" if onValue else "v"))
+        arguments = ", ".join("a%d" % index for index in range(len(self.fields)))
+        source = "def decode(attributes, {}):\n{}\n    return _cls({})\n".format(
+            ", ".join("{0}={0}".format(name) for name in sorted(namespace)),
+            "\n".join(lines), arguments)
+
+        code = compile(source, "<DecodePlan {}>".format(self.msgClass._type), "exec")
+        exec(code, namespace)
+        return namespace["decode"]
+
+
+_INTEGER_TYPES = set(["byte", "char", "int8", "uint8", "int16", "uint16", "int32", "uint32", "int64", "uint64"])
+_FLOAT_TYPES = set(["float32", "float64"])
+_VALUE = operator.itemgetter("value")
+
+def _fieldDecoder(slotType, default):
+    ''' Returns (decoder, onValue) of a slot by its ROS-Type and its default value
+    '''
+    if slotType.endswith("]"):
+        return _arrayDecoder(slotType.split("[")[0]), False
+    cast = _primitiveCast(slotType)
+    if cast is not None:
+        return cast, True
+    return DecodePlan.get(type(default)).decode, True
+
+
+def _primitiveCast(rosType):
+    ''' Returns the function, which converts a received value into the primitive ROS-Type
+    '''
+    if rosType in _INTEGER_TYPES:
+        return int
+    if rosType in _FLOAT_TYPES:
+        return float
+    if rosType == "bool":
+        return bool
+    if rosType == "string":
+        return unquote
+    return None
+
+
+def _arrayDecoder(baseType):
+    ''' Returns the decoder of an array of baseType. Long (u)int8-Arrays may be received in
+        base64 and (configured) arrays of primitives as packed arrays.
+    '''
+    itemDecoder = _primitiveCast(baseType)
+    if itemDecoder is None:
+        if baseType == "time":
+            itemDecoder = DecodePlan.get(rospy.Time).decode
+        elif baseType == "duration":
+            itemDecoder = DecodePlan.get(rospy.Duration).decode
+        else:
+            itemDecoder = DecodePlan.get(_loadMessageClass(baseType)).decode
+    asBytes = baseType in ("uint8", "char")
+
+    def decodeArray(attribute):
+        if attribute["type"] == PACKED_TYPE:
+            return NgsiSerializer.unpack(attribute)
+        if attribute["type"] == "base64":
+            buf = base64.b64decode(unquote(attribute["value"]))
+            return buf if asBytes else array.array("b", buf).tolist()
+        # All items at once, without a call per item in python
+        return list(map(itemDecoder, map(_VALUE, attribute["value"])))
+    return decodeArray
+
+
+def _decodeGeneric(attribute):
+    ''' Decodes an attribute without a known ROS-Type
+    '''
+    value = attribute["value"]
+    if type(value) is dict:
+        return dict((key, _decodeGeneric(value[key])) for key in value)
+    if type(value) is list:
+        return [_decodeGeneric(item) for item in value]
+    if type(value) in STRING_TYPES:
+        return unquote(value)
+    return value
+
+
+def _loadMessageClass(msgType):
+    ''' Returns the ROS-Message-class of msgType, which is loaded only once
+    '''
+    if msgType not in ROS_MESSAGE_CLASSES:
+        ROS_MESSAGE_CLASSES[msgType] = LibLoader.loadFromSystem(msgType, None)
+    return ROS_MESSAGE_CLASSES[msgType]
+
+
 def rosMsg2Dict(rosClassInstance):
     ''' Generating a dictionary out of the instance of a
         ROS-Message
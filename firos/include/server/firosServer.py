@@ -15,16 +15,13 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-try:
-    # Python 3
-    from http.server import HTTPServer
-except ImportError:
-    # Python 2
-    from BaseHTTPServer import HTTPServer
+import threading
 
 from include.logger import Log
+from include.constants import Constants as C
 
 from include.server.requestHandler import RequestHandler
+from include.server.pooledHTTPServer import PooledHTTPServer
 
 
 class FirosServer:
@@ -32,27 +29,43 @@ class FirosServer:
     # \param self
     # \param ip address
     # \param port to listen to
-    def __init__(self, address="0.0.0.0", port=8000):
+    # \param number of worker-threads handling the requests (see PooledHTTPServer)
+    # \param seconds to keep idle connections open (0 disables Keep-Alive)
+    def __init__(self, address="0.0.0.0", port=8000, workers=None, keepAlive=None):
         self.address = address
         self.port = port
-        self.stopped = False
+        self.workers = C.SERVER_WORKERS if workers is None else workers
+        self.keepAlive = C.SERVER_KEEP_ALIVE if keepAlive is None else keepAlive
 
-        Protocol = "HTTP/1.0"
+        if self.keepAlive > 0:
+            Protocol = "HTTP/1.1"
+            # Idle connections are closed after this timeout, so that they do not block a worker
+            RequestHandler.timeout = self.keepAlive
+        else:
+            Protocol = "HTTP/1.0"
+            RequestHandler.timeout = None
 
         server_address = (self.address, self.port)
 
         RequestHandler.protocol_version = Protocol
-        self.httpd = HTTPServer(server_address, RequestHandler)
+        self.httpd = PooledHTTPServer(server_address, RequestHandler, workers=self.workers)
+        self.thread = None
 
     def start(self):
-        ## \brief start FIROS http server
+        ## \brief start FIROS http server and wait until it is closed
         # \param self
         sa = self.httpd.socket.getsockname()
         Log("INFO", "\nServing HTTP on", sa[0], "port", sa[1], "...")
-        while not self.stopped:
-            self.httpd.handle_request()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="firos-http")
+        self.thread.daemon = True
+        self.thread.start()
+        while self.thread.is_alive():
+            # Join with a timeout, so that signals are still handled in this thread
+            self.thread.join(0.5)
 
     def close(self):
-        ## \brief stop FIROS http server
+        ## \brief stop FIROS http server. Requests, which are currently handled, are finished first
         # \param self
-        self.stopped = True
+        if self.thread is not None and self.thread.is_alive():
+            self.httpd.shutdown()
+        self.httpd.server_close(timeout=self.keepAlive + 1)
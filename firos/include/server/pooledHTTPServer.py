@@ -0,0 +1,117 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import threading
+try:
+    # Python 3
+    import queue
+    from http.server import HTTPServer
+except ImportError:
+    # Python 2
+    import Queue as queue
+    from BaseHTTPServer import HTTPServer
+
+
+class PooledHTTPServer(HTTPServer):
+    ''' A HTTPServer, which handles the connections concurrently by a bounded pool of
+        worker-threads. Accepted connections are queued until a worker is free. If the
+        queue is full, no further connections are accepted until a worker is free again.
+
+        With workers=0 the connections are handled one after another in the thread
+        of 'serve_forever', as in the plain HTTPServer.
+
+        Keep-Alive (HTTP/1.1) is enabled via the protocol_version of the handler. Then a worker
+        is responsible for a connection until the client closes it or the timeout of the
+        handler passes without a new request.
+    '''
+
+    def __init__(self, serverAddress, handlerClass, workers=4, backlog=None):
+        ''' serverAddress: (address, port) to listen on
+            handlerClass: The BaseHTTPRequestHandler
+            workers: The number of worker-threads
+            backlog: The maximum number of accepted connections, which wait for a worker.
+                     Default is 4 times the number of workers
+        '''
+        HTTPServer.__init__(self, serverAddress, handlerClass)
+        self.workers = max(int(workers), 0)
+        self._connections = queue.Queue(maxsize=backlog or self.workers * 4)
+        self._stopped = threading.Event()
+        self._threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name="firos-http-{}-{}".format(self.server_address[1], i))
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+
+    def process_request(self, request, clientAddress):
+        ''' Hands the connection over to the workers (blocks, if the queue is full)
+        '''
+        if not self.workers:
+            return HTTPServer.process_request(self, request, clientAddress)
+        self._connections.put((request, clientAddress))
+
+
+    def _work(self):
+        ''' The Routine of each worker. It handles the queued connections until
+            'server_close' is called
+        '''
+        while not self._stopped.is_set():
+            item = self._connections.get()
+            if item is None:
+                return
+            request, clientAddress = item
+            if self._stopped.is_set():
+                # Queued while the server was closed
+                self.shutdown_request(request)
+                return
+            try:
+                self.finish_request(request, clientAddress)
+            except Exception:
+                self.handle_error(request, clientAddress)
+            finally:
+                self.shutdown_request(request)
+
+
+    def server_close(self, timeout=None):
+        ''' Closes the listening socket and stops the workers. Connections, which are currently
+            handled, are finished first (waiting at most timeout seconds). Call 'shutdown' before,
+            if 'serve_forever' is running.
+        '''
+        HTTPServer.server_close(self)
+        self._stopped.set()
+        # The queued connections are not handled anymore, which also makes room for
+        # the stop-signals. Busy workers stop via the flag, once they are done.
+        while True:
+            try:
+                item = self._connections.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.shutdown_request(item[0])
+        for _ in self._threads:
+            try:
+                self._connections.put_nowait(None)
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(timeout)
@@ -23,6 +23,7 @@ __status__ = "Developement"
 import re
 import cgi
 import json
+import threading
 import requests
 try:
     # Python 3
@@ -39,9 +40,15 @@ except ImportError:
 from include.logger import Log
 from include.confManager import getRobots
 from include.ros.rosConfigurator import RosConfigurator
-from include.ros.topicHandler import RosTopicHandler, loadMsgHandlers, ROS_PUBLISHER, ROS_SUBSCRIBER, ROS_TOPIC_AS_DICT, ROS_SUBSCRIBER_LAST_MESSAGE
+from include.ros.topicHandler import RosTopicHandler, loadMsgHandlers, getPublishStatistics, ROS_PUBLISHER, ROS_SUBSCRIBER, ROS_TOPIC_AS_DICT, ROS_SUBSCRIBER_LAST_MESSAGE
 from include.constants import Constants as C 
-from include.FiwareObjectConverter.objectFiwareConverter import ObjectFiwareConverter
+from include import metrics
+from include import tracing
+from include.ros.ngsiSerializer import NgsiSerializer
+
+# The requests are handled concurrently by the workers of the PooledHTTPServer. The routes, which
+# change the configuration (the publishers and subscribers in the topicHandler), are handled one at a time
+CONFIGURATION_LOCK = threading.Lock()
 
 
 class RequestHandler(BaseHTTPRequestHandler):
@@ -78,6 +85,7 @@ def getPostParams(request):
         posted prior. 
     '''
     ctype, pdict = cgi.parse_header(request.headers.get('content-type'))
+    request.bodyRead = True
     if ctype == 'multipart/form-data':
         return cgi.parse_multipart(request.rfile, pdict)
     elif ctype == 'application/x-www-form-urlencoded':
@@ -133,10 +141,7 @@ def onRobotData(request, action):
     if name in ROS_SUBSCRIBER_LAST_MESSAGE:
         lastPubData = ROS_SUBSCRIBER_LAST_MESSAGE[name]
         if lastPubData is not None:
-            obj = {s: getattr(lastPubData, s, None) for s in lastPubData.__slots__}
-            obj["id"] = name
-            obj["type"] = lastPubData._type
-            json = ObjectFiwareConverter.obj2Fiware(obj, dataTypeDict=ROS_TOPIC_AS_DICT[name], ignorePythonMetaData=True, ind=None)
+            json = NgsiSerializer.obj2Fiware(lastPubData, name, lastPubData._type, ROS_TOPIC_AS_DICT[name])
         else:
             json = ""
     else:
@@ -148,14 +153,39 @@ def onRobotData(request, action):
     end_request(request, ('Content-Type', 'application/json'), 200, json)
 
 
+def onStats(request, action):
+    ''' Returns the statistics of the publish pipeline (queue depth, 
+        published and dropped messages of each topic) as json
+    '''
+    data = dict(publish_pipeline=getPublishStatistics())
+    end_request(request, ('Content-Type', 'application/json'), 200, json.dumps(data))
+
+
+def onMetrics(request, action):
+    ''' Returns the metrics (counters and latencies of each topic) in the
+        text format of Prometheus
+    '''
+    end_request(request, ('Content-Type', 'text/plain; version=0.0.4'), 200, metrics.render())
+
+
+def onTraces(request, action):
+    ''' Returns the percentiles of the duration of each stage of the traced messages
+        (in both directions) as json. With '/traces/TOPIC' only the messages of this topic
+    '''
+    path = urlparse("http://localhost" + request.path).path.rstrip("/")
+    topic = path[len("/traces"):] or None
+    end_request(request, ('Content-Type', 'application/json'), 200, json.dumps(tracing.report(topic)))
+
+
 def onConnect(request, action):
     ''' This resets firos into its original state
 
         TODO DL reset, instead of connect?
         TODO DL Add real connect for only one Robot?
     '''
-    Log("INFO", "Connecting topics")
-    loadMsgHandlers(RosConfigurator.systemTopics(True))
+    with CONFIGURATION_LOCK:
+        Log("INFO", "Connecting topics")
+        loadMsgHandlers(RosConfigurator.systemTopics(True))
 
     # Return Success
     end_request(request, None, 200, "")
@@ -179,19 +209,20 @@ def onDisConnect(request, action):
 
 
     
-    # Iterate through every topic and unregister, then delete it
-    if topic in ROS_PUBLISHER:
-        ROS_PUBLISHER[topic].unregister()
-        del ROS_PUBLISHER[topic]
-        Log("INFO", "Disconnecting publisher on '{}'".format(topic))
-        RosConfigurator.removeTopic(topic)
-    
-    if topic in ROS_SUBSCRIBER:
-        ROS_SUBSCRIBER[topic].unregister()
-        del ROS_SUBSCRIBER[topic]
-        Log("INFO", "Disconnecting subscriber on '{}'".format(topic))
-        RosConfigurator.removeTopic(topic)
-    
+    with CONFIGURATION_LOCK:
+        # Iterate through every topic and unregister, then delete it
+        if topic in ROS_PUBLISHER:
+            ROS_PUBLISHER[topic].unregister()
+            del ROS_PUBLISHER[topic]
+            Log("INFO", "Disconnecting publisher on '{}'".format(topic))
+            RosConfigurator.removeTopic(topic)
+
+        if topic in ROS_SUBSCRIBER:
+            ROS_SUBSCRIBER[topic].unregister()
+            del ROS_SUBSCRIBER[topic]
+            Log("INFO", "Disconnecting subscriber on '{}'".format(topic))
+            RosConfigurator.removeTopic(topic)
+
     # Return success
     end_request(request, None, 200, "")
 
@@ -201,7 +232,10 @@ def onDisConnect(request, action):
 MAPPER = {
     "GET": [
         {"regexp": "^/topics/*$", "action": listTopics},
-        {"regexp": "^/topic/.*$", "action": onRobotData}],
+        {"regexp": "^/topic/.*$", "action": onRobotData},
+        {"regexp": "^/stats/*$", "action": onStats},
+        {"regexp": "^/metrics/*$", "action": onMetrics},
+        {"regexp": "^/traces(/.*)?$", "action": onTraces}],
     "POST": [
         {"regexp": "^/connect/*$", "action": onConnect},
         {"regexp": "^/disconnect/.*$", "action": onDisConnect}
@@ -213,11 +247,19 @@ def end_request(request, header, status, content):
     '''
         Ends the request via the statuscode, one header, end_headers and its content
     '''
+    if isPython3:
+        body = bytes(content, "utf-8")
+    else:
+        body = bytes(content)
+
     request.send_response(status)
     if header is not None:
         request.send_header(header[0], header[1])
+    # Needed for Keep-Alive, so that the client knows where the response ends
+    request.send_header("Content-Length", str(len(body)))
+    if (request.command == "POST" and not getattr(request, "bodyRead", False)
+            and int(request.headers.get("Content-Length") or 0) > 0):
+        # The body was not read, so the connection cannot be used for another request
+        request.send_header("Connection", "close")
     request.end_headers()
-    if isPython3:
-        request.wfile.write(bytes(content, "utf-8"))
-    else:
-        request.wfile.write(bytes(content))
\ No newline at end of file
+    request.wfile.write(body)
@@ -0,0 +1,132 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import unittest
+import threading
+try:
+    # Python 3
+    from http.client import HTTPConnection
+    from http.server import BaseHTTPRequestHandler
+except ImportError:
+    # Python 2
+    from httplib import HTTPConnection
+    from BaseHTTPServer import BaseHTTPRequestHandler
+
+from include.server.pooledHTTPServer import PooledHTTPServer
+
+
+class Handler(BaseHTTPRequestHandler):
+    ''' Answers with the client port, '/slow' waits until 'release' is set
+    '''
+    protocol_version = "HTTP/1.1"
+    timeout = 1
+    release = threading.Event()
+
+    def log_message(self, format, *args):
+        return
+
+    def do_GET(self):
+        if self.path == "/slow":
+            self.release.wait(2)
+        body = str(self.client_address[1]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Test_PooledHTTPServer(unittest.TestCase):
+
+    def setUp(self):
+        Handler.release.clear()
+        self.server = PooledHTTPServer(("127.0.0.1", 0), Handler, workers=2)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs=dict(poll_interval=0.05))
+        self.thread.start()
+
+    def tearDown(self):
+        Handler.release.set()
+        self.server.shutdown()
+        self.server.server_close(timeout=2)
+        self.thread.join(2)
+
+    def _get(self, path, conn=None):
+        conn = conn or HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=2)
+        conn.request("GET", path)
+        return conn.getresponse().read()
+
+    def test_Slow_Request_Does_Not_Block(self):
+        slow = threading.Thread(target=self._get, args=("/slow",))
+        slow.start()
+        time.sleep(0.05)
+
+        start = time.time()
+        self._get("/fast")
+        self.assertLess(time.time() - start, 1)
+        self.assertTrue(slow.is_alive())
+
+    def test_Keep_Alive(self):
+        conn = HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=2)
+        # The same connection (client port) is used for both requests
+        self.assertEqual(self._get("/a", conn), self._get("/b", conn))
+        conn.close()
+
+    def test_Graceful_Shutdown(self):
+        result = []
+        slow = threading.Thread(target=lambda: result.append(self._get("/slow")))
+        slow.start()
+        time.sleep(0.05)
+
+        # The running request is finished before the workers stop
+        self.server.shutdown()
+        Handler.release.set()
+        self.server.server_close(timeout=2)
+        slow.join(2)
+        self.assertEqual(len(result), 1)
+
+    def test_Close_With_Full_Queue(self):
+        server = PooledHTTPServer(("127.0.0.1", 0), Handler, workers=1, backlog=1)
+        thread = threading.Thread(target=server.serve_forever, kwargs=dict(poll_interval=0.05))
+        thread.start()
+        self.addCleanup(thread.join, 2)
+
+        def get(path):
+            try:
+                conn = HTTPConnection("127.0.0.1", server.server_address[1], timeout=2)
+                conn.request("GET", path)
+                conn.getresponse().read()
+            except Exception:
+                # The queued connection is closed without a response
+                pass
+        clients = [threading.Thread(target=get, args=("/slow",)) for _ in range(2)]
+        for client in clients:
+            client.start()
+            time.sleep(0.05)
+
+        # The worker is busy and the queue is full, closing does not wait for the slow request
+        server.shutdown()
+        start = time.time()
+        server.server_close(timeout=0.1)
+        self.assertLess(time.time() - start, 1)
+        Handler.release.set()
+        for client in clients:
+            client.join(2)
@@ -0,0 +1,120 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import time
+import unittest
+import threading
+
+from include.constants import Constants as C
+from include.logger import initLog
+
+try:
+    from include.server import requestHandler
+except ImportError:
+    # ROS is missing
+    requestHandler = None
+
+
+class Request(object):
+    ''' The parts of the BaseHTTPRequestHandler, which are used by the routes
+    '''
+    command = "POST"
+
+    def __init__(self, path):
+        self.path = path
+        self.headers = dict()
+        self.wfile = io.BytesIO()
+        self.status = None
+
+    def send_response(self, status):
+        self.status = status
+
+    def send_header(self, key, value):
+        pass
+
+    def end_headers(self):
+        pass
+
+
+class Concurrency(object):
+    ''' Records the maximum number of concurrent calls of 'enter'
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.maximum = 0
+
+    def enter(self, *args):
+        with self.lock:
+            self.running += 1
+            self.maximum = max(self.maximum, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+
+
+class Subscriber(object):
+    def __init__(self, concurrency):
+        self.unregister = concurrency.enter
+
+
+@unittest.skipIf(requestHandler is None, "ROS is not available")
+class Test_RequestHandler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def setUp(self):
+        self.concurrency = Concurrency()
+        for name, replacement in [("loadMsgHandlers", self.concurrency.enter)]:
+            self.addCleanup(setattr, requestHandler, name, getattr(requestHandler, name))
+            setattr(requestHandler, name, replacement)
+        for name, replacement in [("systemTopics", lambda *args: {}), ("removeTopic", lambda *args: None)]:
+            self.addCleanup(setattr, requestHandler.RosConfigurator, name, getattr(requestHandler.RosConfigurator, name))
+            setattr(requestHandler.RosConfigurator, name, staticmethod(replacement))
+
+    def test_Configuration_Is_Serialized(self):
+        # Two connects and a disconnect at the same time (as on the workers of the PooledHTTPServer)
+        requestHandler.ROS_SUBSCRIBER["/robot1/pose"] = Subscriber(self.concurrency)
+        requests = [Request("/connect"), Request("/connect"), Request("/disconnect/robot1/pose")]
+        routes = [requestHandler.onConnect, requestHandler.onConnect, requestHandler.onDisConnect]
+        threads = [threading.Thread(target=route, args=(request, None)) for route, request in zip(routes, requests)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(2)
+
+        self.assertEqual([request.status for request in requests], [200, 200, 200])
+        self.assertEqual(self.concurrency.maximum, 1)
+        self.assertFalse("/robot1/pose" in requestHandler.ROS_SUBSCRIBER)
+
+
+if __name__ == '__main__':
+    unittest.main()
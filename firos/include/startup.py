@@ -0,0 +1,200 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from include.logger import Log, setOutput
+
+# Time, when FIROS was started (this module is imported first in core.py)
+START_TIME = time.time()
+
+# The duration of each phase of the startup in seconds: PHASES[name] -> seconds
+# (nested phases are named "phase/nested phase")
+PHASES = OrderedDict()
+
+# The duration of the steps for each topic in seconds: TOPICS[topic][step] -> seconds
+TOPICS = OrderedDict()
+
+# Seconds after START_TIME, when the first message was bridged (None until then)
+FIRST_MESSAGE = None
+
+
+_active = threading.local()
+
+
+class Phase(object):
+    ''' Measures the duration of a phase of the startup and adds it to PHASES:
+
+            with Phase("message classes"):
+                ...
+
+        With a topic, the duration of this step of the topic is added to TOPICS instead:
+
+            with Phase("class", topic):
+                ...
+    '''
+
+    def __init__(self, name, topic=None):
+        self.name = name
+        self.topic = topic
+
+    def __enter__(self):
+        if self.topic is None:
+            # Phases inside of this phase are nested
+            stack = _active.__dict__.setdefault("stack", [])
+            stack.append(self.name)
+            self.name = "/".join(stack)
+            # Listed in the order the phases started
+            PHASES.setdefault(self.name, 0)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        duration = time.time() - self.start
+        if self.topic is None:
+            _active.stack.pop()
+            PHASES[self.name] += duration
+        else:
+            steps = TOPICS.setdefault(self.topic, OrderedDict())
+            steps[self.name] = steps.get(self.name, 0) + duration
+
+
+def messageBridged():
+    ''' Called for each bridged message (in both directions), the first one is recorded
+    '''
+    global FIRST_MESSAGE
+    if FIRST_MESSAGE is None:
+        FIRST_MESSAGE = time.time() - START_TIME
+        Log("INFO", "First message bridged {:.3f}s after start".format(FIRST_MESSAGE))
+
+
+def report():
+    ''' Logs the duration of each phase of the startup
+    '''
+    Log("INFO", "Startup took {:.3f}s:".format(time.time() - START_TIME))
+    for name, duration in PHASES.items():
+        Log("INFO", "    {:<20} {:8.3f}s".format(name, duration))
+
+
+def profile():
+    ''' Returns the profile of the startup (JSON-serializable):
+
+            {"total": seconds, "first_message": seconds or None,
+             "phases": {phase: seconds}, "topics": {topic: {step: seconds}}}
+    '''
+    return OrderedDict([
+        ("total", time.time() - START_TIME),
+        ("first_message", FIRST_MESSAGE),
+        ("phases", PHASES),
+        ("topics", TOPICS)
+    ])
+
+
+def profileTable(data, slowest=20):
+    ''' Returns the profile as a human-readable table: The phases and the slowest topics
+
+            data: The profile (see profile)
+            slowest: The maximum number of listed topics
+    '''
+    lines = ["{:<40} {:>9}".format("Phase", "Seconds")]
+    for name, duration in data["phases"].items():
+        depth = name.count("/")
+        lines.append("{:<40} {:9.3f}".format("  " * depth + name.split("/")[-1], duration))
+    lines.append("{:<40} {:9.3f}".format("total", data["total"]))
+
+    if data["topics"]:
+        steps = []
+        for topicSteps in data["topics"].values():
+            steps.extend(step for step in topicSteps if step not in steps)
+        topics = sorted(data["topics"].items(), key=lambda item: sum(item[1].values()), reverse=True)
+
+        lines.append("")
+        lines.append("{:<40}".format("Topic ({} slowest of {})".format(min(slowest, len(topics)), len(topics)))
+                     + "".join(" {:>9}".format(step[:9]) for step in steps) + " {:>9}".format("total"))
+        for topic, topicSteps in topics[:slowest]:
+            lines.append("{:<40}".format(topic)
+                         + "".join(" {:9.3f}".format(topicSteps[step]) if step in topicSteps else " {:>9}".format("-") for step in steps)
+                         + " {:9.3f}".format(sum(topicSteps.values())))
+    return "\n".join(lines)
+
+
+def initProfile(path):
+    ''' Prepares the output of the profile into path, before anything is logged.
+        If it is written to stdout ("-"), the log is written to stderr instead, so that
+        stdout only contains the JSON
+    '''
+    if path == "-":
+        setOutput(sys.stderr)
+
+
+def writeProfile(path):
+    ''' Prints the profile of the startup as table (on stderr) and writes it as JSON into
+        path ("-": stdout, see initProfile)
+    '''
+    data = profile()
+    sys.stderr.write(profileTable(data) + "\n")
+    if path == "-":
+        json.dump(data, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+    else:
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        Log("INFO", "The startup profile was written to: " + path)
+
+
+def runBounded(routine, items, workers):
+    ''' Calls routine(item) for each item by at most 'workers' threads and waits until all are done.
+        Returns the results in the order of the items (the Exception, if the routine raised one)
+
+        routine: The function, which is called for each item
+        items: The items
+        workers: The maximum number of threads
+    '''
+    items = list(items)
+    results = [None] * len(items)
+    indices = iter(range(len(items)))
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            with lock:
+                index = next(indices, None)
+            if index is None:
+                return
+            try:
+                results[index] = routine(items[index])
+            except Exception as e:
+                results[index] = e
+
+    threads = [threading.Thread(target=work, name="firos-startup-{}".format(i))
+               for i in range(min(max(int(workers), 1), len(items)))]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+    return results
@@ -29,6 +29,8 @@ import unittest
 import include.constants
 from include.constants import Constants
 
+MSG_CACHE = Constants.MSG_CACHE
+
 class Test_Constants(unittest.TestCase):
 
     def tearDown(self):
@@ -40,11 +42,21 @@ class Test_Constants(unittest.TestCase):
         C.EP_SERVER_ADRESS = None
         C.EP_SERVER_PORT = None
         C.MAP_SERVER_PORT = 10100
+        C.SERVER_WORKERS = 4
+        C.SERVER_KEEP_ALIVE = 5
         C.ROSBRIDGE_PORT = 9090
         C.DATA = None
         C.PUB_FREQUENCY = 0
         C.ROS_NODE_NAME = "firos"
         C.ROS_SUB_QUEUE_SIZE = 10
+        C.PUB_WORKERS = 0
+        C.PUB_QUEUE_SIZE = 100
+        C.PUB_OVERFLOW_POLICY = "drop_oldest"
+        C.PUB_COALESCE = []
+        C.PASSTHROUGH = []
+        C.TRACING_SIZE = 0
+        C.TRACING_BUDGET = 100
+        C.MSG_CACHE = MSG_CACHE
         C.PATH = None
         C.configured = False
 
@@ -55,6 +67,8 @@ class Test_Constants(unittest.TestCase):
 
         self.assertEqual(C.EP_SERVER_ADRESS, None)
         self.assertEqual(C.MAP_SERVER_PORT, 10100)
+        self.assertEqual(C.SERVER_WORKERS, 4)
+        self.assertEqual(C.SERVER_KEEP_ALIVE, 5)
         self.assertEqual(C.ROSBRIDGE_PORT, 9090)
         self.assertEqual(C.DATA, None)
         self.assertEqual(C.PUB_FREQUENCY, 0)
@@ -62,6 +76,15 @@ class Test_Constants(unittest.TestCase):
         self.assertEqual(C.ROS_NODE_NAME, "firos")
         self.assertEqual(C.ROS_SUB_QUEUE_SIZE, 10)
 
+        self.assertEqual(C.PUB_WORKERS, 0)
+        self.assertEqual(C.PUB_QUEUE_SIZE, 100)
+        self.assertEqual(C.PUB_OVERFLOW_POLICY, "drop_oldest")
+        self.assertEqual(C.PUB_COALESCE, [])
+        self.assertEqual(C.PASSTHROUGH, [])
+        self.assertEqual(C.TRACING_SIZE, 0)
+        self.assertEqual(C.TRACING_BUDGET, 100)
+        self.assertEqual(C.MSG_CACHE, MSG_CACHE)
+
         self.assertEqual(C.PATH, None)
         self.assertEqual(C.configured, False)
 
@@ -287,3 +310,24 @@ class Test_Constants(unittest.TestCase):
 
         self.assertEqual(C.PATH, "../test_data/testConfigFiles/minimal")
         self.assertEqual(C.configured, True)
+
+
+    def test_Constants_With_maximal_Configuration(self):
+        C = Constants
+        Constants.configured = False
+        C.init("../test_data/testConfigFiles/maximal")
+
+        self.assertEqual(C.MAP_SERVER_PORT, 12345)
+        self.assertEqual(C.SERVER_WORKERS, 8)
+        self.assertEqual(C.SERVER_KEEP_ALIVE, 2.5)
+        self.assertEqual(C.PUB_WORKERS, 4)
+        self.assertEqual(C.PUB_QUEUE_SIZE, 50)
+        self.assertEqual(C.PUB_OVERFLOW_POLICY, "drop_newest")
+        self.assertEqual(C.PUB_COALESCE, ["^/tf$", ".*/heatmap$"])
+        self.assertEqual(C.PASSTHROUGH, ["^/camera/.*/compressed$"])
+        self.assertEqual(C.TRACING_SIZE, 500)
+        self.assertEqual(C.TRACING_BUDGET, 50)
+        self.assertEqual(C.MSG_CACHE, None)
+
+        self.assertEqual(C.PATH, "../test_data/testConfigFiles/maximal")
+        self.assertEqual(C.configured, True)
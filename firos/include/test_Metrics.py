@@ -0,0 +1,74 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import threading
+
+from include import metrics
+
+
+class Test_Metrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_Counter_Of_Threads(self):
+        def count():
+            for _ in range(1000):
+                metrics.inc("firos_ros_messages_received_total", "/robot/cmd")
+
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        counters, _ = metrics.collect()
+        self.assertEqual(counters[("firos_ros_messages_received_total", "/robot/cmd")], 4000)
+
+    def test_Histogram(self):
+        metrics.observe("firos_publish_seconds", "/robot/pose", 0.003)
+        metrics.observe("firos_publish_seconds", "/robot/pose", 0.003)
+        metrics.observe("firos_publish_seconds", "/robot/pose", 10)
+        text = metrics.render()
+        self.assertIn('firos_publish_seconds_bucket{topic="/robot/pose",le="0.0025"} 0', text)
+        self.assertIn('firos_publish_seconds_bucket{topic="/robot/pose",le="0.005"} 2', text)
+        self.assertIn('firos_publish_seconds_bucket{topic="/robot/pose",le="+Inf"} 3', text)
+        self.assertIn('firos_publish_seconds_count{topic="/robot/pose"} 3', text)
+        self.assertIn('firos_publish_seconds_sum{topic="/robot/pose"} 10.006', text)
+
+    def test_Render(self):
+        metrics.inc("firos_notifications_total")
+        metrics.inc("firos_entities_received_total", '/robot/"cmd"')
+        metrics.inc("firos_entities_received_total", "/robot/pose", 2)
+        text = metrics.render()
+        self.assertIn("# TYPE firos_notifications_total counter", text)
+        self.assertIn("# TYPE firos_publish_seconds histogram", text)
+        self.assertIn("\nfiros_notifications_total 1\n", text)
+        self.assertIn('firos_entities_received_total{topic="/robot/\\"cmd\\""} 1', text)
+        self.assertIn('firos_entities_received_total{topic="/robot/pose"} 2', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# MIT License
+# 
+# Copyright (c) 2019 Fraunhofer IML
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from include.constants import Constants as C
+from include.logger import initLog
+from include.msgCache import MsgCache
+
+
+class Test_MsgCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "cache")
+        self.msgs = os.path.join(self.folder, "my_msgs", "msg")
+        os.makedirs(self.msgs)
+        self.msgFile = os.path.join(self.msgs, "Robot.msg")
+        self.generated = os.path.join(self.folder, "_Robot.py")
+        self._write(self.msgFile, "string name\n")
+        self._write(self.generated, "# generated\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _write(self, path, content, mtime=None):
+        with open(path, "w") as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_Index(self):
+        cache = MsgCache(self.path)
+        self.assertEqual(cache.getIndex("/opt/ros"), None)
+        cache.setIndex("/opt/ros", {"my_msgs": [self.msgs]}, [os.path.dirname(self.msgs), self.msgs])
+
+        # Persisted
+        self.assertEqual(MsgCache(self.path).getIndex("/opt/ros"), {"my_msgs": [self.msgs]})
+        self.assertEqual(MsgCache(self.path).getIndex("/other"), None)
+
+        # A new message (the folder changes)
+        self._write(os.path.join(self.msgs, "Other.msg"), "int32 x\n")
+        os.utime(self.msgs, (time.time() + 10, time.time() + 10))
+        self.assertEqual(MsgCache(self.path).getIndex("/opt/ros"), None)
+
+    def test_Module(self):
+        cache = MsgCache(self.path)
+        self.assertEqual(cache.getModule("my_msgs/Robot"), None)
+        cache.putModule("my_msgs/Robot", self.generated, [self.msgFile])
+
+        modulePath = MsgCache(self.path).getModule("my_msgs/Robot")
+        self.assertTrue(modulePath.startswith(self.path))
+        with open(modulePath) as f:
+            self.assertEqual(f.read(), "# generated\n")
+
+    def test_Module_Touched(self):
+        MsgCache(self.path).putModule("my_msgs/Robot", self.generated, [self.msgFile])
+        self._write(self.msgFile, "string name\n", time.time() + 10)
+        self.assertNotEqual(MsgCache(self.path).getModule("my_msgs/Robot"), None)
+
+    def test_Module_Changed(self):
+        MsgCache(self.path).putModule("my_msgs/Robot", self.generated, [self.msgFile])
+        self._write(self.msgFile, "string name\nint32 id\n", time.time() + 10)
+        self.assertEqual(MsgCache(self.path).getModule("my_msgs/Robot"), None)
+
+    def test_Module_Removed(self):
+        MsgCache(self.path).putModule("my_msgs/Robot", self.generated, [self.msgFile])
+        os.remove(self.msgFile)
+        self.assertEqual(MsgCache(self.path).getModule("my_msgs/Robot"), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
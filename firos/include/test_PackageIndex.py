@@ -0,0 +1,106 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from include.constants import Constants as C
+from include.logger import initLog
+from include.msgCache import MsgCache
+from include.packageIndex import PackageIndex
+
+
+class Test_PackageIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.logLevel = C.LOGLEVEL
+        C.LOGLEVEL = "ERROR"
+        initLog()
+
+    @classmethod
+    def tearDownClass(cls):
+        C.LOGLEVEL = cls.logLevel
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.share = os.path.join(self.folder, "opt", "share")
+        self.src = os.path.join(self.folder, "ws", "src")
+        self._package(os.path.join(self.share, "std_msgs"))
+        self._package(os.path.join(self.share, "roscpp"), msgs=False)
+        self._package(os.path.join(self.src, "repo", "my_msgs"))
+        # Nested in a package, not crawled
+        self._package(os.path.join(self.src, "repo", "my_msgs", "test", "nested_msgs"))
+        self.rosPackagePath = self.share + ":" + self.src
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _package(self, path, msgs=True):
+        os.makedirs(path)
+        open(os.path.join(path, "package.xml"), "w").close()
+        if msgs:
+            os.makedirs(os.path.join(path, "msg"))
+
+    def test_Direct_Lookup(self):
+        index = PackageIndex(self.rosPackagePath)
+        self.assertTrue("std_msgs" in index)
+        self.assertEqual(index["std_msgs"], [os.path.join(self.share, "std_msgs", "msg")])
+        # Not crawled for it
+        self.assertEqual(index.crawled, None)
+
+    def test_Crawled_Lookup(self):
+        index = PackageIndex(self.rosPackagePath)
+        self.assertEqual(index.get("my_msgs"), [os.path.join(self.src, "repo", "my_msgs", "msg")])
+        self.assertEqual(sorted(index.crawled.keys()), ["my_msgs", "std_msgs"])
+
+    def test_Missing(self):
+        index = PackageIndex(self.rosPackagePath)
+        self.assertFalse("roscpp" in index)
+        self.assertFalse("nested_msgs" in index)
+        self.assertEqual(index.get("unknown_msgs"), None)
+        self.assertRaises(KeyError, lambda: index["unknown_msgs"])
+
+    def test_Added_Folders(self):
+        index = PackageIndex(self.rosPackagePath)
+        index["firos"] = ["/firos/msgs/firos"]
+        self.assertEqual(index["firos"], ["/firos/msgs/firos"])
+        self.assertEqual(index.crawled, None)
+
+    def test_Cached_Crawl(self):
+        cache = MsgCache(os.path.join(self.folder, "cache"))
+        PackageIndex(self.rosPackagePath, cache).get("my_msgs")
+        crawled = {"my_msgs": [os.path.join(self.src, "repo", "my_msgs", "msg")],
+                   "std_msgs": [os.path.join(self.share, "std_msgs", "msg")]}
+        self.assertEqual(cache.getIndex(self.rosPackagePath), crawled)
+
+        # A new package invalidates the crawled packages
+        self._package(os.path.join(self.src, "repo2", "other_msgs"))
+        os.utime(self.src, (0, 0))
+        self.assertEqual(cache.getIndex(self.rosPackagePath), None)
+        self.assertEqual(PackageIndex(self.rosPackagePath, cache).get("other_msgs"), [os.path.join(self.src, "repo2", "other_msgs", "msg")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# MIT License
+# 
+# Copyright (c) 2019 Fraunhofer IML
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import json
+import time
+import unittest
+import threading
+try:
+    # Python 3
+    from io import StringIO
+except ImportError:
+    # Python 2
+    from StringIO import StringIO
+
+from include import startup
+from include import logger
+from include.constants import Constants as C
+
+
+class Test_Startup(unittest.TestCase):
+
+    def test_Run_Bounded(self):
+        lock = threading.Lock()
+        running = [0, 0]  # current, maximum
+
+        def routine(item):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            if item == 3:
+                raise ValueError(item)
+            return item * 2
+
+        results = startup.runBounded(routine, range(10), 4)
+        self.assertEqual(results[:3], [0, 2, 4])
+        self.assertTrue(isinstance(results[3], ValueError))
+        self.assertEqual(results[4:], [8, 10, 12, 14, 16, 18])
+        self.assertEqual(running[1], 4)
+
+    def test_Run_Bounded_Empty(self):
+        self.assertEqual(startup.runBounded(lambda item: item, [], 4), [])
+
+    def test_Phase(self):
+        with startup.Phase("test"):
+            time.sleep(0.01)
+        self.assertGreaterEqual(startup.PHASES["test"], 0.01)
+
+    def test_Nested_Phases(self):
+        with startup.Phase("outer"):
+            with startup.Phase("inner"):
+                time.sleep(0.01)
+        with startup.Phase("outer"):
+            pass
+        self.assertGreaterEqual(startup.PHASES["outer/inner"], 0.01)
+        self.assertGreaterEqual(startup.PHASES["outer"], startup.PHASES["outer/inner"])
+
+    def test_Topic_Steps(self):
+        with startup.Phase("class", "/robot/cmd"):
+            time.sleep(0.01)
+        with startup.Phase("class", "/robot/cmd"):
+            pass
+        self.assertGreaterEqual(startup.TOPICS["/robot/cmd"]["class"], 0.01)
+        self.assertFalse("class" in startup.PHASES)
+
+    def test_Profile(self):
+        with startup.Phase("class", "/robot/pose"):
+            pass
+        data = json.loads(json.dumps(startup.profile()))
+        self.assertEqual(sorted(data.keys()), ["first_message", "phases", "topics", "total"])
+        self.assertTrue("/robot/pose" in data["topics"])
+
+        table = startup.profileTable(data, slowest=1)
+        self.assertTrue(table.startswith("Phase"))
+        self.assertTrue("1 slowest of" in table)
+
+    def test_Write_Profile_To_Stdout(self):
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            startup.writeProfile("-")
+            out, err = sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+        # Only the JSON is written to stdout, the table to stderr
+        self.assertEqual(sorted(json.loads(out).keys()), ["first_message", "phases", "topics", "total"])
+        self.assertTrue(err.startswith("Phase"))
+
+    def test_Profile_With_Default(self):
+        # As in core.py with "--profile-startup" without a FILE
+        level = C.LOGLEVEL
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            C.LOGLEVEL = "INFO"
+            logger.initLog()
+            startup.initProfile("-")
+            logger.Log("INFO", "Initializing ROS node")
+            with startup.Phase("plugins"):
+                pass
+            startup.report()
+            startup.writeProfile("-")
+            logger.Log("INFO", "Press Ctrl+C to Exit")
+            out, err = sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+            logger.setOutput(None)
+            C.LOGLEVEL = level
+
+        # stdout only contains the JSON, the log is written to stderr
+        self.assertTrue("plugins" in json.loads(out)["phases"])
+        self.assertTrue("Initializing ROS node" in err)
+        self.assertTrue("Press Ctrl+C to Exit" in err)
@@ -0,0 +1,120 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import unittest
+
+from include.constants import Constants as C
+from include import tracing
+
+
+class Stamp(object):
+    def __init__(self, secs, nsecs):
+        self.secs = secs
+        self.nsecs = nsecs
+
+class Header(object):
+    def __init__(self, stamp):
+        self.stamp = stamp
+
+class Msg(object):
+    def __init__(self, stamp):
+        self.header = Header(stamp)
+
+
+class Test_Tracing(unittest.TestCase):
+
+    def setUp(self):
+        C.TRACING_SIZE = 3
+        C.TRACING_BUDGET = 100
+        tracing.reset()
+
+    def tearDown(self):
+        C.TRACING_SIZE = 0
+        C.TRACING_BUDGET = 100
+        tracing.reset()
+
+    def _trace(self, origin, converted, sent, acknowledged):
+        trace = tracing.start("ros", "/robot/pose")
+        callback = trace.times["callback"]
+        trace.times.update(stamp=callback - origin, converted=callback + converted,
+                           sent=callback + converted + sent, acknowledged=callback + converted + sent + acknowledged)
+        tracing.finish(trace)
+
+    def test_Disabled(self):
+        C.TRACING_SIZE = 0
+        self.assertEqual(tracing.start("ros", "/robot/pose"), None)
+        tracing.finish(None)
+        self.assertEqual(tracing.report()["ros"]["count"], 0)
+
+    def test_Report(self):
+        self._trace(0.010, 0.001, 0.0, 0.020)
+        self._trace(0.010, 0.002, 0.0, 0.200)
+        data = tracing.report()["ros"]
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(data["over_budget"], 1)
+        self.assertAlmostEqual(data["stages"]["callback"]["p50"], 10, places=2)
+        self.assertAlmostEqual(data["stages"]["acknowledged"]["max"], 200, places=2)
+        self.assertAlmostEqual(data["total"]["p50"], 31, places=2)
+        self.assertEqual(tracing.report("/other")["ros"]["count"], 0)
+        self.assertEqual(tracing.report()["contextbroker"]["total"], None)
+
+    def test_Ring_Buffer(self):
+        for _ in range(5):
+            self._trace(0, 0, 0, 0)
+        self.assertEqual(tracing.report()["ros"]["count"], 3)
+
+    def test_Marks_Of_Thread(self):
+        trace = tracing.start("contextbroker", "/robot/cmd", time.time() - 0.05)
+        tracing.activate(trace)
+        tracing.mark("unknown")
+        tracing.finish(trace, "published")
+        tracing.mark("published")   # Not active anymore
+        data = tracing.report()["contextbroker"]
+        self.assertEqual(data["count"], 1)
+        self.assertGreaterEqual(data["stages"]["received"]["p50"], 50)
+
+    def test_Detached(self):
+        trace = tracing.start("ros", "/robot/pose")
+        tracing.activate(trace)
+        self.assertIs(tracing.detach(), trace)
+        self.assertIs(tracing.detach(), None)
+
+        # Only the thread, which took it over, finishes it
+        tracing.finish(trace)
+        self.assertEqual(tracing.report()["ros"]["count"], 0)
+        trace.mark("sent")
+        tracing.finish(trace, "acknowledged", detached=True)
+        data = tracing.report()["ros"]
+        self.assertEqual(data["count"], 1)
+        self.assertTrue(data["stages"]["acknowledged"] is not None)
+
+    def test_Stamp_And_Date(self):
+        self.assertAlmostEqual(tracing.stampOf(Msg(Stamp(10, 500000000))), 10.5)
+        self.assertEqual(tracing.stampOf(object()), None)
+        self.assertEqual(tracing.parseDate("1970-01-01T00:01:00.25Z"), 60.25)
+        self.assertEqual(tracing.parseDate("1970-01-01T00:01:00Z"), 60)
+        self.assertEqual(tracing.parseDate("invalid"), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
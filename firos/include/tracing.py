@@ -0,0 +1,186 @@
+# MIT License
+#
+# Copyright (c) 2019 Fraunhofer IML
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import calendar
+import threading
+from collections import deque
+
+from include.constants import Constants as C
+
+
+# The stages of a trace in each direction. The first stage is the origin of the message:
+# The stamp of its std_msgs/Header or the "dateModified" of the Entity (if available)
+STAGES = {
+    "ros": ("stamp", "callback", "converted", "sent", "acknowledged"),
+    "contextbroker": ("modified", "received", "published")
+}
+
+_buffers = dict()   # _buffers[direction] -> ring buffer of finished traces: (topic, {stage: seconds}, total)
+_local = threading.local()
+
+
+class Trace(object):
+    ''' The timestamps of one message on its way through FIROS: times[stage] -> time.time()
+    '''
+    __slots__ = ["direction", "topic", "times", "detached"]
+
+    def __init__(self, direction, topic):
+        self.direction = direction
+        self.topic = topic
+        self.times = dict()
+        self.detached = False
+
+    def mark(self, stage):
+        self.times[stage] = time.time()
+
+
+def start(direction, topic, origin=None):
+    ''' Starts the trace of a message, which was just received (from ROS or the ContextBroker).
+        Returns None, if tracing is disabled
+
+        direction: "ros" or "contextbroker"
+        topic: The topic of the message
+        origin: The time of the origin in seconds since the epoch (or None)
+    '''
+    if C.TRACING_SIZE <= 0:
+        return None
+    trace = Trace(direction, topic)
+    stages = STAGES[direction]
+    if origin:
+        trace.times[stages[0]] = origin
+    trace.mark(stages[1])
+    return trace
+
+
+def activate(trace):
+    ''' Sets the trace of the message, which is currently handled by this thread (see mark)
+    '''
+    _local.trace = trace
+
+
+def mark(stage):
+    ''' Marks the stage of the trace of this thread (if any)
+    '''
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.mark(stage)
+
+
+def detach():
+    ''' Detaches the trace of this thread (if any) and returns it. The message is then handled
+        by another thread (e.g. sent in a batch), which marks the remaining stages on the trace and
+        finishes it via finish(trace, detached=True). The 'finish' of this thread ignores it.
+    '''
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.detached = True
+        _local.trace = None
+    return trace
+
+
+def finish(trace, stage=None, detached=False):
+    ''' Marks the last stage and adds the trace into the ring buffer of its direction.
+        A detached trace (see detach) is only finished with detached=True
+    '''
+    if getattr(_local, "trace", None) is trace:
+        _local.trace = None
+    if trace is None or trace.detached != detached:
+        return
+    if stage is not None:
+        trace.mark(stage)
+
+    # The duration of each stage since the previous (reached) stage
+    durations = dict()
+    previous = None
+    for stage in STAGES[trace.direction]:
+        if stage in trace.times:
+            if previous is not None:
+                durations[stage] = trace.times[stage] - previous
+            previous = trace.times[stage]
+    first = min(trace.times.values())
+
+    buf = _buffers.get(trace.direction)
+    if buf is None:
+        # deque.append is thread-safe, no lock is needed
+        buf = _buffers.setdefault(trace.direction, deque(maxlen=C.TRACING_SIZE))
+    buf.append((trace.topic, durations, previous - first))
+
+
+def stampOf(msg):
+    ''' Returns the stamp of the std_msgs/Header of msg in seconds (or None)
+    '''
+    header = getattr(msg, "header", None)
+    stamp = getattr(header, "stamp", None)
+    if stamp is None or not hasattr(stamp, "secs"):
+        return None
+    return stamp.secs + stamp.nsecs * 1e-9
+
+
+def parseDate(value):
+    ''' Returns the ISO 8601 date of the ContextBroker (e.g. "2019-09-03T12:00:00.00Z") in seconds since the epoch (or None)
+    '''
+    try:
+        seconds = calendar.timegm(time.strptime(value[:19], "%Y-%m-%dT%H:%M:%S"))
+        fraction = value[19:].rstrip("Z")
+        if fraction.startswith("."):
+            seconds += float("0" + fraction)
+        return seconds
+    except (ValueError, TypeError):
+        return None
+
+
+def report(topic=None):
+    ''' Returns the percentiles of each stage (and the total) in milliseconds of the traces in the ring buffers:
+
+            {direction: {"count": n, "over_budget": n, "stages": {stage: {"p50", "p90", "p99", "max"}}, "total": {...}}}
+
+        topic: Only the traces of this topic
+    '''
+    data = dict()
+    for direction, stages in STAGES.items():
+        traces = [trace for trace in list(_buffers.get(direction, ())) if topic is None or trace[0] == topic]
+        budget = C.TRACING_BUDGET / 1000.0
+        data[direction] = dict(
+            count=len(traces),
+            over_budget=sum(1 for trace in traces if trace[2] > budget),
+            stages=dict((stage, _percentiles([trace[1][stage] for trace in traces if stage in trace[1]]))
+                        for stage in stages[1:]),
+            total=_percentiles([trace[2] for trace in traces])
+        )
+    return data
+
+
+def reset():
+    ''' Removes all traces
+    '''
+    _buffers.clear()
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    def percentile(p):
+        # Nearest rank
+        return round(values[max(int(round(p / 100.0 * len(values))) - 1, 0)] * 1000, 3)
+    return dict(p50=percentile(50), p90=percentile(90), p99=percentile(99), max=round(values[-1] * 1000, 3))